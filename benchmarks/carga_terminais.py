@@ -0,0 +1,279 @@
+"""Teste de carga: vários terminais criando, alterando e reabrindo orçamentos ao mesmo tempo.
+
+Cada terminal roda num processo próprio, com seu config.ini (chave `terminal`), e usa a
+API de database.py contra o banco local. Ao final, mostra vazão, percentis de latência,
+conflitos de bloqueio (deadlocks), novas tentativas e colisões de numeração.
+
+Uso:
+    python benchmarks/carga_terminais.py --terminais 8 --duracao 30
+    python benchmarks/carga_terminais.py --terminais 4 --processos-por-terminal 2   # terminais duplicados
+
+Com --processos-por-terminal maior que 1, duas "máquinas" usam o mesmo terminal, o que
+expõe a corrida entre o MAX(AA_NFA) de get_proximo_numero_orcamento e o INSERT.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_RAIZ = os.path.dirname(DIR_BENCHMARKS)
+sys.path.insert(0, os.path.join(DIR_RAIZ, 'src'))
+sys.path.insert(0, DIR_BENCHMARKS)
+
+from gerar_banco_local import gerar_banco, escrever_config
+
+OPERACOES = ('criar', 'alterar', 'reabrir')
+
+
+def classificar_erro(mensagem):
+    """Classifica a mensagem de erro devolvida por salvar/atualizar_orcamento."""
+    texto = mensagem.lower()
+    if '40001' in texto or '1205' in texto or 'deadlock' in texto or 'locked' in texto:
+        return 'deadlock'
+    if '23000' in texto or 'unique' in texto or 'primary key' in texto or 'duplicate' in texto:
+        return 'colisao'
+    return 'erro'
+
+
+def _percentil(amostras, p):
+    if not amostras:
+        return 0.0
+    ordenadas = sorted(amostras)
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+def _montar_orcamento(rng, numero, produtos, quantidade_itens):
+    from models import Orcamento, ItemOrcamento
+    itens = []
+    for i in range(quantidade_itens):
+        quantidade = Decimal(rng.randint(1, 20))
+        preco = Decimal(rng.randint(50, 90000)) / 100
+        itens.append(ItemOrcamento(
+            numero_nota=numero, sequencia=i + 1, codigo_produto=f"{rng.randint(1, produtos):06d}",
+            quantidade=quantidade, valor_unitario=preco, deposito='01', valor_desconto=Decimal('0.0'),
+            total_bruto_item=quantidade * preco, custo=preco * Decimal('0.6')
+        ))
+    orcamento = Orcamento(
+        numero_nota=numero, codigo_cliente=f"{rng.randint(1, 1000):05d}", codigo_vendedor='001',
+        codigo_cond_pag='01', data_emissao=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0),
+        valor_total=sum(item.total_bruto_item for item in itens)
+    )
+    return orcamento, itens
+
+
+def executar_terminal(id_processo, caminho_config, parametros, inicio_evento, fila_resultados):
+    """Laço de um terminal: cria, altera e reabre orçamentos até acabar o tempo."""
+    os.environ['ORCAMENTOS_CONFIG'] = caminho_config
+    import database
+
+    rng = random.Random(parametros['semente'] + id_processo)
+    resultado = {
+        'processo': id_processo, 'terminal': database.get_terminal_config(),
+        'latencias': {op: [] for op in OPERACOES}, 'erros': {op: 0 for op in OPERACOES},
+        'deadlocks': 0, 'colisoes': 0, 'tentativas_extras': 0, 'desistencias': 0,
+    }
+    meus_orcamentos = []
+
+    def gravar(operacao, funcao, montar):
+        """Executa a gravação com novas tentativas em caso de deadlock ou colisão de número."""
+        for tentativa in range(parametros['tentativas']):
+            orcamento, itens = montar()
+            sucesso, mensagem = funcao(orcamento, itens)
+            if sucesso:
+                return orcamento
+            tipo = classificar_erro(mensagem)
+            if tipo == 'deadlock':
+                resultado['deadlocks'] += 1
+            elif tipo == 'colisao':
+                resultado['colisoes'] += 1
+            else:
+                resultado['erros'][operacao] += 1
+                return None
+            resultado['tentativas_extras'] += 1
+            time.sleep(rng.uniform(0, 0.01 * (2 ** tentativa)))
+        resultado['desistencias'] += 1
+        return None
+
+    inicio_evento.wait()
+    fim = time.monotonic() + parametros['duracao']
+    while time.monotonic() < fim:
+        sorteio = rng.random()
+        if meus_orcamentos and sorteio < parametros['proporcao_alterar']:
+            operacao = 'alterar'
+        elif meus_orcamentos and sorteio < parametros['proporcao_alterar'] + parametros['proporcao_reabrir']:
+            operacao = 'reabrir'
+        else:
+            operacao = 'criar'
+
+        itens = rng.randint(1, parametros['itens_max'])
+        inicio = time.perf_counter()
+        if operacao == 'criar':
+            orcamento = gravar(operacao, database.salvar_orcamento, lambda: _montar_orcamento(
+                rng, database.get_proximo_numero_orcamento(), parametros['produtos'], itens))
+            if orcamento:
+                meus_orcamentos.append(orcamento.numero_nota)
+        elif operacao == 'alterar':
+            numero = rng.choice(meus_orcamentos)
+            gravar(operacao, database.atualizar_orcamento,
+                   lambda: _montar_orcamento(rng, numero, parametros['produtos'], itens))
+        else:
+            numero = rng.choice(meus_orcamentos)
+            if database.get_orcamento_cabecalho(numero) is None:
+                resultado['erros'][operacao] += 1
+            database.get_orcamento_itens(numero)
+        resultado['latencias'][operacao].append((time.perf_counter() - inicio) * 1000)
+
+    fila_resultados.put(resultado)
+
+
+def verificar_banco(caminho_banco):
+    """Procura números duplicados e orçamentos que ficaram com NotaEmLancto_NFA = 'S'."""
+    conn = sqlite3.connect(caminho_banco)
+    try:
+        duplicados = conn.execute(
+            "SELECT AA_NFA, AO_NFA, COUNT(*) FROM ANOTASNO GROUP BY AA_NFA, AO_NFA HAVING COUNT(*) > 1"
+        ).fetchall()
+        em_lancamento = conn.execute("SELECT COUNT(*) FROM ANOTASNO WHERE NotaEmLancto_NFA = 'S'").fetchone()[0]
+        itens_orfaos = conn.execute(
+            "SELECT COUNT(*) FROM APRODUNO i WHERE NOT EXISTS "
+            "(SELECT 1 FROM ANOTASNO n WHERE n.AA_NFA = i.AA_PCA AND n.AO_NFA = i.AL_PCA)"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    return {'numeros_duplicados': len(duplicados), 'em_lancamento': em_lancamento, 'itens_orfaos': itens_orfaos}
+
+
+def coletar_resultados(fila_resultados, processos, espera=1.0):
+    """Resultados dos processos; um processo que terminou sem entregar o seu (exceção,
+    morto pelo sistema) não trava a espera: fica de fora e é relatado à parte."""
+    resultados = []
+    while len(resultados) < len(processos):
+        try:
+            resultados.append(fila_resultados.get(timeout=espera))
+        except queue.Empty:
+            if all(processo.exitcode is not None for processo in processos):
+                # Todos saíram: o que ainda estava a caminho na fila já teria chegado
+                break
+    return resultados
+
+
+def consolidar(resultados, duracao):
+    relatorio = {'operacoes': {}, 'por_terminal': {}}
+    for op in OPERACOES:
+        latencias = [ms for r in resultados for ms in r['latencias'][op]]
+        relatorio['operacoes'][op] = {
+            'quantidade': len(latencias),
+            'por_segundo': round(len(latencias) / duracao, 2),
+            'erros': sum(r['erros'][op] for r in resultados),
+            'p50_ms': round(_percentil(latencias, 50), 2),
+            'p95_ms': round(_percentil(latencias, 95), 2),
+            'p99_ms': round(_percentil(latencias, 99), 2),
+            'max_ms': round(max(latencias), 2) if latencias else 0.0,
+        }
+    for chave in ('deadlocks', 'colisoes', 'tentativas_extras', 'desistencias'):
+        relatorio[chave] = sum(r[chave] for r in resultados)
+    relatorio['total_por_segundo'] = round(sum(o['quantidade'] for o in relatorio['operacoes'].values()) / duracao, 2)
+    for r in resultados:
+        terminal = relatorio['por_terminal'].setdefault(r['terminal'], {'processos': 0, 'operacoes': 0, 'colisoes': 0})
+        terminal['processos'] += 1
+        terminal['operacoes'] += sum(len(v) for v in r['latencias'].values())
+        terminal['colisoes'] += r['colisoes']
+    return relatorio
+
+
+def imprimir_relatorio(relatorio):
+    print(f"\nVazão total: {relatorio['total_por_segundo']} operações/s")
+    print(f"{'Operação':10s} {'Qtd.':>7s} {'Op/s':>8s} {'Erros':>6s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'Máx.':>8s}")
+    for op, r in relatorio['operacoes'].items():
+        print(f"{op:10s} {r['quantidade']:7d} {r['por_segundo']:8.2f} {r['erros']:6d} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['max_ms']:8.1f}")
+    print(f"\nDeadlocks/bloqueios: {relatorio['deadlocks']}")
+    print(f"Colisões de número: {relatorio['colisoes']}")
+    print(f"Novas tentativas: {relatorio['tentativas_extras']} (desistências: {relatorio['desistencias']})")
+    banco = relatorio['banco']
+    print(f"Números duplicados no banco: {banco['numeros_duplicados']}")
+    print(f"Orçamentos presos com NotaEmLancto_NFA = 'S': {banco['em_lancamento']}")
+    print(f"Itens sem cabeçalho: {banco['itens_orfaos']}")
+    for falho in relatorio['processos_falhos']:
+        print(f"Processo {falho['processo']} terminou sem resultado (código de saída {falho['codigo_saida']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga com vários terminais gravando orçamentos.")
+    parser.add_argument('--terminais', type=int, default=4)
+    parser.add_argument('--processos-por-terminal', type=int, default=1,
+                        help="Mais de 1 simula máquinas configuradas com o mesmo terminal")
+    parser.add_argument('--duracao', type=float, default=20.0, help="Segundos de carga")
+    parser.add_argument('--itens-max', type=int, default=30, help="Máximo de itens por orçamento")
+    parser.add_argument('--proporcao-alterar', type=float, default=0.3)
+    parser.add_argument('--proporcao-reabrir', type=float, default=0.3)
+    parser.add_argument('--tentativas', type=int, default=3, help="Tentativas por gravação (deadlock/colisão)")
+    parser.add_argument('--banco', help="Pasta de um banco já gerado; sem ela, gera um pequeno numa pasta temporária")
+    parser.add_argument('--produtos', type=int, default=5000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='carga_orcamentos_')
+    try:
+        if args.banco:
+            caminho_banco = os.path.join(args.banco, 'banco_local.db')
+        else:
+            caminho_banco = os.path.join(pasta, 'banco_local.db')
+            gerar_banco(caminho_banco, produtos=args.produtos, clientes=1000, orcamentos=200, linhas=2000,
+                        terminais=tuple(f"{t:02d}" for t in range(1, args.terminais + 1)),
+                        semente=args.semente, progresso=lambda msg: None)
+
+        parametros = {
+            'duracao': args.duracao, 'itens_max': args.itens_max, 'produtos': args.produtos,
+            'proporcao_alterar': args.proporcao_alterar, 'proporcao_reabrir': args.proporcao_reabrir,
+            'tentativas': args.tentativas, 'semente': args.semente,
+        }
+        inicio_evento = multiprocessing.Event()
+        fila_resultados = multiprocessing.Queue()
+        processos = []
+        for t in range(1, args.terminais + 1):
+            terminal = f"{t:02d}"
+            caminho_config = escrever_config(os.path.join(pasta, f"config_{terminal}.ini"), caminho_banco, terminal,
+                                             extras={'Diagnostico': {'limite_consulta_lenta_ms': '1000000'}})
+            for _ in range(args.processos_por_terminal):
+                processo = multiprocessing.Process(
+                    target=executar_terminal,
+                    args=(len(processos), caminho_config, parametros, inicio_evento, fila_resultados)
+                )
+                processo.start()
+                processos.append(processo)
+
+        print(f"{len(processos)} processos, {args.terminais} terminais, {args.duracao:.0f}s de carga...")
+        inicio_evento.set()
+        resultados = coletar_resultados(fila_resultados, processos)
+        for processo in processos:
+            processo.join()
+
+        relatorio = consolidar(resultados, args.duracao)
+        relatorio['processos_falhos'] = [{'processo': i, 'codigo_saida': processo.exitcode}
+                                         for i, processo in enumerate(processos)
+                                         if i not in {r['processo'] for r in resultados}]
+        relatorio['banco'] = verificar_banco(caminho_banco)
+        relatorio['parametros'] = dict(parametros, terminais=args.terminais,
+                                       processos_por_terminal=args.processos_por_terminal)
+        imprimir_relatorio(relatorio)
+
+        if args.saida:
+            with open(args.saida, 'w', encoding='utf-8') as arquivo:
+                json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,482 @@
+"""Mede os caminhos mais usados do sistema contra o banco local (SQLite).
+
+Uso:
+    python benchmarks/executar_benchmarks.py
+    python benchmarks/executar_benchmarks.py --comparar benchmarks/resultados/base.json --tolerancia 20
+
+Sem --banco, gera um banco novo a cada execução (mesma semente, mesmos volumes),
+para que os números de commits diferentes sejam comparáveis. O resultado é um JSON
+com mediana, mínimo e p95 de cada caso; com --comparar, a execução termina com
+código 1 se algum caso ficar mais lento que a base além da tolerância.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_RAIZ = os.path.dirname(DIR_BENCHMARKS)
+sys.path.insert(0, os.path.join(DIR_RAIZ, 'src'))
+sys.path.insert(0, DIR_BENCHMARKS)
+
+from gerar_banco_local import gerar_banco, escrever_config
+
+TAMANHOS_ORCAMENTO = (10, 100, 1000)
+TAMANHOS_PDF = (10, 100, 500)
+ITENS_DESCONTO = 10000
+TAMANHO_PAGINA = 100
+
+
+def _percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    return ordenadas[min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))]
+
+
+def medir(funcao, preparar=None, repeticoes=5, aquecimento=1):
+    """Executa `funcao` e devolve as durações em ms; `preparar` roda fora da medição
+    e devolve os argumentos de cada execução."""
+    amostras = []
+    for i in range(aquecimento + repeticoes):
+        args = preparar() if preparar else ()
+        inicio = time.perf_counter()
+        funcao(*args)
+        duracao = (time.perf_counter() - inicio) * 1000
+        if i >= aquecimento:
+            amostras.append(duracao)
+    return {
+        'mediana_ms': round(statistics.median(amostras), 3),
+        'min_ms': round(min(amostras), 3),
+        'p95_ms': round(_percentil(amostras, 95), 3),
+        'repeticoes': repeticoes,
+    }
+
+
+class Contexto:
+    """Dados compartilhados pelos casos: códigos existentes e gerador de itens."""
+
+    def __init__(self, produtos, semente):
+        import database
+        self.db = database
+        self.rng = random.Random(semente)
+        self.codigos_produtos = [f"{i:06d}" for i in range(1, produtos + 1)]
+        self.vendedor = database.get_vendedores()[0]
+        self.cliente = database.get_cliente_por_codigo('1')
+        self._produtos = {}
+
+    def produto(self, codigo):
+        if codigo not in self._produtos:
+            self._produtos[codigo] = self.db.get_produto_por_codigo(codigo)
+        return self._produtos[codigo]
+
+    def itens_ui(self, quantidade):
+        """Itens no formato de MainApplication.itens_para_salvar."""
+        itens = []
+        for i in range(quantidade):
+            produto = self.produto(self.rng.choice(self.codigos_produtos[:2000]))
+            qtd = Decimal(self.rng.randint(1, 20))
+            itens.append({
+                'id': f"I{i:05d}", 'codigo': produto['codigo'], 'quantidade': qtd,
+                'valor_unitario': produto['preco'], 'custo': produto['custo'],
+                'subtotal': (qtd * produto['preco']).quantize(Decimal('0.01')),
+                'descricao': produto['descricao'], 'unidade': produto['unidade'],
+                'desconto_maximo': produto['desconto_maximo']
+            })
+        return itens
+
+    def orcamento(self, numero, quantidade):
+        from models import Orcamento, ItemOrcamento
+        itens_ui = self.itens_ui(quantidade)
+        total = sum(item['subtotal'] for item in itens_ui)
+        orcamento = Orcamento(
+            numero_nota=numero, codigo_cliente=self.cliente['codigo'], codigo_vendedor=self.vendedor['codigo'],
+            codigo_cond_pag='01', data_emissao=datetime.now().replace(hour=0, minute=0, second=0, microsecond=0),
+            valor_total=total
+        )
+        itens = [
+            ItemOrcamento(numero_nota=numero, sequencia=i + 1, codigo_produto=item['codigo'],
+                          quantidade=item['quantidade'], valor_unitario=item['valor_unitario'], deposito='01',
+                          valor_desconto=Decimal('0.0'), total_bruto_item=item['subtotal'], custo=item['custo'])
+            for i, item in enumerate(itens_ui)
+        ]
+        return orcamento, itens, itens_ui
+
+    def novo_orcamento(self, quantidade):
+        return self.orcamento(self.db.get_proximo_numero_orcamento(), quantidade)
+
+
+def _carregar_orcamento_consultas(db, numero):
+    """Mesmas consultas de MainApplication.carregar_orcamento_existente, sem a interface."""
+    cabecalho = db.get_orcamento_cabecalho(numero)
+    db.get_cliente_por_codigo(cabecalho['codigo_cliente'])
+    for item in db.get_orcamento_itens(numero):
+        db.get_produto_por_codigo(item['codigo'])
+
+
+def _criar_janela_principal():
+    """MainApplication real, com a janela oculta; None se não houver tela disponível."""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    from ui.main_window import MainApplication
+    return MainApplication(root)
+
+
+def _produto_em_mais_orcamentos_abertos(db):
+    """Código do produto que aparece em mais orçamentos em aberto, ou None se não há nenhum."""
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT TOP 1 i.AB_PCA FROM APRODUNO i
+            JOIN ANOTASNO n ON n.AA_NFA = i.AA_PCA AND n.AO_NFA = i.AL_PCA
+            WHERE n.AF_NFA = '8' AND n.NotaEmLancto_NFA = 'N'
+            GROUP BY i.AB_PCA ORDER BY COUNT(*) DESC, i.AB_PCA
+        """)
+        linha = cursor.fetchone()
+        return linha[0].strip() if linha else None
+    finally:
+        conn.close()
+
+
+def montar_casos(ctx, repeticoes):
+    """Lista de (nome, funcao, preparar, repeticoes)."""
+    db = ctx.db
+    casos = []
+    termos_produtos = {'vazio': None, 'prefixo': 'TUBO PVC', 'contem': 'TIGRE'}
+    for tipo, termo in termos_produtos.items():
+        casos.append((f"buscar_produtos_{tipo}", lambda t=termo: db.buscar_produtos(termo_inteligente=t), None, repeticoes))
+        casos.append((f"buscar_produtos_pagina_{tipo}",
+                      lambda t=termo: db.buscar_produtos(termo_inteligente=t, inicio=0, quantidade=TAMANHO_PAGINA),
+                      None, repeticoes))
+    casos.append(("iterar_produtos_todos", lambda: sum(1 for _ in db.iterar_produtos()), None, repeticoes))
+    termos_clientes = {'vazio': None, 'prefixo': 'MARIA', 'contem': 'SOUZA'}
+    for tipo, termo in termos_clientes.items():
+        casos.append((f"buscar_clientes_{tipo}", lambda t=termo: db.buscar_clientes(termo_inteligente=t), None, repeticoes))
+        casos.append((f"buscar_clientes_pagina_{tipo}",
+                      lambda t=termo: db.buscar_clientes(termo_inteligente=t, inicio=0, quantidade=TAMANHO_PAGINA),
+                      None, repeticoes))
+
+    from busca import BuscaIncremental
+
+    def digitar(busca, termo):
+        # Cada tecla pede a primeira página, como a janela de busca
+        for fim in range(1, len(termo) + 1):
+            busca.resultados(termo[:fim]).garantir(TAMANHO_PAGINA)
+    casos.append(("buscar_produtos_digitando",
+                  lambda busca: digitar(busca, 'TUBO PVC 25MM'),
+                  lambda: (BuscaIncremental('benchmark_produtos', db.buscar_produtos, 'descricao'),),
+                  repeticoes))
+
+    from indice_busca import IndiceBusca
+    catalogo = db.get_catalogo_produtos()
+    casos.append(("indice_busca_montar_produtos", lambda: IndiceBusca(catalogo), None, max(1, repeticoes // 2)))
+    indice = IndiceBusca(catalogo)
+    busca_indexada = BuscaIncremental('benchmark_produtos_indice', db.buscar_produtos, 'descricao')
+    busca_indexada.indice, busca_indexada.estado_indice = indice, 'pronto'
+    termos_indice = {'prefixo': 'TUBO PVC', 'contem': 'TIGRE', 'palavras': 'tubo 25 pvc', 'acento': 'CONEXÃO tigre'}
+    for tipo, termo in termos_indice.items():
+        casos.append((f"indice_busca_{tipo}", lambda t=termo: indice.buscar(t), None, repeticoes))
+        casos.append((f"buscar_produtos_indice_pagina_{tipo}",
+                      lambda t=termo: busca_indexada.resultados(t).garantir(TAMANHO_PAGINA),
+                      lambda: busca_indexada.limpar() or (), repeticoes))
+
+    from busca import BuscaCatalogo
+    from catalogo import SincronizadorCatalogo
+    sincronizador = SincronizadorCatalogo()
+    casos.append(("carregar_catalogo_completo", sincronizador.carregar_do_banco, None, max(1, repeticoes // 2)))
+    atual = {'catalogo': sincronizador.carregar_do_banco()}
+    # Reabrir o arquivo gravado, como ao iniciar o sistema
+    casos.append(("abrir_catalogo_arquivo", lambda: SincronizadorCatalogo().carregar(), None, repeticoes))
+
+    def sincronizar():
+        atual['catalogo'] = sincronizador.sincronizar(atual['catalogo'])
+
+    def alterar_precos(quantidade):
+        conn = db.get_db_connection()
+        cursor = conn.cursor()
+        for codigo in ctx.rng.sample(ctx.codigos_produtos, quantidade):
+            cursor.execute("UPDATE CE_PRODUTOS_ADICIONAIS SET PrecoVendaMax = PrecoVendaMax + 1 WHERE CodReduzido = ?",
+                           codigo)
+        conn.commit()
+        conn.close()
+        return ()
+    casos.append(("sincronizar_catalogo_sem_alteracao", sincronizar, None, repeticoes))
+    casos.append(("sincronizar_catalogo_10_precos", sincronizar, lambda: alterar_precos(10), repeticoes))
+
+    def alterar_descricao():
+        conn = db.get_db_connection()
+        conn.cursor().execute("UPDATE CE_PRODUTO SET AB_ITE = ? WHERE AU_ITE = ?",
+                              f"PRODUTO ALTERADO {ctx.rng.randrange(10 ** 6)}", ctx.rng.choice(ctx.codigos_produtos))
+        conn.commit()
+        conn.close()
+        return ()
+    casos.append(("sincronizar_catalogo_1_descricao", sincronizar, alterar_descricao, max(1, repeticoes // 2)))
+    busca_catalogo = BuscaCatalogo('benchmark_catalogo', db.buscar_produtos, 'descricao', sincronizador, 0)
+    busca_catalogo.indice, busca_catalogo.estado_indice = atual['catalogo'], 'pronto'
+    for tipo, termo in termos_indice.items():
+        casos.append((f"buscar_produtos_catalogo_pagina_{tipo}",
+                      lambda t=termo: busca_catalogo.resultados(t).garantir(TAMANHO_PAGINA),
+                      lambda: busca_catalogo.limpar() or (), repeticoes))
+
+    from busca import BuscaDocumentos
+    from indice_busca import IndiceDocumentos
+    documentos = db.get_documentos_clientes()
+    _, cpf_cnpj, ddd, telefone = ctx.rng.choice(documentos)
+    busca_documentos = BuscaDocumentos(db.buscar_clientes, None)
+    busca_documentos.indice, busca_documentos.estado_indice = IndiceDocumentos(documentos), 'pronto'
+    for tipo, termo in {'cpf_cnpj': cpf_cnpj, 'telefone': f"({ddd}) {telefone}"}.items():
+        casos.append((f"buscar_clientes_{tipo}_sql",
+                      lambda t=termo: db.buscar_clientes(digitos=''.join(c for c in t if c.isdigit())),
+                      None, repeticoes))
+        casos.append((f"buscar_clientes_{tipo}_indice", lambda t=termo: busca_documentos.resultados(t), None, repeticoes))
+
+    codigos = [ctx.rng.choice(ctx.codigos_produtos) for _ in range(100)]
+    casos.append(("get_produto_por_codigo_x100",
+                  lambda: [db.get_produto_por_codigo(c) for c in codigos], None, repeticoes))
+    codigos_clientes = [documento[0] for documento in ctx.rng.sample(documentos, 100)]
+    buscar_clientes_x100 = lambda: [db.get_cliente_por_codigo(c) for c in codigos_clientes]
+    casos.append(("get_cliente_por_codigo_x100_frio", buscar_clientes_x100,
+                  lambda: db.invalidar_cache_clientes() or (), repeticoes))
+    casos.append(("get_cliente_por_codigo_x100_cache", buscar_clientes_x100, None, repeticoes))
+    # Exposição de crédito conferida ao salvar: a soma dos orçamentos em aberto no banco e pelo cache
+    casos.append(("exposicao_cliente_x100_consulta",
+                  lambda: [db._carregar_exposicao(c) for c in codigos_clientes], None, repeticoes))
+    casos.append(("exposicao_cliente_x100_cache",
+                  lambda: [db.get_exposicao_cliente(c) for c in codigos_clientes], None, repeticoes))
+
+    # Histórico de orçamentos: primeira página, a última página do terminal continuando da chave
+    # da anterior e a mesma página pulando linhas com OFFSET; e a primeira página por cliente e produto
+    chaves = [None]
+    while True:
+        pagina = db.buscar_historico_orcamentos({}, chaves[-1], TAMANHO_PAGINA)
+        if len(pagina) < TAMANHO_PAGINA:
+            break
+        chaves.append(db.chave_historico(pagina[-1]))
+    query, params = db._consulta_historico({}, None, TAMANHO_PAGINA)
+    query_offset = query.replace("SELECT TOP (?)", "SELECT", 1) + " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+    params_offset = params[1:] + [(len(chaves) - 1) * TAMANHO_PAGINA, TAMANHO_PAGINA]
+    casos.append(("historico_orcamentos_pagina_1",
+                  lambda: db.buscar_historico_orcamentos({}, None, TAMANHO_PAGINA), None, repeticoes))
+    casos.append((f"historico_orcamentos_pagina_{len(chaves)}_chave",
+                  lambda: db.buscar_historico_orcamentos({}, chaves[-1], TAMANHO_PAGINA), None, repeticoes))
+    casos.append((f"historico_orcamentos_pagina_{len(chaves)}_offset",
+                  lambda: list(db._iterar_consulta(query_offset, params_offset, db.MAPEADOR_HISTORICO)),
+                  None, repeticoes))
+    casos.append(("historico_orcamentos_cliente",
+                  lambda: db.buscar_historico_orcamentos({'codigo_cliente': codigos_clientes[0]}, None,
+                                                         TAMANHO_PAGINA), None, repeticoes))
+    casos.append(("historico_orcamentos_produto",
+                  lambda: db.buscar_historico_orcamentos({'codigo_produto': codigos[0]}, None, TAMANHO_PAGINA),
+                  None, repeticoes))
+
+    # Orçamentos em aberto com o produto que está em mais deles e o reajuste do preço dele em
+    # todos (mesmo preço a cada repetição: a transação dá o mesmo resultado)
+    produto_reajuste = _produto_em_mais_orcamentos_abertos(db)
+    com_produto = db.buscar_orcamentos_com_produto(produto_reajuste) if produto_reajuste else []
+    if not com_produto:
+        raise RuntimeError("Nenhum orçamento em aberto com itens no banco: "
+                           "reajustar_preco_orcamentos não teria o que medir")
+    casos.append(("orcamentos_com_produto", lambda: db.buscar_orcamentos_com_produto(produto_reajuste), None,
+                  repeticoes))
+    casos.append(("reajustar_preco_orcamentos",
+                  lambda: db.reajustar_preco_orcamentos(produto_reajuste, Decimal('10.00'), com_produto), None,
+                  repeticoes))
+
+    # Conferência da condição de pagamento ao escolher o cliente e ao salvar: antes, uma consulta
+    # de todas as condições e outra da condição escolhida; agora, a política carregada uma vez
+    from politica_pagamento import PoliticaPagamento
+    condicoes = [condicao['codigo'] for condicao in db.get_condicoes_pagamento_detalhadas()]
+
+    def conferir_consultas():
+        for codigo in condicoes:
+            condicao = next(c for c in db.get_condicoes_pagamento_detalhadas() if c['codigo'] == codigo)
+            db.validar_tipo_pagamento_permitido('1', condicao['tipo_pagamento'])
+            db.condicao_permite_sem_cliente(codigo)
+    politica = PoliticaPagamento()
+    politica.condicoes()
+    casos.append(("conferir_condicoes_pagamento_consultas", conferir_consultas, None, repeticoes))
+    casos.append(("conferir_condicoes_pagamento_politica",
+                  lambda: [(politica.validar('1', c), politica.permite_sem_cliente(c)) for c in condicoes],
+                  None, repeticoes))
+
+    for tamanho in TAMANHOS_ORCAMENTO:
+        casos.append((f"salvar_orcamento_{tamanho}",
+                      lambda o, i: db.salvar_orcamento(o, i),
+                      lambda t=tamanho: ctx.novo_orcamento(t)[:2], repeticoes))
+
+        orcamento, itens, _ = ctx.novo_orcamento(tamanho)
+        db.salvar_orcamento(orcamento, itens)
+        casos.append((f"atualizar_orcamento_{tamanho}",
+                      lambda o, i: db.atualizar_orcamento(o, i),
+                      lambda t=tamanho, n=orcamento.numero_nota: ctx.orcamento(n, t)[:2], repeticoes))
+        casos.append((f"carregar_orcamento_consultas_{tamanho}",
+                      lambda n=orcamento.numero_nota: _carregar_orcamento_consultas(db, n), None, repeticoes))
+
+    app = _criar_janela_principal()
+    if app is not None:
+        numero = db.get_proximo_numero_orcamento()
+        orcamento, itens, _ = ctx.orcamento(numero, 100)
+        db.salvar_orcamento(orcamento, itens)
+        casos.append(("carregar_orcamento_existente_100",
+                      lambda: app.carregar_orcamento_existente(numero), None, repeticoes))
+    else:
+        print("Sem tela disponível: carregar_orcamento_existente medido só pelas consultas.")
+
+    from ui.main_window import MainApplication
+    itens_desconto = ctx.itens_ui(ITENS_DESCONTO)
+    total_desconto = sum(item['subtotal'] for item in itens_desconto)
+    from rateio_desconto import ratear_desconto, limite_centavos
+    subtotais = [int(item['subtotal'] * 100) for item in itens_desconto]
+    limites = [limite_centavos(s, item['desconto_maximo']) for s, item in zip(subtotais, itens_desconto)]
+    casos.append((f"ratear_desconto_{ITENS_DESCONTO}",
+                  lambda: ratear_desconto(subtotais, limites, sum(subtotais) // 8), None, repeticoes))
+
+    from models import ItemBatch, LinhaItem
+    produtos_desconto = [{'codigo': i['codigo'], 'descricao': i['descricao'], 'unidade': i['unidade'],
+                          'preco': i['valor_unitario'], 'custo': i['custo'], 'desconto_maximo': i['desconto_maximo']}
+                         for i in itens_desconto]
+    quantidades_desconto = [i['quantidade'] for i in itens_desconto]
+    casos.append((f"item_batch_montar_{ITENS_DESCONTO}",
+                  lambda: ItemBatch(LinhaItem.de_produto(p, q) for p, q in zip(produtos_desconto, quantidades_desconto)),
+                  None, repeticoes))
+    lote = ItemBatch(LinhaItem.de_produto(p, q) for p, q in zip(produtos_desconto, quantidades_desconto))
+    casos.append((f"validar_e_distribuir_desconto_{ITENS_DESCONTO}",
+                  lambda: MainApplication.validar_e_distribuir_desconto(
+                      SimpleNamespace(itens=lote, total_orcamento=total_desconto),
+                      Decimal('12.5')),
+                  None, repeticoes))
+
+    casos.append((f"item_batch_ratear_desconto_{ITENS_DESCONTO}",
+                  lambda: lote.ratear_desconto(lote.total_centavos // 8), None, repeticoes))
+
+    from pdf_generator import gerar_pdf_orcamento
+    for tamanho in TAMANHOS_PDF:
+        orcamento, _, itens_ui = ctx.orcamento('999999', tamanho)
+        casos.append((f"gerar_pdf_orcamento_{tamanho}",
+                      lambda o=orcamento, i=itens_ui: gerar_pdf_orcamento(
+                          o, i, ctx.cliente, ctx.vendedor, '01 - A VISTA', 0.0, float(o.valor_total), abrir=False),
+                      None, max(1, repeticoes // 2)))
+    return casos
+
+
+def comparar(resultados, base, tolerancia, tolerancias_caso, minimo_ms):
+    """Devolve a lista de regressões: casos cuja mediana passou da base além da tolerância (%)."""
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = base.get('resultados', {}).get(nome)
+        if not anterior:
+            continue
+        limite_pct = tolerancias_caso.get(nome, tolerancia)
+        diferenca = atual['mediana_ms'] - anterior['mediana_ms']
+        if diferenca > minimo_ms and diferenca > anterior['mediana_ms'] * limite_pct / 100:
+            regressoes.append({
+                'caso': nome, 'base_ms': anterior['mediana_ms'], 'atual_ms': atual['mediana_ms'],
+                'variacao_pct': round(diferenca / anterior['mediana_ms'] * 100, 1) if anterior['mediana_ms'] else None,
+                'tolerancia_pct': limite_pct
+            })
+    return regressoes
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIR_RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos mais usados, no banco local.")
+    parser.add_argument('--banco', help="Pasta de um banco já gerado (com config.ini); sem ela, gera um novo")
+    parser.add_argument('--produtos', type=int, default=20000)
+    parser.add_argument('--clientes', type=int, default=10000)
+    parser.add_argument('--orcamentos', type=int, default=2000)
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filtro', help="Só executa os casos cujo nome contém este texto")
+    parser.add_argument('--saida', help="Arquivo JSON de saída (padrão: benchmarks/resultados/<commit>.json)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior usado como base")
+    parser.add_argument('--tolerancia', type=float, default=20.0, help="Piora máxima aceita, em %% da mediana")
+    parser.add_argument('--tolerancia-caso', action='append', default=[], metavar='CASO=PCT',
+                        help="Tolerância específica de um caso (pode repetir)")
+    parser.add_argument('--minimo-ms', type=float, default=1.0,
+                        help="Diferenças menores que isto nunca contam como regressão")
+    args = parser.parse_args()
+
+    pasta_temporaria = None
+    if args.banco:
+        caminho_config = os.path.join(args.banco, 'config.ini')
+    else:
+        pasta_temporaria = tempfile.mkdtemp(prefix='benchmark_orcamentos_')
+        caminho_banco = os.path.join(pasta_temporaria, 'banco_local.db')
+        gerar_banco(caminho_banco, args.produtos, args.clientes, args.orcamentos, args.linhas,
+                    semente=args.semente, progresso=lambda msg: None)
+        caminho_config = escrever_config(
+            os.path.join(pasta_temporaria, 'config.ini'), caminho_banco,
+            extras={'Diagnostico': {'limite_consulta_lenta_ms': '1000000'}}
+        )
+    os.environ['ORCAMENTOS_CONFIG'] = os.path.abspath(caminho_config)
+
+    try:
+        ctx = Contexto(args.produtos, args.semente)
+        resultados = {}
+        for nome, funcao, preparar, repeticoes in montar_casos(ctx, args.repeticoes):
+            if args.filtro and args.filtro not in nome:
+                continue
+            resultados[nome] = medir(funcao, preparar, repeticoes)
+            print(f"{nome:45s} {resultados[nome]['mediana_ms']:10.2f} ms")
+    finally:
+        if pasta_temporaria:
+            shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+    commit = _commit_atual()
+    saida = {
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'volumes': {'produtos': args.produtos, 'clientes': args.clientes, 'orcamentos': args.orcamentos,
+                    'linhas': args.linhas, 'semente': args.semente, 'banco': args.banco or 'gerado'},
+        'resultados': resultados,
+    }
+
+    codigo_saida = 0
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        tolerancias_caso = {}
+        for item in args.tolerancia_caso:
+            nome, _, pct = item.partition('=')
+            tolerancias_caso[nome] = float(pct)
+        regressoes = comparar(resultados, base, args.tolerancia, tolerancias_caso, args.minimo_ms)
+        saida['base'] = {'commit': base.get('commit'), 'arquivo': args.comparar}
+        saida['regressoes'] = regressoes
+        for r in regressoes:
+            print(f"REGRESSÃO {r['caso']}: {r['base_ms']:.2f} -> {r['atual_ms']:.2f} ms "
+                  f"(+{r['variacao_pct']}%, tolerância {r['tolerancia_pct']}%)")
+        if regressoes:
+            codigo_saida = 1
+
+    caminho_saida = args.saida or os.path.join(DIR_BENCHMARKS, 'resultados', f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(caminho_saida)), exist_ok=True)
+    with open(caminho_saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(saida, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {caminho_saida}")
+    sys.exit(codigo_saida)
+
+if __name__ == '__main__':
+    main()
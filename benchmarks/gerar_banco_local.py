@@ -0,0 +1,279 @@
+"""Cria um banco SQLite com o esquema das tabelas do VTi usadas pelo sistema e o
+preenche com dados sintéticos, para medir desempenho sem um SQL Server.
+
+Uso:
+    python benchmarks/gerar_banco_local.py --destino dados_locais --produtos 1000000 \
+        --clientes 500000 --orcamentos 500000 --linhas 5000000
+
+Além do banco, grava um config.ini no destino. Para usar o sistema com ele:
+    ORCAMENTOS_CONFIG=dados_locais/config.ini python src/main.py
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+ESQUEMA = [
+    """CREATE TABLE ANOTASNO (
+        AA_NFA CHAR(6) NOT NULL, AB_NFA CHAR(5), AC_NFA DATETIME, AD_NFA CHAR(2), AE_NFA CHAR(3),
+        AF_NFA CHAR(1), AG_NFA DATETIME, AH_NFA DATETIME, AI_NFA NUMERIC(15,2), AK_NFA CHAR(1),
+        AL_NFA CHAR(8), AN_NFA DATETIME, AP_NFA NUMERIC(15,2), AO_NFA CHAR(2) NOT NULL, AZ_NFA VARCHAR(40),
+        BC_NFA DATETIME, BD_NFA VARCHAR(40), BG_NFA DATETIME, BH_NFA CHAR(1), PROMOTOR_NFA VARCHAR(10),
+        BI_NFA NUMERIC(15,2), BJ_NFA NUMERIC(15,2), ENTRADADUP_NFA CHAR(1), OBSENTREGA_NFA VARCHAR(200),
+        NotaEmLancto_NFA CHAR(1), ORIGEM_NFA CHAR(1), LEITURA_NFA CHAR(1),
+        PRIMARY KEY (AA_NFA, AO_NFA)
+    )""",
+    """CREATE TABLE APRODUNO (
+        AA_PCA CHAR(6) NOT NULL, AL_PCA CHAR(2) NOT NULL, AB_PCA CHAR(6), AC_PCA CHAR(2),
+        AD_PCA NUMERIC(15,3), AE_PCA NUMERIC(15,4), AF_PCA NUMERIC(15,2), AG_PCA NUMERIC(15,2),
+        AI_PCA INTEGER, AK_PCA NUMERIC(15,4), AN_PCA NUMERIC(15,2), AO_PCA NUMERIC(15,2),
+        AP_PCA NUMERIC(15,2), AQ_PCA NUMERIC(15,2), QTDE_PCA NUMERIC(15,3), AR_PCA NUMERIC(15,2),
+        AS_PCA VARCHAR(20), AT_PCA CHAR(1), AU_PCA NUMERIC(15,2), AV_PCA NUMERIC(15,2),
+        AX_PCA NUMERIC(15,2), AY_PCA VARCHAR(20), AZ_PCA NUMERIC(15,2), BB_PCA CHAR(1)
+    )""",
+    """CREATE TABLE ACLIENGE (
+        CODIGO_CLI CHAR(5) PRIMARY KEY, NOME_CLI VARCHAR(60), CGCCPF_CLI VARCHAR(18), ENDER_CLI VARCHAR(60),
+        NUMER_CLI VARCHAR(10), DDD_CLI CHAR(3), TELEF_CLI VARCHAR(12), TIPO_CLI CHAR(1), BK_CLI CHAR(1),
+        BL_CLI NUMERIC(15,2)
+    )""",
+    "CREATE TABLE CE_PRODUTO (AU_ITE CHAR(6) PRIMARY KEY, AB_ITE VARCHAR(60), AH_ITE CHAR(2))",
+    """CREATE TABLE CE_PRODUTOS_ADICIONAIS (
+        CodReduzido CHAR(6) PRIMARY KEY, PrecoVendaMax NUMERIC(15,2), CustoMedio NUMERIC(15,4),
+        DescontoMaximo NUMERIC(5,2)
+    )""",
+    "CREATE TABLE AUNIDACE (AA_UNI CHAR(2) PRIMARY KEY, AB_UNI VARCHAR(20))",
+    "CREATE TABLE AVENDEGE (CODIGO_VEN CHAR(3) PRIMARY KEY, NOME_VEN VARCHAR(40))",
+    """CREATE TABLE ACONPGFA (
+        CODIGO_CPG CHAR(2) PRIMARY KEY, DESCRI_CPG VARCHAR(40), COND_CPG CHAR(1), PEDECLI_CPG CHAR(1),
+        VISPRA_CPG INTEGER
+    )""",
+    """CREATE TABLE AEMPREGE (
+        NOME_EMP VARCHAR(60), CGC_EMP VARCHAR(18), ENDER_EMP VARCHAR(60), NUMER_EMP VARCHAR(10),
+        BAIRR_EMP VARCHAR(40), CIDADE_EMP VARCHAR(40), ESTADO_EMP CHAR(2), DDD_EMP CHAR(3), TELEF_EMP VARCHAR(12)
+    )""",
+    "CREATE TABLE APARAMGE (BI_PGE VARCHAR(60), DescontoArquivo_PGE CHAR(1))",
+    """CREATE TABLE GE_USUARIOS_DESCONTOVENDEDOR (
+        CODUSUARIO_GUD VARCHAR(10), CODVENDEDOR_GUD CHAR(3), PERCENTMAX_GUD NUMERIC(5,2)
+    )""",
+    "CREATE TABLE USUARIOS (COD_USR VARCHAR(10), LOGIN_USR VARCHAR(20), NOME_USR VARCHAR(40), STATUS_USR CHAR(1))",
+]
+
+INDICES = [
+    "CREATE INDEX IX_APRODUNO_NOTA ON APRODUNO (AA_PCA, AL_PCA)",
+    "CREATE INDEX IX_CE_PRODUTO_DESCRICAO ON CE_PRODUTO (AB_ITE)",
+    "CREATE INDEX IX_ACLIENGE_NOME ON ACLIENGE (NOME_CLI)",
+    # Histórico de orçamentos e orçamentos com um produto (database._consulta_historico e
+    # buscar_orcamentos_com_produto). O SQLite não tem INCLUDE: as colunas lidas vão no fim
+    # da chave para o índice cobrir a consulta
+    "CREATE INDEX IX_ANOTASNO_HISTORICO ON ANOTASNO (AO_NFA, AC_NFA, AA_NFA, AB_NFA, AE_NFA, AF_NFA, AI_NFA,"
+    " NotaEmLancto_NFA)",
+    "CREATE INDEX IX_ANOTASNO_CLIENTE ON ANOTASNO (AB_NFA, AO_NFA, AC_NFA, AA_NFA, AE_NFA, AF_NFA, AI_NFA,"
+    " NotaEmLancto_NFA)",
+    "CREATE INDEX IX_APRODUNO_PRODUTO ON APRODUNO (AB_PCA, AL_PCA, AA_PCA, AD_PCA, AE_PCA)",
+]
+
+UNIDADES = [('01', 'UNIDADE'), ('02', 'METRO'), ('03', 'KILOGRAMA'), ('04', 'LITRO'), ('05', 'PECA'), ('06', 'CAIXA')]
+
+CONDICOES = [
+    ('01', 'A VISTA', 'N', 'N', 1), ('02', '30 DIAS', 'N', 'S', 2), ('03', '30/60 DIAS', 'N', 'S', 2),
+    ('04', 'CHEQUE A VISTA', 'N', 'S', 3), ('05', 'CHEQUE PRE 30 DIAS', 'N', 'S', 4),
+    ('06', 'CARTAO DE CREDITO', 'N', 'N', 5), ('07', 'CARTAO DE DEBITO', 'N', 'N', 7),
+    ('08', 'PIX', 'N', 'N', 9), ('09', 'TRANSFERENCIA', 'N', 'S', 8), ('10', 'CONDICAO ESPECIAL', 'S', 'S', 6),
+]
+
+TIPOS_PRODUTO = ['TUBO', 'CONEXÃO', 'CONEXAO', 'JOELHO', 'LUVA', 'TÊ', 'REGISTRO', 'TORNEIRA', 'PARAFUSO',
+                 'ARRUELA', 'CABO', 'FIO', 'DISJUNTOR', 'LÂMPADA', 'TOMADA', 'INTERRUPTOR', 'CAIXA', 'TINTA',
+                 'ARGAMASSA', 'CIMENTO', 'TELHA', 'BROCA', 'ADAPTADOR', 'REDUÇÃO', 'VÁLVULA', 'SIFÃO']
+MATERIAIS = ['PVC', 'AÇO', 'ACO', 'GALVANIZADO', 'COBRE', 'LATÃO', 'INOX', 'PLÁSTICO', 'CERÂMICA', 'ESMALTADO']
+MEDIDAS = ['20MM', '25MM', '32MM', '40MM', '50MM', '1/2"', '3/4"', '1"', '2,5MM', '4MM', '6MM', '10A', '16A',
+           '18L', '3,6L', '50KG', '20KG']
+MARCAS = ['TIGRE', 'AMANCO', 'FORTLEV', 'DECA', 'TRAMONTINA', 'PIAL', 'SIL', 'CORAL', 'SUVINIL', 'VOTORANTIM']
+
+NOMES = ['JOSÉ', 'JOAO', 'JOÃO', 'MARIA', 'ANA', 'ANTÔNIO', 'ANTONIO', 'FRANCISCO', 'CARLOS', 'PAULO',
+         'LUCAS', 'LUÍS', 'LUIZ', 'MÁRCIA', 'CONCEIÇÃO', 'SEBASTIÃO', 'FÁBIO', 'PATRÍCIA', 'RAIMUNDA', 'ANDRÉ']
+SOBRENOMES = ['SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'SOUSA', 'PEREIRA', 'LIMA', 'GONÇALVES', 'GONCALVES',
+              'ARAÚJO', 'RIBEIRO', 'CARVALHO', 'ALMEIDA', 'LOPES', 'FERNANDES', 'CONCEIÇÃO', 'ROCHA', 'MAGALHÃES']
+SUFIXOS_EMPRESA = ['CONSTRUÇÕES LTDA', 'MATERIAIS ME', 'ENGENHARIA EIRELI', 'REFORMAS LTDA', 'COMERCIO LTDA']
+RUAS = ['RUA DAS FLORES', 'AV. BRASIL', 'RUA SÃO JOÃO', 'RUA XV DE NOVEMBRO', 'AV. GETÚLIO VARGAS',
+        'RUA DA CONCEIÇÃO', 'TRAVESSA SANTA LUZIA', 'RUA PEDRO ÁLVARES CABRAL']
+
+
+def _digito_verificador(digitos, pesos):
+    resto = sum(d * p for d, p in zip(digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+def gerar_cpf(rng):
+    d = [rng.randint(0, 9) for _ in range(9)]
+    d.append(_digito_verificador(d, range(10, 1, -1)))
+    d.append(_digito_verificador(d, range(11, 1, -1)))
+    s = ''.join(map(str, d))
+    return f"{s[:3]}.{s[3:6]}.{s[6:9]}-{s[9:]}"
+
+def gerar_cnpj(rng):
+    d = [rng.randint(0, 9) for _ in range(8)] + [0, 0, 0, 1]
+    d.append(_digito_verificador(d, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    d.append(_digito_verificador(d, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    s = ''.join(map(str, d))
+    return f"{s[:2]}.{s[2:5]}.{s[5:8]}/{s[8:12]}-{s[12:]}"
+
+def criar_esquema(conn, com_indices=True):
+    for ddl in ESQUEMA:
+        conn.execute(ddl)
+    if com_indices:
+        criar_indices(conn)
+
+def criar_indices(conn):
+    for ddl in INDICES:
+        conn.execute(ddl)
+
+def _produtos(rng, quantidade):
+    for i in range(1, quantidade + 1):
+        descricao = f"{rng.choice(TIPOS_PRODUTO)} {rng.choice(MATERIAIS)} {rng.choice(MEDIDAS)} {rng.choice(MARCAS)}"
+        yield (f"{i:06d}", descricao, rng.choice(UNIDADES)[0])
+
+def _produtos_adicionais(rng, quantidade):
+    for i in range(1, quantidade + 1):
+        preco = round(rng.uniform(0.5, 900.0), 2)
+        custo = round(preco * rng.uniform(0.45, 0.8), 4)
+        desconto = rng.choice([0, 0, 5, 5, 10, 10, 15, 20])
+        yield (f"{i:06d}", preco, custo, desconto)
+
+def _clientes(rng, quantidade):
+    for i in range(1, quantidade + 1):
+        if rng.random() < 0.2:
+            nome = f"{rng.choice(SOBRENOMES)} {rng.choice(SUFIXOS_EMPRESA)}"
+            documento = gerar_cnpj(rng)
+        else:
+            nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+            documento = gerar_cpf(rng)
+        telefone = f"9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+        tipo = rng.choice('11112345678')
+        bloqueia = rng.choice('112')
+        limite = round(rng.uniform(500, 50000), 2) if bloqueia == '2' else 0
+        yield (f"{i:05d}", nome, documento, rng.choice(RUAS), str(rng.randint(1, 3000)),
+               rng.choice(['11', '19', '21', '31', '41', '51', '62']), telefone, tipo, bloqueia, limite)
+
+def _orcamentos(rng, quantidade, linhas, terminais, produtos, clientes, vendedores):
+    media_itens = max(1, round(linhas / quantidade)) if quantidade else 1
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    numeros = {terminal: 0 for terminal in terminais}
+    for _ in range(quantidade):
+        terminal = rng.choice(terminais)
+        numeros[terminal] += 1
+        numero = f"{numeros[terminal]:06d}"
+        data = (hoje - timedelta(days=rng.randint(0, 3 * 365))).isoformat(sep=' ')
+        itens = []
+        total = 0.0
+        for sequencia in range(1, rng.randint(1, 2 * media_itens - 1) + 1):
+            codigo = f"{rng.randint(1, produtos):06d}"
+            quantidade_item = rng.choice([1, 1, 2, 3, 5, 10, 12.5])
+            preco = round(rng.uniform(0.5, 900.0), 2)
+            subtotal = round(quantidade_item * preco, 2)
+            desconto = round(subtotal * rng.choice([0, 0, 0, 0.05]), 2)
+            total += subtotal
+            itens.append((numero, terminal, codigo, '01', quantidade_item, preco, desconto, subtotal, sequencia,
+                          round(preco * 0.6, 4), subtotal, 0, 0, 0, 0, 0, '', 'N', 0, 0, 0, '', 0, 'N'))
+        status = '8' if rng.random() < 0.6 else '1'
+        cliente = f"{rng.randint(1, clientes):05d}" if clientes else ''
+        cabecalho = (numero, cliente, data, rng.choice(CONDICOES)[0], rng.choice(vendedores), status, data, data,
+                     round(total, 2), '1', f"{rng.randint(8, 18):02d}:{rng.randint(0, 59):02d}:00", data, 0, terminal,
+                     '', None, '', None, 'N', '', 0, 0, 'N', None, 'N', 'N', 'N')
+        yield cabecalho, itens
+
+def gerar_banco(caminho, produtos=10000, clientes=5000, orcamentos=2000, linhas=20000,
+                terminais=('01', '02', '03', '04', '05'), vendedores=20, semente=42, progresso=print):
+    """Cria (ou recria) o banco local em `caminho` com os volumes informados."""
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    rng = random.Random(semente)
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    criar_esquema(conn, com_indices=False)
+
+    inicio = time.perf_counter()
+    codigos_vendedores = [f"{i:03d}" for i in range(1, vendedores + 1)]
+    conn.executemany("INSERT INTO AUNIDACE VALUES (?, ?)", UNIDADES)
+    conn.executemany("INSERT INTO ACONPGFA VALUES (?, ?, ?, ?, ?)", CONDICOES)
+    conn.executemany("INSERT INTO AVENDEGE VALUES (?, ?)",
+                     [(c, f"VENDEDOR {rng.choice(NOMES)} {rng.choice(SOBRENOMES)}") for c in codigos_vendedores])
+    conn.execute("INSERT INTO AEMPREGE VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 ('MATERIAIS DE CONSTRUÇÃO EXEMPLO LTDA', gerar_cnpj(rng), 'AV. BRASIL', '1000', 'CENTRO',
+                  'SÃO PAULO', 'SP', '11', '3333-4444'))
+    conn.execute("INSERT INTO APARAMGE VALUES (?, ?)", ('Dia+Mes', 'S'))
+    conn.executemany("INSERT INTO GE_USUARIOS_DESCONTOVENDEDOR VALUES (?, ?, ?)",
+                     [(f"U{c}", c, 10) for c in codigos_vendedores[:3]])
+    conn.executemany("INSERT INTO USUARIOS VALUES (?, ?, ?, ?)",
+                     [(f"U{c}", f"usuario{c}", f"USUARIO {c}", 'S') for c in codigos_vendedores[:3]])
+
+    conn.executemany("INSERT INTO CE_PRODUTO VALUES (?, ?, ?)", _produtos(rng, produtos))
+    conn.executemany("INSERT INTO CE_PRODUTOS_ADICIONAIS VALUES (?, ?, ?, ?)", _produtos_adicionais(rng, produtos))
+    progresso(f"Produtos: {produtos} ({time.perf_counter() - inicio:.1f}s)")
+
+    conn.executemany("INSERT INTO ACLIENGE VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _clientes(rng, clientes))
+    progresso(f"Clientes: {clientes} ({time.perf_counter() - inicio:.1f}s)")
+
+    total_linhas = 0
+    sql_cabecalho = f"INSERT INTO ANOTASNO VALUES ({', '.join(['?'] * 27)})"
+    sql_itens = f"INSERT INTO APRODUNO VALUES ({', '.join(['?'] * 24)})"
+    lote_cabecalhos, lote_itens = [], []
+    for cabecalho, itens in _orcamentos(rng, orcamentos, linhas, list(terminais), produtos, clientes, codigos_vendedores):
+        lote_cabecalhos.append(cabecalho)
+        lote_itens.extend(itens)
+        if len(lote_itens) >= 50000:
+            conn.executemany(sql_cabecalho, lote_cabecalhos)
+            conn.executemany(sql_itens, lote_itens)
+            total_linhas += len(lote_itens)
+            lote_cabecalhos, lote_itens = [], []
+    conn.executemany(sql_cabecalho, lote_cabecalhos)
+    conn.executemany(sql_itens, lote_itens)
+    total_linhas += len(lote_itens)
+    progresso(f"Orçamentos: {orcamentos}, linhas: {total_linhas} ({time.perf_counter() - inicio:.1f}s)")
+
+    criar_indices(conn)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    progresso(f"Banco gerado em {caminho} ({time.perf_counter() - inicio:.1f}s)")
+
+def escrever_config(caminho_config, caminho_banco, terminal='01', extras=None):
+    """Grava um config.ini apontando para o banco local.
+
+    extras: dict {secao: {chave: valor}} acrescentado ao arquivo.
+    """
+    secoes = {
+        'Database': {'backend': 'sqlite', 'database': os.path.abspath(caminho_banco)},
+        'Application': {'terminal': terminal, 'deposito': '01', 'timeout': '10', 'fullscreen': '0'},
+        'Diagnostico': {'limite_consulta_lenta_ms': '500', 'salvar_estatisticas': '0'},
+    }
+    for secao, valores in (extras or {}).items():
+        secoes.setdefault(secao, {}).update(valores)
+    with open(caminho_config, 'w', encoding='utf-8') as arquivo:
+        for secao, valores in secoes.items():
+            arquivo.write(f"[{secao}]\n")
+            for chave, valor in valores.items():
+                arquivo.write(f"{chave} = {valor}\n")
+            arquivo.write("\n")
+    return caminho_config
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco SQLite local com dados sintéticos do VTi.")
+    parser.add_argument('--destino', default='dados_locais', help="Pasta onde o banco e o config.ini serão criados")
+    parser.add_argument('--produtos', type=int, default=10000)
+    parser.add_argument('--clientes', type=int, default=5000)
+    parser.add_argument('--orcamentos', type=int, default=2000)
+    parser.add_argument('--linhas', type=int, default=20000, help="Total aproximado de itens de orçamento")
+    parser.add_argument('--terminais', default='01,02,03,04,05')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.destino, exist_ok=True)
+    caminho_banco = os.path.join(args.destino, 'banco_local.db')
+    gerar_banco(caminho_banco, args.produtos, args.clientes, args.orcamentos, args.linhas,
+                tuple(args.terminais.split(',')), semente=args.semente)
+    print(f"Configuração: {escrever_config(os.path.join(args.destino, 'config.ini'), caminho_banco)}")
+
+if __name__ == '__main__':
+    main()
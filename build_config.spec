@@ -11,6 +11,19 @@ a = Analysis(
         ('src/database.py', '.'),
         ('src/models.py', '.'),
         ('src/pdf_generator.py', '.'),
+        ('src/metrics.py', '.'),
+        ('src/sqlite_shim.py', '.'),
+        ('src/rateio_desconto.py', '.'),
+        ('src/dinheiro.py', '.'),
+        ('src/cache.py', '.'),
+        ('src/busca.py', '.'),
+        ('src/indice_busca.py', '.'),
+        ('src/mapeamento.py', '.'),
+        ('src/resiliencia.py', '.'),
+        ('src/replica.py', '.'),
+        ('src/catalogo.py', '.'),
+        ('src/catalogo_arquivo.py', '.'),
+        ('src/politica_pagamento.py', '.'),
         ('ico', 'ico'),
     ],
     hiddenimports=[
@@ -0,0 +1,402 @@
+"""Resultados das janelas de busca: carga por páginas, índice em memória e refinamento local.
+
+ResultadosPaginados busca as páginas conforme a lista rola. BuscaIncremental
+monta em segundo plano o índice de busca do cadastro (indice_busca) e, quando
+pronto, resolve o termo nele e só busca no banco os detalhes da página; até lá,
+usa a consulta com LIKE. Também guarda os resultados completos dos termos
+recentes: se o novo termo contém um deles (o usuário continuou digitando), o
+resultado é um subconjunto e sai do filtro local; apagar letras volta a um termo
+já visto e sai do cache. BuscaCatalogo é a busca de produtos servida pela
+cópia local do catálogo (catalogo.py), sincronizada em segundo plano. BuscaDocumentos atende os termos com cara de CPF/CNPJ
+ou telefone pelo índice de dígitos dos clientes. ConsultaEmSegundoPlano roda a
+busca numa thread, cancelável quando o usuário digita de novo ou fecha a janela.
+"""
+import threading
+import time
+
+try:
+    from .cache import CacheLRU
+    from .indice_busca import IndiceBusca, IndiceDocumentos, normalizar, somente_digitos, tokenizar, corresponde, chave_ordenacao
+    from .metrics import registrar_cache, registrar_sincronizacao
+    from .database import Cancelamento, ErroConsulta, get_produto_por_codigo
+except ImportError:
+    from cache import CacheLRU
+    from indice_busca import IndiceBusca, IndiceDocumentos, normalizar, somente_digitos, tokenizar, corresponde, chave_ordenacao
+    from metrics import registrar_cache, registrar_sincronizacao
+    from database import Cancelamento, ErroConsulta, get_produto_por_codigo
+
+TAMANHO_PAGINA = 100
+TERMOS_RECENTES = 16
+VALIDADE_RESULTADOS = 300
+
+
+class ResultadosPaginados:
+    """Resultado de busca carregado por páginas, sob demanda, com mapa id -> posição.
+
+    buscar_pagina(inicio, quantidade) devolve a lista de registros (dicts) da página.
+    Sem `total`, uma página menor que `tamanho_pagina` marca o fim do resultado.
+    As chaves da lista são os ids dos registros (campo `campo_id`).
+    Se uma página não vem (tempo esgotado, busca cancelada), o erro fica em `erro`
+    e a lista segue com o que já carregou; a próxima garantir() tenta de novo.
+    """
+
+    def __init__(self, buscar_pagina, campo_id='codigo', tamanho_pagina=TAMANHO_PAGINA, total=None):
+        self.buscar_pagina = buscar_pagina
+        self.campo_id = campo_id
+        self.tamanho_pagina = tamanho_pagina
+        self.total = total
+        self.registros = []
+        self.posicoes = {}
+        self.consumidos = 0
+        self.completo = total == 0
+        self.erro = None
+
+    @classmethod
+    def de_lista(cls, registros, campo_id='codigo'):
+        """Resultado já carregado por inteiro (listas pequenas ou filtradas localmente)."""
+        resultados = cls(None, campo_id)
+        resultados._acrescentar(registros)
+        resultados.completo = True
+        return resultados
+
+    @classmethod
+    def por_chave(cls, buscar_apos, chave, campo_id='codigo', tamanho_pagina=TAMANHO_PAGINA):
+        """Resultado paginado por chave: buscar_apos(apos, quantidade) devolve os registros
+        seguintes ao de chave `apos` (None na primeira página) e chave(registro) dá essa chave.
+
+        Cada página continua da última linha da anterior, em vez de pular `inicio` linhas.
+        """
+        ultimas = {0: None}
+
+        def buscar_pagina(inicio, quantidade):
+            pagina = buscar_apos(ultimas[inicio], quantidade)
+            if pagina:
+                ultimas[inicio + quantidade] = chave(pagina[-1])
+            return pagina
+
+        return cls(buscar_pagina, campo_id, tamanho_pagina)
+
+    def _acrescentar(self, registros):
+        for registro in registros:
+            chave = registro[self.campo_id]
+            # Linhas repetidas entre páginas (cadastro alterado durante a rolagem) ficam só na primeira
+            if chave not in self.posicoes:
+                self.posicoes[chave] = len(self.registros)
+                self.registros.append(registro)
+
+    def garantir(self, quantidade):
+        """Busca páginas até ter `quantidade` registros ou chegar ao fim do resultado."""
+        self.erro = None
+        while not self.completo and len(self.registros) < quantidade:
+            try:
+                pagina = self.buscar_pagina(self.consumidos, self.tamanho_pagina)
+            except ErroConsulta as e:
+                self.erro = e
+                return
+            self.consumidos += self.tamanho_pagina
+            self._acrescentar(pagina)
+            if self.total is None:
+                self.completo = len(pagina) < self.tamanho_pagina
+            else:
+                self.completo = self.consumidos >= self.total
+
+    def __len__(self):
+        return len(self.registros)
+
+    def __contains__(self, chave):
+        return chave in self.posicoes
+
+    def chave_na_posicao(self, posicao):
+        return self.registros[posicao][self.campo_id]
+
+    def posicao_da_chave(self, chave):
+        return self.posicoes[chave]
+
+    def registro(self, chave):
+        return self.registros[self.posicoes[chave]]
+
+
+class _IndiceEmSegundoPlano:
+    """Índice montado numa thread a partir de listar() (None se a listagem falhar).
+
+    estado_indice: None (não pedido), 'carregando', 'pronto' ou 'erro'.
+    Com `remontar_a_cada` (segundos), depois de pronto o índice é montado de novo
+    nesse intervalo e trocado de uma vez, para incluir cadastros novos e alterados;
+    se a remontagem falha, continua o anterior.
+    """
+
+    def __init__(self, listar, montar, remontar_a_cada=0):
+        self.listar = listar
+        self.montar = montar
+        self.remontar_a_cada = remontar_a_cada
+        self.indice = None
+        self.estado_indice = None
+
+    def carregar_indice(self):
+        if self.listar is None or self.estado_indice in ('carregando', 'pronto'):
+            return
+        self.estado_indice = 'carregando'
+        threading.Thread(target=self._montar_indice, daemon=True).start()
+
+    def _montar_indice(self):
+        try:
+            dados = self.listar()
+            if dados is None:
+                self.estado_indice = 'erro'
+                return
+            self._trocar_indice(self.montar(dados))
+            self.estado_indice = 'pronto'
+        except Exception as e:
+            print(f"Erro ao montar índice de busca: {e}")
+            self.estado_indice = 'erro'
+            return
+        if self.remontar_a_cada:
+            self._remontar_periodicamente()
+
+    def _remontar_periodicamente(self):
+        while True:
+            time.sleep(self.remontar_a_cada)
+            try:
+                dados = self.listar()
+                if dados is not None:
+                    self._trocar_indice(self.montar(dados))
+            except Exception as e:
+                print(f"Erro ao remontar índice de busca: {e}")
+
+    def _trocar_indice(self, indice):
+        self.indice = indice
+        self._indice_pronto()
+
+    def _indice_pronto(self):
+        pass
+
+
+class BuscaIncremental(_IndiceEmSegundoPlano):
+    """Busca de uma janela (clientes, produtos) com índice em memória, refinamento local e cache de termos.
+
+    buscar(termo_inteligente=..., inicio=..., quantidade=..., codigos=...) é a função de database;
+    campo_texto é o campo do registro comparado com o termo junto com o código;
+    listar_catalogo() devolve os pares (código, texto) para o índice, ou None se falhar.
+    Enquanto o índice não fica pronto, as buscas usam a consulta com LIKE.
+    """
+
+    def __init__(self, nome, buscar, campo_texto, listar_catalogo=None, remontar_a_cada=0):
+        super().__init__(listar_catalogo, IndiceBusca, remontar_a_cada)
+        self.buscar = buscar
+        self.campo_texto = campo_texto
+        self.recentes = CacheLRU(TERMOS_RECENTES, VALIDADE_RESULTADOS)
+        self._atual = None
+        self._lock = threading.Lock()
+        self.locais = 0
+        self.servidor = 0
+        registrar_cache(nome, self.estatisticas)
+
+    def _trocar_indice(self, indice):
+        with self._lock:
+            super()._trocar_indice(indice)
+            self._atual = None
+
+    def _indice_pronto(self):
+        # Os resultados guardados vieram da consulta com LIKE, que tem outra regra de
+        # busca, ou do índice anterior, que não tem os cadastros novos
+        self.recentes.limpar()
+
+    def _guardar_atual(self):
+        # O resultado anterior só entra no cache se a rolagem chegou ao fim dele
+        # e se o índice não mudou desde a busca
+        if self._atual is not None:
+            chave, resultados, indice = self._atual
+            if resultados.completo and indice is self.indice:
+                self.recentes.colocar(chave, resultados.registros)
+            self._atual = None
+
+    def _base_local(self, chave):
+        """Menor resultado completo cujo termo está contido em `chave`, ou None.
+
+        Palavras de 1 ou 2 letras só procuram no texto, e as maiores também no código:
+        o resultado de "AB" não tem o registro cujo código contém "ABC". Por isso só
+        serve de base um termo em que toda palavra tem 3 letras ou mais.
+        """
+        melhor = None
+        for termo, registros in self.recentes.itens():
+            if (termo in chave and all(len(token) >= 3 for token in termo.split())
+                    and (melhor is None or len(registros) < len(melhor))):
+                melhor = registros
+        return melhor
+
+    def _pagina_indice(self, indice, posicoes):
+        def buscar_pagina(inicio, quantidade):
+            codigos = [indice.codigos[posicao] for posicao in posicoes[inicio:inicio + quantidade]]
+            por_codigo = {registro['codigo']: registro for registro in self.buscar(codigos=codigos)}
+            # Produto ou cliente excluído depois de montado o índice fica de fora da página
+            return [por_codigo[codigo] for codigo in codigos if codigo in por_codigo]
+        return buscar_pagina
+
+    def resultados(self, termo):
+        """ResultadosPaginados do termo, local quando possível."""
+        if self.estado_indice is None:
+            self.carregar_indice()
+        # Uma busca cancelada ainda pode estar terminando em outra thread
+        with self._lock:
+            return self._resultados(termo)
+
+    def _resultados(self, termo):
+        self._guardar_atual()
+        termo = termo or None
+        chave = ' '.join(tokenizar(normalizar(termo)))
+
+        registros = self.recentes.obter(chave)
+        if registros is None:
+            base = self._base_local(chave)
+            if base is not None:
+                campo = self.campo_texto
+                registros = sorted(
+                    (registro for registro in base if corresponde(registro['codigo'], registro[campo], termo)),
+                    key=lambda registro: chave_ordenacao(registro['codigo'], registro[campo], termo))
+                self.recentes.colocar(chave, registros)
+        if registros is not None:
+            self.locais += 1
+            return ResultadosPaginados.de_lista(registros)
+
+        self.servidor += 1
+        indice = self.indice
+        if indice is not None:
+            posicoes = indice.buscar(termo)
+            resultados = ResultadosPaginados(self._pagina_indice(indice, posicoes), total=len(posicoes))
+        else:
+            resultados = ResultadosPaginados(
+                lambda inicio, quantidade: self.buscar(termo_inteligente=termo, inicio=inicio, quantidade=quantidade))
+        self._atual = (chave, resultados, indice)
+        return resultados
+
+    def limpar(self):
+        self.recentes.limpar()
+        self._atual = None
+
+    def estatisticas(self):
+        return {'itens': len(self.recentes), 'acertos': self.locais, 'falhas': self.servidor}
+
+
+class BuscaCatalogo(BuscaIncremental):
+    """BuscaIncremental em que o "índice" é o catalogo.CatalogoProdutos: as páginas saem da
+    cópia local, sem consulta ao banco.
+
+    A cada `intervalo` segundos (0 = nunca) uma thread traz do banco só o que mudou
+    (SincronizadorCatalogo.sincronizar) e troca o catálogo de uma vez. O catálogo
+    reaberto do disco, do último uso, é sincronizado logo ao ficar pronto.
+    """
+
+    def __init__(self, nome, buscar, campo_texto, sincronizador, intervalo):
+        super().__init__(nome, buscar, campo_texto, sincronizador.carregar)
+        self.montar = lambda catalogo: catalogo
+        self.sincronizador = sincronizador
+        self.intervalo = intervalo
+        self._sincronizando = False
+        registrar_sincronizacao(nome, sincronizador.estatisticas)
+
+    def _indice_pronto(self):
+        super()._indice_pronto()
+        if (self.intervalo or self.indice.reaberto) and not self._sincronizando:
+            self._sincronizando = True
+            threading.Thread(target=self._sincronizar_periodicamente, daemon=True).start()
+
+    def _sincronizar_periodicamente(self):
+        espera = 0 if self.indice.reaberto else self.intervalo
+        while True:
+            time.sleep(espera)
+            try:
+                self.sincronizar()
+            except Exception as e:
+                print(f"Erro ao sincronizar catálogo: {e}")
+            if not self.intervalo:
+                return
+            espera = self.intervalo
+
+    def sincronizar(self):
+        """Traz as alterações do banco e troca o catálogo; devolve o relatório da sincronização."""
+        catalogo = self.indice
+        if catalogo is None:
+            return None
+        novo = self.sincronizador.sincronizar(catalogo)
+        with self._lock:
+            mudou = novo is not catalogo
+            self.indice = novo
+            if mudou:
+                # Os resultados guardados têm os preços e a lista de antes
+                self.recentes.limpar()
+                self._atual = None
+        return self.sincronizador.ultimo_relatorio
+
+    def produto(self, codigo):
+        """Produto pelo código, da cópia local quando pronta; o banco atende enquanto ela
+        carrega e o produto que ainda não chegou nela (criado depois da última sincronização)."""
+        catalogo = self.indice
+        if catalogo is not None:
+            produto = catalogo.produto(codigo)
+            if produto is not None:
+                return produto
+        return get_produto_por_codigo(codigo)
+
+    def _pagina_indice(self, catalogo, posicoes):
+        # Só os produtos da página viram dicts; o resto continua no arquivo
+        def buscar_pagina(inicio, quantidade):
+            return [catalogo.registro(posicao) for posicao in posicoes[inicio:inicio + quantidade]]
+        return buscar_pagina
+
+
+class BuscaDocumentos(_IndiceEmSegundoPlano):
+    """Clientes por CPF/CNPJ ou telefone, pelo índice de dígitos (busca direta no dict).
+
+    buscar(codigos=...) / buscar(digitos=...) é database.buscar_clientes; sem o
+    índice pronto, a consulta compara os dígitos no banco (varre a tabela).
+    listar_documentos() devolve (código, CPF/CNPJ, DDD, telefone) de todos os clientes.
+    """
+
+    def __init__(self, buscar, listar_documentos, remontar_a_cada=0):
+        super().__init__(listar_documentos, IndiceDocumentos, remontar_a_cada)
+        self.buscar = buscar
+
+    def resultados(self, termo):
+        if self.estado_indice is None:
+            self.carregar_indice()
+        indice = self.indice
+        if indice is not None:
+            codigos = indice.buscar(termo)
+            registros = self.buscar(codigos=codigos) if codigos else []
+        else:
+            registros = self.buscar(digitos=somente_digitos(termo))
+        return ResultadosPaginados.de_lista(registros)
+
+
+class ConsultaEmSegundoPlano:
+    """Executa obter_resultados() e carrega as primeiras `quantidade` linhas numa thread.
+
+    A janela consulta `concluida` com after() e então usa `resultados` ou `erro`
+    (ErroConsulta: tempo esgotado ou cancelada). cancelar() interrompe a consulta
+    em andamento no banco.
+    """
+
+    def __init__(self, obter_resultados, quantidade=TAMANHO_PAGINA):
+        self.cancelamento = Cancelamento()
+        self.resultados = None
+        self.erro = None
+        self.concluida = False
+        threading.Thread(target=self._executar, args=(obter_resultados, quantidade), daemon=True).start()
+
+    def _executar(self, obter_resultados, quantidade):
+        with self.cancelamento:
+            try:
+                resultados = obter_resultados()
+                resultados.garantir(quantidade)
+                self.erro = resultados.erro
+                self.resultados = resultados
+            except ErroConsulta as e:
+                self.erro = e
+            except Exception as e:
+                print(f"Erro na busca: {e}")
+                self.erro = e
+            finally:
+                self.concluida = True
+
+    def cancelar(self):
+        self.cancelamento.cancelar()
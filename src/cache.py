@@ -0,0 +1,192 @@
+"""Cache LRU em memória, com validade opcional por entrada, e cache de registros
+do banco atualizados em segundo plano."""
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """Guarda até `capacidade` entradas, descartando a usada há mais tempo.
+
+    Com `validade` (segundos), entradas mais antigas que isso deixam de ser
+    devolvidas. É seguro para uso entre threads.
+    """
+
+    def __init__(self, capacidade=128, validade=None):
+        self.capacidade = capacidade
+        self.validade = validade
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def _vencida(self, instante):
+        return self.validade is not None and time.monotonic() - instante > self.validade
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None or self._vencida(entrada[1]):
+                if entrada is not None:
+                    del self._dados[chave]
+                self.falhas += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return entrada[0]
+
+    def colocar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (valor, time.monotonic())
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.capacidade:
+                self._dados.popitem(last=False)
+
+    def alterar(self, chave, funcao):
+        """Troca o valor de `chave` por funcao(valor), se presente, sem mudar a idade nem contar acerto."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None:
+                self._dados[chave] = (funcao(entrada[0]), entrada[1])
+
+    def remover(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def itens(self):
+        """(chave, valor) das entradas válidas, da mais recente para a mais antiga; não conta acerto."""
+        with self._lock:
+            return [(chave, valor) for chave, (valor, instante) in reversed(self._dados.items())
+                    if not self._vencida(instante)]
+
+    def __len__(self):
+        return len(self._dados)
+
+    def __contains__(self, chave):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            return entrada is not None and not self._vencida(entrada[1])
+
+    def estatisticas(self):
+        """Formato esperado por metrics.registrar_cache."""
+        return {'itens': len(self._dados), 'acertos': self.acertos, 'falhas': self.falhas}
+
+
+class CacheAtualizado:
+    """Registros carregados por carregar(chave), em um CacheLRU, atualizados numa thread.
+
+    Entrada com mais de `atualizar_apos` segundos é devolvida na hora e entra na
+    fila de recarga; com mais de `validade`, a leitura volta ao banco. Se essa
+    leitura falhar com uma das exceções de `erros_toleraveis` (tempo esgotado),
+    o registro vencido ainda é devolvido. carregar devolve None para registro
+    inexistente (não fica no cache).
+
+    alterar e invalidar dão uma versão nova à chave; uma leitura começada antes
+    disso não é guardada, para não desfazer o ajuste com o valor lido antes dele.
+    """
+
+    def __init__(self, carregar, capacidade=128, atualizar_apos=60, validade=900, erros_toleraveis=()):
+        self.carregar = carregar
+        self.atualizar_apos = atualizar_apos
+        self.validade = validade
+        self.erros_toleraveis = erros_toleraveis
+        self.cache = CacheLRU(capacidade)
+        self._fila = queue.Queue()
+        self._pendentes = set()
+        self._versoes = {}
+        self._geracao = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def obter(self, chave):
+        entrada = self.cache.obter(chave)
+        if entrada is not None:
+            valor, carregado = entrada
+            idade = time.monotonic() - carregado
+            if idade <= self.validade:
+                if idade > self.atualizar_apos:
+                    self._agendar(chave)
+                return valor
+        versao = self._versao(chave)
+        try:
+            valor = self.carregar(chave)
+        except self.erros_toleraveis:
+            if entrada is None:
+                raise
+            return entrada[0]
+        self._guardar_carregado(chave, valor, versao)
+        return valor
+
+    def colocar(self, chave, valor):
+        self.cache.colocar(chave, (valor, time.monotonic()))
+
+    def _versao(self, chave):
+        with self._lock:
+            return self._geracao, self._versoes.get(chave, 0)
+
+    def _nova_versao(self, chave):
+        # Chamado com self._lock
+        self._versoes[chave] = self._versoes.get(chave, 0) + 1
+
+    def _guardar_carregado(self, chave, valor, versao):
+        """Guarda o valor lido por carregar, se a chave não mudou desde o início da leitura."""
+        with self._lock:
+            if (self._geracao, self._versoes.get(chave, 0)) != versao:
+                return
+            if valor is None:
+                self.cache.remover(chave)
+            else:
+                self.colocar(chave, valor)
+
+    def alterar(self, chave, funcao):
+        """Aplica funcao ao registro guardado de `chave` (ajuste local depois de uma gravação); a
+        recarga pelo banco continua no prazo da leitura original. Sem registro guardado, nada muda."""
+        with self._lock:
+            self._nova_versao(chave)
+            self.cache.alterar(chave, lambda entrada: (funcao(entrada[0]), entrada[1]))
+
+    def antecipar(self, chave):
+        """Carrega `chave` na thread de recarga, se não está no cache: a leitura seguinte não espera o banco."""
+        if chave not in self.cache:
+            self._agendar(chave)
+
+    def invalidar(self, chave=None):
+        """Descarta a entrada `chave`, ou todas sem chave."""
+        with self._lock:
+            if chave is None:
+                self._geracao += 1
+                self._versoes.clear()
+                self.cache.limpar()
+            else:
+                self._nova_versao(chave)
+                self.cache.remover(chave)
+
+    def pendentes(self):
+        return len(self._pendentes)
+
+    def _agendar(self, chave):
+        with self._lock:
+            if chave in self._pendentes:
+                return
+            self._pendentes.add(chave)
+            self._fila.put(chave)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._recarregar, daemon=True)
+                self._thread.start()
+
+    def _recarregar(self):
+        while True:
+            chave = self._fila.get()
+            try:
+                versao = self._versao(chave)
+                self._guardar_carregado(chave, self.carregar(chave), versao)
+            except Exception as e:
+                print(f"Erro ao atualizar cache: {e}")
+            finally:
+                with self._lock:
+                    self._pendentes.discard(chave)
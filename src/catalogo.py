@@ -0,0 +1,204 @@
+"""Cópia local do catálogo de produtos (CE_PRODUTO + CE_PRODUTOS_ADICIONAIS), sincronizada por diferença.
+
+A janela de produtos busca e mostra os produtos desta cópia, sem ir ao banco
+a cada página. Para ela acompanhar as mudanças de preço do dia sem baixar o
+catálogo de novo, sincronizar() traz só o que mudou desde a última marca
+d'água (database.get_alteracoes_catalogo):
+
+- com o change tracking do SQL Server ativo em CE_PRODUTO e
+  CE_PRODUTOS_ADICIONAIS, os códigos alterados desde a última versão;
+- sem ele, o CHECKSUM_AGG de cada uma das FAIXAS_CATALOGO faixas de códigos
+  é comparado com o da sincronização anterior, e só as faixas diferentes são
+  baixadas.
+
+A cópia fica em disco, num arquivo compacto mapeado em memória
+(catalogo_arquivo): a busca lê o arquivo no lugar e, ao abrir o sistema, o
+catálogo do último uso está pronto na hora e é sincronizado em seguida.
+
+Cada CatalogoProdutos é uma fotografia que não muda depois de aberta: a
+sincronização grava outro arquivo e a busca troca a referência de uma vez, de
+modo que uma consulta em andamento nunca vê o catálogo pela metade. Quando só
+mudam unidade, preço, custo ou desconto, o arquivo novo é uma cópia do atual
+com esses valores trocados; mudando códigos ou descrições, é montado de novo.
+"""
+import os
+import time
+from itertools import chain
+
+try:
+    from .database import (COLUNAS_CATALOGO, MAPEADOR_PRODUTOS, get_catalogo_completo, get_alteracoes_catalogo,
+                           get_arquivo_catalogo_config)
+    from .catalogo_arquivo import (ArquivoCatalogo, IndiceArquivo, escrever, copiar_com_valores, gravar_marca,
+                                   abrir_mais_recente, proximo_caminho, remover_antigos)
+    from .metrics import tamanho_linhas
+except ImportError:
+    from database import (COLUNAS_CATALOGO, MAPEADOR_PRODUTOS, get_catalogo_completo, get_alteracoes_catalogo,
+                          get_arquivo_catalogo_config)
+    from catalogo_arquivo import (ArquivoCatalogo, IndiceArquivo, escrever, copiar_com_valores, gravar_marca,
+                                  abrir_mais_recente, proximo_caminho, remover_antigos)
+    from metrics import tamanho_linhas
+
+_FAIXA, _CODIGO = 0, 1
+# Linha (tupla na ordem de COLUNAS_CATALOGO) -> dict igual ao de database.buscar_produtos
+_registro = MAPEADOR_PRODUTOS.compilar([(coluna,) for coluna in COLUNAS_CATALOGO])
+
+
+def _codigo(linha):
+    return (linha[_CODIGO] or '').strip()
+
+
+class CatalogoProdutos:
+    """Fotografia do catálogo aberta de um arquivo, com a marca d'água da sincronização.
+
+    Faz o papel do índice em busca.BuscaIncremental (buscar, codigos) e dá os
+    registros de cada página com registro(posicao). `reaberto`: veio do disco,
+    do último uso, e ainda não foi sincronizado.
+    """
+
+    def __init__(self, arquivo, reaberto=False):
+        self.arquivo = arquivo
+        self.marca = arquivo.marca
+        self.reaberto = reaberto
+        self.indice = IndiceArquivo(arquivo)
+        self.codigos = self.indice.codigos
+
+    def __len__(self):
+        return len(self.arquivo)
+
+    def buscar(self, termo):
+        return self.indice.buscar(termo)
+
+    def registro(self, posicao):
+        return self.arquivo.registro(posicao)
+
+    def produto(self, codigo):
+        """Registro do produto `codigo`, ou None se não está no catálogo."""
+        posicao = self.arquivo.posicao(codigo)
+        return None if posicao is None else self.arquivo.registro(posicao)
+
+
+class SincronizadorCatalogo:
+    """Carga completa e sincronização incremental do catálogo, com o relatório de cada uma.
+
+    ultimo_relatorio: dict com 'modo' ('arquivo', 'completa', 'rastreamento' ou
+    'checksum'), 'linhas' e 'bytes' trazidos do banco, 'alterados' (faixas ou
+    códigos conferidos), 'produtos' no catálogo e 'segundos'; 'erro' se falhou.
+    """
+
+    def __init__(self, pasta=None, origem=None):
+        config = get_arquivo_catalogo_config() if pasta is None or origem is None else {}
+        self.pasta = pasta if pasta is not None else config['pasta']
+        self.origem = origem if origem is not None else config['origem']
+        self.ultimo_relatorio = None
+        self.sincronizacoes = 0
+        self.linhas_total = 0
+        self.bytes_total = 0
+
+    def _relatorio(self, modo, linhas, alterados, catalogo, inicio):
+        relatorio = {'modo': modo, 'linhas': len(linhas), 'bytes': tamanho_linhas(linhas), 'alterados': alterados,
+                     'produtos': len(catalogo), 'segundos': time.perf_counter() - inicio}
+        self.ultimo_relatorio = relatorio
+        self.sincronizacoes += 1
+        self.linhas_total += relatorio['linhas']
+        self.bytes_total += relatorio['bytes']
+        return relatorio
+
+    def _abrir_gravado(self, caminho, marca):
+        gravar_marca(caminho, marca)
+        catalogo = CatalogoProdutos(ArquivoCatalogo(caminho))
+        remover_antigos(self.pasta, caminho)
+        return catalogo
+
+    def carregar(self):
+        """Catálogo do último uso, se há um em disco deste banco; senão o catálogo inteiro do banco."""
+        inicio = time.perf_counter()
+        if os.path.isdir(self.pasta):
+            arquivo = abrir_mais_recente(self.pasta, self.origem)
+            if arquivo is not None:
+                catalogo = CatalogoProdutos(arquivo, reaberto=True)
+                self._relatorio('arquivo', [], 0, catalogo, inicio)
+                return catalogo
+        return self.carregar_do_banco()
+
+    def carregar_do_banco(self):
+        """Catálogo inteiro do banco, gravado num arquivo novo; None se falhar."""
+        inicio = time.perf_counter()
+        resultado = get_catalogo_completo()
+        if resultado is None:
+            self.ultimo_relatorio = {'modo': 'completa', 'erro': True}
+            return None
+        marca, linhas = resultado
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            caminho = proximo_caminho(self.pasta)
+            escrever(caminho, ((linha[_FAIXA], _registro(linha)) for linha in linhas), self.origem)
+            catalogo = self._abrir_gravado(caminho, marca)
+        except OSError as e:
+            print(f"Erro ao gravar catálogo de produtos em {self.pasta}: {e}")
+            self.ultimo_relatorio = {'modo': 'completa', 'erro': True}
+            return None
+        self._relatorio('completa', linhas, len(linhas), catalogo, inicio)
+        return catalogo
+
+    def sincronizar(self, catalogo):
+        """Catálogo atualizado a partir de `catalogo` (o mesmo se nada mudou ou se falhar)."""
+        inicio = time.perf_counter()
+        resultado = get_alteracoes_catalogo(catalogo.marca)
+        if resultado is None:
+            self.ultimo_relatorio = {'modo': catalogo.marca['modo'], 'erro': True}
+            return catalogo
+        marca, linhas, codigos, faixas = resultado
+        if marca is None:
+            return self.carregar_do_banco() or catalogo
+        try:
+            caminho = proximo_caminho(self.pasta)
+            if self._aplicar(catalogo.arquivo, caminho, linhas, codigos, faixas):
+                novo = self._abrir_gravado(caminho, marca)
+            else:
+                # Nada mudou no catálogo: só a marca avança
+                if marca != catalogo.marca:
+                    gravar_marca(catalogo.arquivo.caminho, marca)
+                    catalogo.marca = marca
+                catalogo.reaberto = False
+                novo = catalogo
+        except OSError as e:
+            print(f"Erro ao gravar catálogo de produtos em {self.pasta}: {e}")
+            self.ultimo_relatorio = {'modo': marca['modo'], 'erro': True}
+            return catalogo
+        self._relatorio(marca['modo'], linhas, len(codigos or faixas), novo, inicio)
+        return novo
+
+    def _aplicar(self, arquivo, caminho, linhas, codigos, faixas):
+        """Grava em `caminho` o catálogo de `arquivo` com as alterações de database.get_alteracoes_catalogo
+        (o que estava nos códigos ou faixas alterados sai e entram as linhas atuais); False se nada mudou."""
+        removidos = set(codigos)
+        if faixas:
+            removidos.update(arquivo.codigos[posicao] for posicao, faixa in enumerate(arquivo.secoes['faixa'])
+                             if faixa in faixas)
+        novos = {_codigo(linha): (linha[_FAIXA], _registro(linha)) for linha in linhas}
+
+        # Só unidade (já conhecida), preço, custo ou desconto mudaram: cópia com os valores trocados
+        alterados = {}
+        mesmo_texto = removidos <= novos.keys()
+        for codigo, (_, registro) in novos.items():
+            if not mesmo_texto:
+                break
+            posicao = arquivo.posicao(codigo)
+            mesmo_texto = (posicao is not None and arquivo.descricoes[posicao] == registro['descricao']
+                           and registro['unidade'] in arquivo.unidades)
+            if mesmo_texto and registro != arquivo.registro(posicao):
+                alterados[posicao] = registro
+        if mesmo_texto:
+            if not alterados:
+                return False
+            copiar_com_valores(arquivo, caminho, alterados)
+            return True
+
+        mantidos = ((arquivo.faixa(posicao), arquivo.registro(posicao)) for posicao in range(len(arquivo))
+                    if arquivo.codigos[posicao] not in removidos)
+        escrever(caminho, chain(mantidos, novos.values()), self.origem)
+        return True
+
+    def estatisticas(self):
+        return {'sincronizacoes': self.sincronizacoes, 'linhas': self.linhas_total, 'bytes': self.bytes_total,
+                'ultima': self.ultimo_relatorio}
@@ -0,0 +1,385 @@
+"""Arquivo compacto do catálogo de produtos, mapeado em memória (mmap) e consultado no lugar.
+
+O catálogo em dicts e listas do Python custa centenas de MB com 1 milhão de
+produtos. Neste arquivo cada coluna é um vetor: códigos com largura fixa,
+descrições num heap de texto com o vetor de inícios, preços como inteiros.
+Aberto com mmap, ele não é lido para a memória do processo: o sistema
+operacional traz só as páginas tocadas pela busca, e a janela monta o dict só
+dos produtos visíveis. Ao abrir o sistema, o catálogo do último uso está
+disponível na hora e a sincronização traz só o que mudou desde então.
+
+Layout (inteiros na ordem de bytes da máquina; o arquivo é local do terminal):
+
+    MAGICO, posição e tamanho do descritor (uint64)
+    seções, alinhadas em 8 bytes, na ordem do índice de busca (texto normalizado, código)
+    descritor JSON: quantidade, larguras dos códigos, unidades, origem e (posição, tamanho) das seções
+
+Seções:
+    codigos, codigos_normalizados     largura fixa, completados com espaços
+    ordem_codigos                     int32: posições ordenadas pelo código normalizado
+    textos, descricoes (+ _pos)       descrição normalizada e a original: heap UTF-8 + uint32 de início
+    unidade                           uint16: posição na lista de unidades do descritor
+    preco, custo, desconto            int64 em 1/ESCALA
+    faixa                             uint16: faixa da sincronização por checksum
+    vocabulario (+ _pos)              palavras do índice de busca
+    ocorrencias (+ _pos)              int32: posições em que cada palavra aparece, em sequência
+    palavras_texto                    int32: palavras que aparecem nas descrições
+    trigramas (+ _pos), trigramas_palavras    trigramas (3 bytes, ordenados) -> palavras que os contêm
+
+A marca d'água da sincronização fica ao lado, em <arquivo>.marca (JSON), para
+ser regravada sem reescrever o catálogo.
+"""
+import glob
+import json
+import mmap
+import os
+import shutil
+import struct
+from array import array
+from bisect import bisect_left
+from decimal import Decimal, ROUND_HALF_EVEN
+
+try:
+    from .indice_busca import IndiceBusca, normalizar
+except ImportError:
+    from indice_busca import IndiceBusca, normalizar
+
+MAGICO = b'ORCCAT01'
+_CABECALHO = struct.Struct('<8sQQ')
+ESCALA = 10000
+_TIPOS = {
+    'ordem_codigos': 'i', 'textos_pos': 'I', 'descricoes_pos': 'I', 'unidade': 'H', 'preco': 'q', 'custo': 'q',
+    'desconto': 'q', 'faixa': 'H', 'vocabulario_pos': 'I', 'ocorrencias': 'i', 'ocorrencias_pos': 'I',
+    'palavras_texto': 'i', 'trigramas_pos': 'I', 'trigramas_palavras': 'i',
+}
+_DECIMAIS = (('preco', 'preco'), ('custo', 'custo'), ('desconto', 'desconto_maximo'))
+
+
+class _Textos:
+    """Sequência de textos guardados num heap UTF-8 com o vetor de inícios (n + 1 posições)."""
+
+    def __init__(self, dados, inicios):
+        self.dados = dados
+        self.inicios = inicios
+
+    def __len__(self):
+        return len(self.inicios) - 1
+
+    def __getitem__(self, i):
+        return str(self.dados[self.inicios[i]:self.inicios[i + 1]], 'utf-8')
+
+
+class _LarguraFixa:
+    def __init__(self, dados, largura):
+        self.dados = dados
+        self.largura = largura
+
+    def __len__(self):
+        return len(self.dados) // self.largura if self.largura else 0
+
+    def __getitem__(self, i):
+        inicio = i * self.largura
+        return str(self.dados[inicio:inicio + self.largura], 'utf-8').rstrip(' ')
+
+
+class _CodigosOrdenados:
+    """(código normalizado, posição) em ordem de código, como IndiceBusca.codigos_ordenados."""
+
+    def __init__(self, codigos_normalizados, ordem):
+        self.codigos_normalizados = codigos_normalizados
+        self.ordem = ordem
+
+    def __len__(self):
+        return len(self.ordem)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.ordem)))]
+        posicao = self.ordem[i]
+        return self.codigos_normalizados[posicao], posicao
+
+
+class _Listas:
+    """Listas de inteiros em sequência num vetor, com o vetor de inícios; cada uma é uma fatia sem cópia."""
+
+    def __init__(self, valores, inicios):
+        self.valores = valores
+        self.inicios = inicios
+
+    def __len__(self):
+        return len(self.inicios) - 1
+
+    def __getitem__(self, i):
+        return self.valores[self.inicios[i]:self.inicios[i + 1]]
+
+
+class _Trigramas:
+    """trigrama -> ids das palavras, por busca binária nas chaves de 3 bytes."""
+
+    def __init__(self, chaves, listas):
+        self.chaves = chaves
+        self.listas = listas
+
+    def get(self, trigrama, padrao=None):
+        chave = trigrama.encode('ascii')
+        inicio, fim = 0, len(self.listas)
+        while inicio < fim:
+            meio = (inicio + fim) // 2
+            if bytes(self.chaves[3 * meio:3 * meio + 3]) < chave:
+                inicio = meio + 1
+            else:
+                fim = meio
+        if inicio < len(self.listas) and bytes(self.chaves[3 * inicio:3 * inicio + 3]) == chave:
+            return self.listas[inicio]
+        return padrao
+
+
+class IndiceArquivo(IndiceBusca):
+    """IndiceBusca lido do arquivo: as mesmas buscas, sobre vetores do mmap em vez de listas e dicts."""
+
+    def __init__(self, arquivo):
+        secoes = arquivo.secoes
+        self.codigos = _LarguraFixa(secoes['codigos'], arquivo.descritor['largura_codigo'])
+        self.codigos_normalizados = _LarguraFixa(secoes['codigos_normalizados'],
+                                                 arquivo.descritor['largura_codigo_normalizado'])
+        self.codigos_ordenados = _CodigosOrdenados(self.codigos_normalizados, secoes['ordem_codigos'])
+        self.textos = _Textos(secoes['textos'], secoes['textos_pos'])
+        self.vocabulario = _Textos(secoes['vocabulario'], secoes['vocabulario_pos'])
+        self.ocorrencias = _Listas(secoes['ocorrencias'], secoes['ocorrencias_pos'])
+        self._palavras_texto = secoes['palavras_texto']
+        self._curtos = {}
+        self.trigramas = _Trigramas(secoes['trigramas'],
+                                    _Listas(secoes['trigramas_palavras'], secoes['trigramas_pos']))
+
+
+class ArquivoCatalogo:
+    """Catálogo aberto com mmap; registro(posicao) monta o dict de um produto, como database.buscar_produtos."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, 'rb') as arquivo:
+            self._mmap = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        dados = memoryview(self._mmap)
+        magico, inicio, tamanho = _CABECALHO.unpack_from(dados)
+        if magico != MAGICO:
+            raise ValueError(f"{caminho} não é um arquivo de catálogo")
+        self.descritor = json.loads(bytes(dados[inicio:inicio + tamanho]))
+        self.secoes = {}
+        for nome, (inicio, tamanho) in self.descritor['secoes'].items():
+            secao = dados[inicio:inicio + tamanho]
+            self.secoes[nome] = secao.cast(_TIPOS[nome]) if nome in _TIPOS else secao
+        self.quantidade = self.descritor['quantidade']
+        self.unidades = self.descritor['unidades']
+        self.codigos = _LarguraFixa(self.secoes['codigos'], self.descritor['largura_codigo'])
+        self.descricoes = _Textos(self.secoes['descricoes'], self.secoes['descricoes_pos'])
+        self._codigos_ordenados = _CodigosOrdenados(
+            _LarguraFixa(self.secoes['codigos_normalizados'], self.descritor['largura_codigo_normalizado']),
+            self.secoes['ordem_codigos'])
+        self.marca = ler_marca(caminho)
+
+    def __len__(self):
+        return self.quantidade
+
+    def registro(self, posicao):
+        secoes = self.secoes
+        return {
+            'codigo': self.codigos[posicao],
+            'descricao': self.descricoes[posicao],
+            'unidade': self.unidades[secoes['unidade'][posicao]],
+            'preco': Decimal(secoes['preco'][posicao]) / ESCALA,
+            'custo': Decimal(secoes['custo'][posicao]) / ESCALA,
+            'desconto_maximo': Decimal(secoes['desconto'][posicao]) / ESCALA,
+        }
+
+    def faixa(self, posicao):
+        return self.secoes['faixa'][posicao]
+
+    def posicao(self, codigo):
+        """Posição do produto pelo código, ou None."""
+        ordenados = self._codigos_ordenados
+        normalizado = normalizar(codigo)
+        i = bisect_left(ordenados, (normalizado,))
+        while i < len(ordenados):
+            codigo_ordenado, posicao = ordenados[i]
+            if codigo_ordenado != normalizado:
+                break
+            if self.codigos[posicao] == codigo:
+                return posicao
+            i += 1
+        return None
+
+
+def _inteiro(valor):
+    return int((valor * ESCALA).to_integral_value(ROUND_HALF_EVEN))
+
+
+def escrever(caminho, registros, origem):
+    """Grava o catálogo de (faixa, registro) em `caminho`; registro é o dict de database.buscar_produtos.
+
+    Grava num arquivo temporário e renomeia: quem abrir `caminho` nunca vê um arquivo pela metade.
+    Monta o catálogo inteiro em memória antes de gravar (uma tupla por produto e o IndiceBusca
+    completo): perto de 1 KB por produto, uns 210 MB com 200 mil. Os registros são lidos um a um;
+    passe um gerador, não uma lista de dicts, para não somar mais uns 900 bytes por produto.
+    """
+    # Cada produto vira uma tupla com os valores já em inteiros assim que chega: os dicts,
+    # com Decimal, do catálogo inteiro custariam quase o triplo
+    por_codigo = {}
+    for faixa, registro in registros:
+        por_codigo[registro['codigo']] = (faixa, registro['descricao'], registro['unidade'],
+                                          *(_inteiro(registro[campo]) for _, campo in _DECIMAIS))
+    indice = IndiceBusca((codigo, linha[1]) for codigo, linha in por_codigo.items())
+    linhas = [por_codigo[codigo] for codigo in indice.codigos]
+    del por_codigo
+
+    def heap(textos):
+        dados, inicios, total = [], array('I', [0]), 0
+        for texto in textos:
+            codificado = texto.encode('utf-8')
+            dados.append(codificado)
+            total += len(codificado)
+            inicios.append(total)
+        return b''.join(dados), inicios
+
+    def largura_fixa(textos):
+        codificados = [texto.encode('utf-8') for texto in textos]
+        largura = max((len(codificado) for codificado in codificados), default=0)
+        return b''.join(codificado.ljust(largura) for codificado in codificados), largura
+
+    unidades = sorted({linha[2] for linha in linhas})
+    indices_unidade = {unidade: i for i, unidade in enumerate(unidades)}
+    secoes = {}
+    secoes['codigos'], largura_codigo = largura_fixa(indice.codigos)
+    secoes['codigos_normalizados'], largura_codigo_normalizado = largura_fixa(indice.codigos_normalizados)
+    secoes['ordem_codigos'] = array('i', (posicao for _, posicao in indice.codigos_ordenados))
+    secoes['textos'], secoes['textos_pos'] = heap(indice.textos)
+    secoes['descricoes'], secoes['descricoes_pos'] = heap(linha[1] for linha in linhas)
+    secoes['unidade'] = array('H', (indices_unidade[linha[2]] for linha in linhas))
+    for coluna, (secao, _) in enumerate(_DECIMAIS, 3):
+        secoes[secao] = array('q', (linha[coluna] for linha in linhas))
+    secoes['faixa'] = array('H', (linha[0] for linha in linhas))
+    secoes['vocabulario'], secoes['vocabulario_pos'] = heap(indice.vocabulario)
+    ocorrencias, inicios = array('i'), array('I', [0])
+    for lista in indice.ocorrencias:
+        ocorrencias.extend(lista)
+        inicios.append(len(ocorrencias))
+    secoes['ocorrencias'], secoes['ocorrencias_pos'] = ocorrencias, inicios
+    secoes['palavras_texto'] = array('i', indice._palavras_texto)
+    trigramas = sorted(indice.trigramas.items())
+    palavras, inicios = array('i'), array('I', [0])
+    for _, ids in trigramas:
+        palavras.extend(ids)
+        inicios.append(len(palavras))
+    secoes['trigramas'] = b''.join(trigrama.encode('ascii') for trigrama, _ in trigramas)
+    secoes['trigramas_pos'], secoes['trigramas_palavras'] = inicios, palavras
+
+    descritor = {'quantidade': len(linhas), 'largura_codigo': largura_codigo,
+                 'largura_codigo_normalizado': largura_codigo_normalizado, 'unidades': unidades,
+                 'escala': ESCALA, 'origem': origem, 'secoes': {}}
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(_CABECALHO.pack(MAGICO, 0, 0))
+        for nome, dados in secoes.items():
+            arquivo.write(b'\0' * (-arquivo.tell() % 8))
+            descritor['secoes'][nome] = (arquivo.tell(), len(dados) * (dados.itemsize if isinstance(dados, array) else 1))
+            arquivo.write(dados)
+        inicio = arquivo.tell()
+        codificado = json.dumps(descritor).encode('utf-8')
+        arquivo.write(codificado)
+        arquivo.seek(0)
+        arquivo.write(_CABECALHO.pack(MAGICO, inicio, len(codificado)))
+    os.replace(temporario, caminho)
+
+
+def copiar_com_valores(arquivo, caminho, alterados):
+    """Grava em `caminho` uma cópia de `arquivo` com unidade, preço, custo e desconto de alguns produtos
+    trocados ({posição: registro}); as unidades têm de estar na lista do arquivo.
+
+    A cópia é feita de arquivo para arquivo e os valores são trocados nela pelo mmap: o
+    catálogo não passa pela memória do processo.
+    """
+    temporario = caminho + '.tmp'
+    try:
+        shutil.copyfile(arquivo.caminho, temporario)
+    except FileNotFoundError:
+        # Já apagado por remover_antigos, mas ainda mapeado: grava direto do mapeamento
+        with open(temporario, 'wb') as destino:
+            destino.write(arquivo._mmap)
+    indices_unidade = {unidade: i for i, unidade in enumerate(arquivo.unidades)}
+    with open(temporario, 'r+b') as destino:
+        dados = mmap.mmap(destino.fileno(), 0, access=mmap.ACCESS_WRITE)
+        try:
+            with memoryview(dados) as visao:
+                vetores = {}
+                for nome in ('unidade',) + tuple(secao for secao, _ in _DECIMAIS):
+                    inicio, tamanho = arquivo.descritor['secoes'][nome]
+                    vetores[nome] = visao[inicio:inicio + tamanho].cast(_TIPOS[nome])
+                for posicao, registro in alterados.items():
+                    vetores['unidade'][posicao] = indices_unidade[registro['unidade']]
+                    for secao, campo in _DECIMAIS:
+                        vetores[secao][posicao] = _inteiro(registro[campo])
+                for vetor in vetores.values():
+                    vetor.release()
+            dados.flush()
+        finally:
+            dados.close()
+    os.replace(temporario, caminho)
+
+
+def ler_marca(caminho):
+    try:
+        with open(caminho + '.marca', encoding='utf-8') as arquivo:
+            marca = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if marca.get('modo') == 'checksum':
+        # Chaves JSON são texto; as faixas e os checksums voltam como no banco
+        marca['checksums'] = {int(faixa): tuple(valor) for faixa, valor in marca['checksums'].items()}
+    return marca
+
+
+def gravar_marca(caminho, marca):
+    temporario = caminho + '.marca.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(marca, arquivo)
+    os.replace(temporario, caminho + '.marca')
+
+
+def _numerados(pasta):
+    """Arquivos de catálogo da pasta, do mais novo para o mais antigo, como (número, caminho)."""
+    arquivos = []
+    for caminho in glob.glob(os.path.join(pasta, 'produtos-*.cat')):
+        try:
+            arquivos.append((int(os.path.basename(caminho)[len('produtos-'):-len('.cat')]), caminho))
+        except ValueError:
+            pass
+    return sorted(arquivos, reverse=True)
+
+
+def proximo_caminho(pasta):
+    """Nome para um catálogo novo: o arquivo aberto (mapeado) não é sobrescrito."""
+    arquivos = _numerados(pasta)
+    return os.path.join(pasta, f"produtos-{arquivos[0][0] + 1 if arquivos else 1:06d}.cat")
+
+
+def abrir_mais_recente(pasta, origem):
+    """ArquivoCatalogo mais novo da pasta gravado a partir de `origem` e com marca d'água, ou None."""
+    for _, caminho in _numerados(pasta):
+        try:
+            arquivo = ArquivoCatalogo(caminho)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            print(f"Catálogo local {caminho} ignorado: {e}")
+            continue
+        if arquivo.descritor.get('origem') == origem and arquivo.marca is not None:
+            return arquivo
+    return None
+
+
+def remover_antigos(pasta, atual):
+    """Apaga os catálogos anteriores a `atual`; no Windows, um ainda mapeado fica para a próxima vez."""
+    for caminho in glob.glob(os.path.join(pasta, 'produtos-*')):
+        if caminho.startswith(atual) or caminho.endswith('.tmp'):
+            continue
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
@@ -1,23 +1,30 @@
 import pyodbc
 import configparser
 import os
-import sys
+import threading
+import time
+from datetime import timedelta
 from decimal import Decimal
 import urllib.parse
 
 try:
-    from .models import Orcamento, ItemOrcamento
+    from .models import Orcamento, ItemOrcamento, ItemBatch
+    from .metrics import (get_config_path, instrumentar_consulta, registrar_conexao, ConexaoInstrumentada,
+                          registrar_cache, registrar_fila, registrar_repeticao, registrar_fim_repeticao, registrar_replica)
+    from .dinheiro import arredondar
+    from .cache import CacheAtualizado
+    from .mapeamento import Mapeador, TAMANHO_LOTE, texto, decimal, valor, igual, formatado
+    from .resiliencia import ConexaoResiliente, TENTATIVAS, eh_transitorio, sqlstate, espera
+    from .replica import RoteadorLeitura
 except ImportError:
-    from models import Orcamento, ItemOrcamento
-
-def get_config_path():
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)
-        config_path = os.path.join(base_path, 'config.ini')
-    else:
-        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        config_path = os.path.join(base_path, 'config', 'config.ini')
-    return config_path
+    from models import Orcamento, ItemOrcamento, ItemBatch
+    from metrics import (get_config_path, instrumentar_consulta, registrar_conexao, ConexaoInstrumentada,
+                         registrar_cache, registrar_fila, registrar_repeticao, registrar_fim_repeticao, registrar_replica)
+    from dinheiro import arredondar
+    from cache import CacheAtualizado
+    from mapeamento import Mapeador, TAMANHO_LOTE, texto, decimal, valor, igual, formatado
+    from resiliencia import ConexaoResiliente, TENTATIVAS, eh_transitorio, sqlstate, espera
+    from replica import RoteadorLeitura
 
 def get_terminal_config():
     config = configparser.ConfigParser()
@@ -49,6 +56,188 @@ def get_empresa_config():
     config.read(config_path, encoding='utf-8')
     return config.get('Application', 'empresa', fallback='01')
 
+def get_timeout_config():
+    """(timeout de conexão, timeout de cada consulta) em segundos; 0 = sem limite."""
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+
+    if not os.path.exists(config_path):
+        return 10, 30
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        return (config.getint('Application', 'timeout', fallback=10),
+                config.getint('Application', 'timeout_consulta', fallback=30))
+    except (ValueError, configparser.Error):
+        return 10, 30
+
+class ErroConsulta(Exception):
+    """Consulta interrompida; a tela pode seguir com os dados que já tem (cache, lista anterior)."""
+
+class ConsultaTimeout(ErroConsulta):
+    """A consulta passou do timeout configurado (SQLSTATE HYT00/HYT01)."""
+
+class ConsultaCancelada(ErroConsulta):
+    """A consulta foi cancelada por Cancelamento.cancelar() (SQLSTATE HY008)."""
+
+def _erro_estruturado(ex):
+    """ConsultaTimeout/ConsultaCancelada equivalente ao pyodbc.Error, ou None se for outro erro."""
+    estado = ex.args[0] if ex.args else ''
+    if estado in ('HYT00', 'HYT01'):
+        return ConsultaTimeout(str(ex))
+    if estado == 'HY008':
+        return ConsultaCancelada(str(ex))
+    return None
+
+_local = threading.local()
+
+class Cancelamento:
+    """Permite interromper, de outra thread, as buscas feitas dentro de `with cancelamento:`.
+
+    A janela de busca cria um por consulta; quando o usuário digita de novo ou
+    fecha a janela, cancelar() chama cursor.cancel() nas consultas em andamento.
+    """
+
+    def __init__(self):
+        self.cancelado = False
+        self._cursores = set()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._anterior = getattr(_local, 'cancelamento', None)
+        _local.cancelamento = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.cancelamento = self._anterior
+        return False
+
+    def registrar(self, cursor):
+        with self._lock:
+            if self.cancelado:
+                raise ConsultaCancelada("Busca cancelada antes de começar")
+            self._cursores.add(cursor)
+
+    def liberar(self, cursor):
+        with self._lock:
+            self._cursores.discard(cursor)
+
+    def cancelar(self):
+        with self._lock:
+            self.cancelado = True
+            cursores = list(self._cursores)
+        for cursor in cursores:
+            try:
+                cursor.cancel()
+            except pyodbc.Error:
+                pass
+
+def get_cache_clientes_config():
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+    padrao = {'capacidade': 500, 'atualizar_apos': 60.0, 'validade': 900.0}
+
+    if not os.path.exists(config_path):
+        return padrao
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        return {
+            'capacidade': config.getint('Cache', 'clientes_capacidade', fallback=500),
+            'atualizar_apos': config.getfloat('Cache', 'clientes_atualizar_segundos', fallback=60.0),
+            'validade': config.getfloat('Cache', 'clientes_validade_segundos', fallback=900.0)
+        }
+    except (ValueError, configparser.Error):
+        return padrao
+
+def get_cache_exposicao_config():
+    """Prazos do cache de exposição de crédito (orçamentos em aberto por cliente)."""
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+    padrao = {'capacidade': 500, 'atualizar_apos': 30.0, 'validade': 120.0}
+
+    if not os.path.exists(config_path):
+        return padrao
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        return {
+            'capacidade': config.getint('Cache', 'clientes_capacidade', fallback=500),
+            'atualizar_apos': config.getfloat('Cache', 'exposicao_atualizar_segundos', fallback=30.0),
+            'validade': config.getfloat('Cache', 'exposicao_validade_segundos', fallback=120.0)
+        }
+    except (ValueError, configparser.Error):
+        return padrao
+
+def get_sincronizacao_catalogo_config():
+    """Segundos entre as sincronizações do catálogo local de produtos; 0 = só a carga inicial."""
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+
+    if not os.path.exists(config_path):
+        return 120.0
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        return config.getfloat('Cache', 'catalogo_sincronizar_segundos', fallback=120.0)
+    except (ValueError, configparser.Error):
+        return 120.0
+
+def get_indice_clientes_config():
+    """Segundos entre as remontagens dos índices de busca de clientes (nome e documentos); 0 = nunca."""
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+
+    if not os.path.exists(config_path):
+        return 300.0
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        return config.getfloat('Cache', 'clientes_indice_segundos', fallback=300.0)
+    except (ValueError, configparser.Error):
+        return 300.0
+
+def get_arquivo_catalogo_config():
+    """Pasta do arquivo local do catálogo de produtos e a origem (banco) gravada nele.
+
+    Um arquivo de outro banco (o config.ini passou a apontar outro servidor) é ignorado.
+    """
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+    pasta = os.path.join(os.path.dirname(os.path.abspath(config_path)), 'cache')
+
+    if not os.path.exists(config_path):
+        return {'pasta': pasta, 'origem': ''}
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        db_config = config['Database'] if 'Database' in config else {}
+        origem = '|'.join(db_config.get(chave, '').strip() for chave in ('backend', 'server', 'database'))
+        return {'pasta': config.get('Cache', 'catalogo_pasta', fallback=pasta), 'origem': origem}
+    except configparser.Error:
+        return {'pasta': pasta, 'origem': ''}
+
+def get_replica_config():
+    """Parâmetros do RoteadorLeitura, ou None se não há a seção [DatabaseRead]."""
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+
+    if not os.path.exists(config_path):
+        return None
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        if 'DatabaseRead' not in config:
+            return None
+        return {
+            'atraso_maximo': config.getfloat('DatabaseRead', 'atraso_maximo_segundos', fallback=60.0),
+            'verificar_a_cada': config.getfloat('DatabaseRead', 'verificar_segundos', fallback=30.0),
+            'pausa_apos_falha': config.getfloat('DatabaseRead', 'pausa_apos_falha_segundos', fallback=60.0)
+        }
+    except (ValueError, configparser.Error) as e:
+        print(f"Erro na seção [DatabaseRead], réplica desativada: {e}")
+        return None
+
 def calcular_senha_dinamica(formula_senha):
     from datetime import datetime
     hoje = datetime.now()
@@ -80,6 +269,7 @@ def calcular_senha_dinamica(formula_senha):
         print(f" Erro ao calcular senha dinâmica: {str(e)}")
         return str(hoje.day) 
 
+@instrumentar_consulta
 def get_desconto_vendedor(codigo_usuario, codigo_vendedor=None):
     conn = get_db_connection()
     if not conn:
@@ -118,8 +308,9 @@ def get_desconto_vendedor(codigo_usuario, codigo_vendedor=None):
         if conn:
             conn.close()
 
+@instrumentar_consulta
 def get_usuarios_sistema():
-    conn = get_db_connection()
+    conn = get_db_connection(leitura=True)
     if not conn:
         return []
     
@@ -157,10 +348,11 @@ def get_usuarios_sistema():
         if conn:
             conn.close()
 
+@instrumentar_consulta
 def get_desconto_config():
     from datetime import datetime
     
-    conn = get_db_connection()
+    conn = get_db_connection(leitura=True)
     if not conn: 
         senha_hoje = str(datetime.now().day)
         return {'limite_sem_senha': 5.0, 'senha_liberacao': senha_hoje, 'habilitar_desconto': True, 'formula_senha': 'Dia'}
@@ -248,7 +440,32 @@ def get_desconto_config():
     senha_padrao = str(datetime.now().day)
     return {'limite_sem_senha': 5.0, 'senha_liberacao': senha_padrao, 'habilitar_desconto': True, 'formula_senha': 'dia'}
 
-def get_db_connection():
+def _conectar_banco_local(db_config, config_path):
+    try:
+        from .sqlite_shim import conectar
+    except ImportError:
+        from sqlite_shim import conectar
+
+    caminho = db_config.get('database')
+    if not os.path.isabs(caminho):
+        caminho = os.path.join(os.path.dirname(os.path.abspath(config_path)), caminho)
+
+    if not os.path.exists(caminho):
+        print(f"Erro: Banco local não encontrado em: {caminho}")
+        return None
+
+    inicio = time.perf_counter()
+    conn = conectar(caminho)
+    conn.timeout = get_timeout_config()[1]
+    registrar_conexao(time.perf_counter() - inicio)
+    return ConexaoInstrumentada(conn)
+
+def _abrir_conexao(secao='Database'):
+    """Conexão nova com o banco; None se a configuração estiver errada, pyodbc.Error se a conexão falhar.
+
+    Com secao='DatabaseRead', abre a réplica de leitura; o que a seção não
+    define (driver, usuário, senha...) vem de [Database].
+    """
     config = configparser.ConfigParser()
     config_path = get_config_path()
     
@@ -258,46 +475,109 @@ def get_db_connection():
     
     config.read(config_path, encoding='utf-8')
 
-    if 'Database' not in config:
-        print("Erro: Seção [Database] não encontrada no arquivo config.ini")
+    if secao not in config:
+        print(f"Erro: Seção [{secao}] não encontrada no arquivo config.ini")
         return None
 
-    db_config = config['Database']
+    db_config = dict(config['Database']) if 'Database' in config else {}
+    db_config.update(config[secao])
+
+    if db_config.get('backend', 'sqlserver').strip().lower() == 'sqlite':
+        return _conectar_banco_local(db_config, config_path)
+
     server = db_config.get('server')
     database = db_config.get('database')
     username = db_config.get('username')
     password = db_config.get('password')
     driver = db_config.get('driver')
 
+    timeout_conexao, timeout_consulta = get_timeout_config()
+    # Listener de Availability Group: manda a conexão para um secundário legível
+    intencao = 'ApplicationIntent=ReadOnly;' if db_config.get('intencao_leitura', '0').strip() == '1' else ''
+
     caracteres_especiais = ['ç', '*', '&', '%', '=', ';', '+', '<', '>', '|', '"', "'"]
     tem_caracteres_especiais = password and any(char in password for char in caracteres_especiais)
     
-    try:
-        if tem_caracteres_especiais:
-            conn_str = (
-                f'DRIVER={driver};'
-                f'SERVER={server};'
-                f'DATABASE={database};'
-                f'UID={username};'
-                f'TrustServerCertificate=yes;'
-            )
-            conn = pyodbc.connect(conn_str, password=password, autocommit=False)
-        else:
-            conn_str = (
-                f'DRIVER={driver};'
-                f'SERVER={server};'
-                f'DATABASE={database};'
-                f'UID={username};'
-                f'PWD={password};'
-                f'TrustServerCertificate=yes;'
-            )
-            conn = pyodbc.connect(conn_str, autocommit=False)
-        
-        return conn
-        
-    except pyodbc.Error as ex:
-        print(f"Erro de conexão com o banco de dados: {ex}")
-        return None
+    inicio = time.perf_counter()
+    if tem_caracteres_especiais:
+        conn_str = (
+            f'DRIVER={driver};'
+            f'SERVER={server};'
+            f'DATABASE={database};'
+            f'UID={username};'
+            f'TrustServerCertificate=yes;'
+            f'{intencao}'
+        )
+        conn = pyodbc.connect(conn_str, password=password, autocommit=False, timeout=timeout_conexao)
+    else:
+        conn_str = (
+            f'DRIVER={driver};'
+            f'SERVER={server};'
+            f'DATABASE={database};'
+            f'UID={username};'
+            f'PWD={password};'
+            f'TrustServerCertificate=yes;'
+            f'{intencao}'
+        )
+        conn = pyodbc.connect(conn_str, autocommit=False, timeout=timeout_conexao)
+    # Vale para cada execute; uma consulta travada vira erro HYT00 em vez de prender a tela
+    conn.timeout = timeout_consulta
+
+    registrar_conexao(time.perf_counter() - inicio)
+    return ConexaoInstrumentada(conn)
+
+_roteador = None
+_roteador_lock = threading.Lock()
+
+def _marcador_replica(conn):
+    """Último número de nota/orçamento de cada terminal, para comparar o principal com a réplica."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT AO_NFA, MAX(AA_NFA) FROM ANOTASNO GROUP BY AO_NFA")
+    return {terminal: numero for terminal, numero in cursor.fetchall()}
+
+def _roteador_leitura():
+    """RoteadorLeitura da seção [DatabaseRead], criado no primeiro uso; None sem réplica."""
+    global _roteador
+    with _roteador_lock:
+        if _roteador is None:
+            config = get_replica_config()
+            _roteador = RoteadorLeitura(_abrir_conexao, lambda: _abrir_conexao('DatabaseRead'), _marcador_replica,
+                                        **config) if config else False
+            if _roteador:
+                registrar_replica(_roteador.estatisticas)
+        return _roteador or None
+
+def get_db_connection(leitura=False):
+    """Conexão com o banco, ou None se não conectar.
+
+    Falhas passageiras ao conectar são repetidas com espera; a conexão devolvida
+    se reabre sozinha se cair entre leituras (resiliencia.ConexaoResiliente).
+    Com leitura=True, para quem só lê e aceita dados de alguns segundos atrás,
+    a conexão vem da réplica de [DatabaseRead], se configurada e em dia.
+    """
+    if leitura:
+        roteador = _roteador_leitura()
+        conn = roteador.abrir_leitura() if roteador else None
+        if conn is not None:
+            # Se a réplica cair no meio da leitura, a reconexão vai para o principal
+            return ConexaoResiliente(conn, _abrir_conexao)
+    for tentativa in range(TENTATIVAS):
+        try:
+            conn = _abrir_conexao()
+        except pyodbc.Error as ex:
+            if not eh_transitorio(ex) or tentativa + 1 >= TENTATIVAS:
+                if tentativa:
+                    registrar_fim_repeticao(recuperada=False)
+                print(f"Erro de conexão com o banco de dados: {ex}")
+                return None
+            registrar_repeticao(sqlstate(ex), reconexao=True)
+            time.sleep(espera(tentativa))
+            continue
+        if tentativa:
+            registrar_fim_repeticao(recuperada=True)
+        return ConexaoResiliente(conn, _abrir_conexao) if conn else None
+
+@instrumentar_consulta
 def get_proximo_numero_orcamento():
     conn = get_db_connection()
     if not conn: return "Erro"
@@ -321,100 +601,290 @@ def get_proximo_numero_orcamento():
     finally:
         if conn: conn.close()
 
+MAPEADOR_VENDEDORES = Mapeador(texto('codigo', 'CODIGO_VEN'), texto('nome', 'NOME_VEN'))
+
+@instrumentar_consulta
 def get_vendedores():
-    conn = get_db_connection()
+    conn = get_db_connection(leitura=True)
     if not conn: return []
-    vendedores = []
     try:
         cursor = conn.cursor()
         query = "SELECT CODIGO_VEN, NOME_VEN FROM AVENDEGE ORDER BY CODIGO_VEN"
         cursor.execute(query)
-        for row in cursor.fetchall():
-            vendedores.append({
-                'codigo': row.CODIGO_VEN.strip() if row.CODIGO_VEN else '', 
-                'nome': row.NOME_VEN.strip() if row.NOME_VEN else ''
-            })
-        return vendedores
+        return MAPEADOR_VENDEDORES.listar(cursor)
     except pyodbc.Error as ex:
         print(f"Erro ao buscar vendedores: {ex}")
         return []
     finally:
         if conn: conn.close()
 
-def buscar_clientes(codigo=None, nome=None, termo_inteligente=None):
-    conn = get_db_connection()
-    if not conn: return []
-    clientes = []
+def _sql_prioridade_busca(coluna_codigo, coluna_texto, termo):
+    """CASE com a mesma ordem de prioridade_busca, para ordenar e paginar no servidor."""
+    termo_upper = termo.upper()
+    sql = (f"CASE WHEN UPPER({coluna_codigo}) = ? THEN 1 WHEN UPPER({coluna_codigo}) LIKE ? THEN 2"
+           f" WHEN UPPER({coluna_texto}) = ? THEN 3 WHEN UPPER({coluna_texto}) LIKE ? THEN 4"
+           f" WHEN UPPER({coluna_codigo}) LIKE ? THEN 5 ELSE 6 END")
+    return sql, [termo_upper, f"{termo_upper}%", termo_upper, f"{termo_upper}%", f"%{termo_upper}%"]
+
+def _ordenar_e_paginar(query, params, coluna_codigo, coluna_texto, termo, inicio, quantidade):
+    """Acrescenta a ordenação da busca e, se `quantidade` for informada, OFFSET/FETCH.
+
+    Com termo, a consulta vira tabela derivada com a coluna PRIORIDADE; o desempate
+    segue prioridade_busca (código nas prioridades 1, 2 e 5, texto nas demais).
+    """
+    if termo:
+        prioridade, params_prioridade = _sql_prioridade_busca(coluna_codigo, coluna_texto, termo)
+        campos, resto = query.split(" FROM ", 1)
+        query = (f"SELECT * FROM ({campos}, {prioridade} AS PRIORIDADE FROM {resto}) r"
+                 f" ORDER BY r.PRIORIDADE, CASE WHEN r.PRIORIDADE IN (1, 2, 5) THEN UPPER(r.{coluna_codigo})"
+                 f" ELSE UPPER(r.{coluna_texto}) END, r.{coluna_codigo}")
+        params = params_prioridade + params
+    else:
+        query += f" ORDER BY {coluna_texto}, {coluna_codigo}"
+    if quantidade is not None:
+        query += " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+        params = params + [inicio, quantidade]
+    return query, params
+
+_SQL_DOCUMENTO_DIGITOS = "REPLACE(REPLACE(REPLACE(REPLACE(CGCCPF_CLI, '.', ''), '-', ''), '/', ''), ' ', '')"
+_SQL_TELEFONE_DIGITOS = "REPLACE(REPLACE(REPLACE(REPLACE(TELEF_CLI, '-', ''), ' ', ''), '(', ''), ')', '')"
+
+def _sql_filtro_documento(digitos, params):
+    """WHERE por CPF/CNPJ ou telefone (com ou sem DDD) só com dígitos; acrescenta os parâmetros."""
+    condicoes = [f"{_SQL_DOCUMENTO_DIGITOS} = ?", f"{_SQL_TELEFONE_DIGITOS} = ?"]
+    params.extend([digitos, digitos])
+    sem_zero = digitos.lstrip('0')
+    if len(sem_zero) in (10, 11):
+        ddd, telefone = sem_zero[:2], sem_zero[2:]
+        condicoes.append(f"(LTRIM(RTRIM(DDD_CLI)) IN (?, ?) AND {_SQL_TELEFONE_DIGITOS} = ?)")
+        params.extend([ddd, '0' + ddd, telefone])
+    return f" WHERE ({' OR '.join(condicoes)})"
+
+MAPEADOR_CLIENTES = Mapeador(
+    texto('codigo', 'CODIGO_CLI'),
+    texto('nome', 'NOME_CLI'),
+    texto('cpf_cnpj', 'CGCCPF_CLI'),
+    formatado('endereco', '{}, {}', 'ENDER_CLI', 'NUMER_CLI'),
+    formatado('telefone', '({}) {}', 'DDD_CLI', 'TELEF_CLI'),
+    texto('tipo_cli', 'TIPO_CLI', '1'),
+    texto('bk_cli', 'BK_CLI', '1'),
+    decimal('bl_cli', 'BL_CLI'),
+)
+
+def _iterar_consulta(query, params, mapeador, tamanho_lote=TAMANHO_LOTE, leitura=True):
+    """Dicts das linhas da consulta, lidos em lotes; a conexão fica aberta enquanto o gerador é percorrido.
+
+    Lê da réplica, se configurada; leitura=False lê do principal.
+
+    Dentro de `with Cancelamento()`, a consulta pode ser cancelada de outra thread;
+    timeout e cancelamento saem como ConsultaTimeout e ConsultaCancelada.
+    """
+    cancelamento = getattr(_local, 'cancelamento', None)
+    conn = get_db_connection(leitura=leitura)
+    if not conn: return
+    cursor = None
     try:
         cursor = conn.cursor()
-        query = "SELECT CODIGO_CLI, NOME_CLI, CGCCPF_CLI, ENDER_CLI, NUMER_CLI, DDD_CLI, TELEF_CLI, TIPO_CLI, BK_CLI, BL_CLI FROM ACLIENGE"
-        params = []
-        
-        if termo_inteligente:
-            query += " WHERE (CODIGO_CLI LIKE ? OR UPPER(NOME_CLI) LIKE ?)"
-            termo_upper = f"%{termo_inteligente.upper()}%"
-            params.extend([f"%{termo_inteligente}%", termo_upper])
-        elif codigo:
-            query += " WHERE CODIGO_CLI = ?"
-            params.append(codigo)
-        elif nome:
-            query += " WHERE UPPER(NOME_CLI) LIKE ?"
-            params.append(f"%{nome.upper()}%")
-            
-        query += " ORDER BY NOME_CLI"
-        
+        if cancelamento is not None:
+            cancelamento.registrar(cursor)
         cursor.execute(query, *params)
-        for row in cursor.fetchall():
-            endereco = f"{row.ENDER_CLI.strip() if row.ENDER_CLI else ''}, {row.NUMER_CLI.strip() if row.NUMER_CLI else ''}"
-            telefone = f"({row.DDD_CLI.strip() if row.DDD_CLI else ''}) {row.TELEF_CLI.strip() if row.TELEF_CLI else ''}"
-            clientes.append({
-                'codigo': row.CODIGO_CLI.strip() if row.CODIGO_CLI else '', 
-                'nome': row.NOME_CLI.strip() if row.NOME_CLI else '',
-                'cpf_cnpj': row.CGCCPF_CLI.strip() if row.CGCCPF_CLI else '',
-                'endereco': endereco,
-                'telefone': telefone,
-                'tipo_cli': row.TIPO_CLI.strip() if row.TIPO_CLI else '1',
-                'bk_cli': row.BK_CLI.strip() if row.BK_CLI else '1',
-                'bl_cli': Decimal(row.BL_CLI) if row.BL_CLI is not None else Decimal('0.0')
-            })
-        
-        if termo_inteligente and clientes:
-            clientes = sorted(clientes, key=lambda c: _get_search_priority(c, termo_inteligente))
-            
-        return clientes
+        for registro in mapeador.iterar(cursor, tamanho_lote):
+            if cancelamento is not None and cancelamento.cancelado:
+                raise ConsultaCancelada("Busca cancelada")
+            yield registro
+    except pyodbc.Error as ex:
+        erro = _erro_estruturado(ex)
+        if erro is None and cancelamento is not None and cancelamento.cancelado:
+            erro = ConsultaCancelada(str(ex))
+        if erro is not None:
+            raise erro from ex
+        raise
+    finally:
+        if cancelamento is not None and cursor is not None:
+            cancelamento.liberar(cursor)
+        conn.close()
+
+def _consulta_clientes(codigo=None, nome=None, termo_inteligente=None, inicio=0, quantidade=None, codigos=None,
+                       digitos=None):
+    """(query, params) da busca de clientes; query None se não há o que buscar (lista de códigos vazia)."""
+    query = "SELECT CODIGO_CLI, NOME_CLI, CGCCPF_CLI, ENDER_CLI, NUMER_CLI, DDD_CLI, TELEF_CLI, TIPO_CLI, BK_CLI, BL_CLI FROM ACLIENGE"
+    params = []
+
+    if termo_inteligente:
+        query += " WHERE (CODIGO_CLI LIKE ? OR UPPER(NOME_CLI) LIKE ?)"
+        termo_upper = f"%{termo_inteligente.upper()}%"
+        params.extend([f"%{termo_inteligente}%", termo_upper])
+    elif codigos is not None:
+        if not codigos: return None, []
+        query += f" WHERE CODIGO_CLI IN ({', '.join('?' * len(codigos))})"
+        params.extend(codigos)
+    elif digitos:
+        query += _sql_filtro_documento(digitos, params)
+    elif codigo:
+        query += " WHERE CODIGO_CLI = ?"
+        params.append(codigo)
+    elif nome:
+        query += " WHERE UPPER(NOME_CLI) LIKE ?"
+        params.append(f"%{nome.upper()}%")
+
+    return _ordenar_e_paginar(query, params, 'CODIGO_CLI', 'NOME_CLI', termo_inteligente, inicio, quantidade)
+
+@instrumentar_consulta
+def buscar_clientes(codigo=None, nome=None, termo_inteligente=None, inicio=0, quantidade=None, codigos=None,
+                    digitos=None):
+    """Busca clientes; com `quantidade`, devolve só a página que começa em `inicio`.
+
+    `codigos` traz os clientes de uma lista de códigos (página do índice de busca).
+    `digitos` compara com o CPF/CNPJ e o telefone sem pontuação; varre a tabela,
+    por isso só é usado enquanto o índice de documentos não está pronto.
+    """
+    query, params = _consulta_clientes(codigo, nome, termo_inteligente, inicio, quantidade, codigos, digitos)
+    if query is None: return []
+    try:
+        return list(_iterar_consulta(query, params, MAPEADOR_CLIENTES))
     except pyodbc.Error as ex:
         print(f"Erro ao buscar clientes: {ex}")
         return []
+
+def iterar_clientes(tamanho_lote=TAMANHO_LOTE, **filtros):
+    """Clientes um a um, com os filtros de buscar_clientes, lidos do banco em lotes (memória constante)."""
+    query, params = _consulta_clientes(**filtros)
+    if query is None: return
+    try:
+        yield from _iterar_consulta(query, params, MAPEADOR_CLIENTES, tamanho_lote)
+    except pyodbc.Error as ex:
+        print(f"Erro ao ler clientes: {ex}")
+
+def _listar_linhas(query, descricao):
+    """Todas as linhas como tuplas de textos sem espaços nas pontas, para montar
+    um índice em memória; None se falhar."""
+    conn = get_db_connection(leitura=True)
+    if not conn: return None
+    resultado = []
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        while True:
+            linhas = cursor.fetchmany(5000)
+            if not linhas:
+                break
+            resultado.extend(tuple((valor or '').strip() for valor in linha) for linha in linhas)
+        return resultado
+    except pyodbc.Error as ex:
+        print(f"Erro ao listar {descricao}: {ex}")
+        return None
     finally:
         if conn: conn.close()
 
-def get_cliente_por_codigo(codigo):
-    codigo_formatado = codigo.zfill(5)
-    clientes = buscar_clientes(codigo=codigo_formatado)
+@instrumentar_consulta
+def get_catalogo_clientes():
+    return _listar_linhas("SELECT CODIGO_CLI, NOME_CLI FROM ACLIENGE", "clientes")
+
+@instrumentar_consulta
+def get_documentos_clientes():
+    """(código, CPF/CNPJ, DDD, telefone) de todos os clientes, para o índice de documentos."""
+    return _listar_linhas("SELECT CODIGO_CLI, CGCCPF_CLI, DDD_CLI, TELEF_CLI FROM ACLIENGE", "documentos de clientes")
+
+def _carregar_cliente(codigo):
+    clientes = buscar_clientes(codigo=codigo)
     return clientes[0] if clientes else None
 
-def get_condicoes_pagamento():
+# Clientes por código: o balcão atende os mesmos clientes o dia todo. Entradas
+# antigas são recarregadas em segundo plano, para limite (BL_CLI) e tipo
+# (TIPO_CLI) não ficarem desatualizados; com o banco sem responder, vale a vencida.
+_cache_clientes = CacheAtualizado(_carregar_cliente, erros_toleraveis=(ErroConsulta,), **get_cache_clientes_config())
+registrar_cache('clientes', _cache_clientes.cache.estatisticas)
+registrar_fila('atualizacao_clientes', _cache_clientes.pendentes)
+
+def get_cliente_por_codigo(codigo):
+    try:
+        cliente = _cache_clientes.obter(codigo.strip().zfill(5))
+    except ErroConsulta as ex:
+        print(f"Erro ao buscar cliente {codigo}: {ex}")
+        return None
+    return dict(cliente) if cliente else None
+
+def invalidar_cache_clientes(codigo=None):
+    """Descarta o cliente `codigo` do cache, ou todos sem código (cadastro alterado fora do sistema)."""
+    _cache_clientes.invalidar(codigo.strip().zfill(5) if codigo else None)
+
+def _carregar_exposicao(codigo):
+    # No principal: os ajustes de salvar_orcamento e atualizar_orcamento partem deste total
     conn = get_db_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), SUM(AI_NFA) FROM ANOTASNO
+            WHERE AB_NFA = ? AND AF_NFA = '8' AND NotaEmLancto_NFA = 'N'
+        """, codigo)
+        quantidade, valor = cursor.fetchone()
+        return {'orcamentos': quantidade or 0, 'valor': arredondar(valor or 0)}
+    except pyodbc.Error as ex:
+        print(f"Erro ao calcular orçamentos em aberto do cliente {codigo}: {ex}")
+        return None
+    finally:
+        conn.close()
+
+# Exposição de crédito por cliente: orçamentos em aberto (AF_NFA = '8') de todos os
+# terminais. O total vem do banco e, a cada orçamento salvo ou atualizado aqui, é
+# ajustado na memória; orçamentos de outros terminais e os convertidos em venda
+# entram na recarga, feita em segundo plano depois de `atualizar_apos` segundos.
+_cache_exposicao = CacheAtualizado(_carregar_exposicao, **get_cache_exposicao_config())
+registrar_cache('exposicao_credito', _cache_exposicao.cache.estatisticas)
+
+def _chave_exposicao(codigo_cliente):
+    return (codigo_cliente or '').strip()
+
+def antecipar_exposicao_cliente(codigo_cliente):
+    """Carrega em segundo plano a exposição do cliente escolhido, para a conferência ao salvar não esperar."""
+    if _chave_exposicao(codigo_cliente):
+        _cache_exposicao.antecipar(_chave_exposicao(codigo_cliente))
+
+def get_exposicao_cliente(codigo_cliente):
+    """{'orcamentos', 'valor'} dos orçamentos em aberto do cliente, ou None se a consulta falhar."""
+    chave = _chave_exposicao(codigo_cliente)
+    if not chave:
+        return None
+    exposicao = _cache_exposicao.obter(chave)
+    return dict(exposicao) if exposicao else None
+
+def _ajustar_exposicao(codigo_cliente, orcamentos, valor):
+    chave = _chave_exposicao(codigo_cliente)
+    if chave:
+        _cache_exposicao.alterar(chave, lambda exposicao: {'orcamentos': exposicao['orcamentos'] + orcamentos,
+                                                           'valor': exposicao['valor'] + valor})
+
+MAPEADOR_CONDICOES = Mapeador(texto('codigo', 'CODIGO_CPG'), texto('descricao', 'DESCRI_CPG'))
+
+MAPEADOR_CONDICOES_DETALHADAS = Mapeador(
+    texto('codigo', 'codigo'),
+    texto('descricao', 'descricao'),
+    texto('exige_cliente', 'exige_cliente', 'S'),
+    valor('tipo_pagamento', 'tipo_pagamento'),
+    valor('tipo_descricao', 'tipo_descricao'),
+    igual('permite_sem_cliente', 'exige_cliente', 'N'),
+    igual('oculta', 'oculta', 'S'),
+)
+
+@instrumentar_consulta
+def get_condicoes_pagamento():
+    conn = get_db_connection(leitura=True)
     if not conn: return []
-    condicoes = []
     try:
         cursor = conn.cursor()
         query = "SELECT CODIGO_CPG, DESCRI_CPG FROM ACONPGFA WHERE (COND_CPG <> 'S' OR COND_CPG IS NULL) ORDER BY CODIGO_CPG"
         cursor.execute(query)
-        for row in cursor.fetchall():
-            condicoes.append({
-                'codigo': row.CODIGO_CPG.strip() if row.CODIGO_CPG else '', 
-                'descricao': row.DESCRI_CPG.strip() if row.DESCRI_CPG else ''
-            })
-        return condicoes
+        return MAPEADOR_CONDICOES.listar(cursor)
     except pyodbc.Error as ex:
         print(f"Erro ao buscar condições de pagamento: {ex}")
         return []
     finally:
         if conn: conn.close()
 
+@instrumentar_consulta
 def get_condicoes_pagamento_detalhadas():
-    conn = get_db_connection()
+    conn = get_db_connection(leitura=True)
     if not conn: return []
     
     try:
@@ -424,6 +894,7 @@ def get_condicoes_pagamento_detalhadas():
             CODIGO_CPG AS codigo,
             DESCRI_CPG AS descricao,
             PEDECLI_CPG AS exige_cliente,
+            COND_CPG AS oculta,
             VISPRA_CPG AS tipo_pagamento,
             CASE VISPRA_CPG 
                 WHEN 1 THEN 'A VISTA'
@@ -442,18 +913,7 @@ def get_condicoes_pagamento_detalhadas():
         """
         
         cursor.execute(query)
-        condicoes = []
-        
-        for row in cursor.fetchall():
-            condicoes.append({
-                'codigo': row.codigo.strip() if row.codigo else '',
-                'descricao': row.descricao.strip() if row.descricao else '',
-                'exige_cliente': row.exige_cliente.strip() if row.exige_cliente else 'S',
-                'tipo_pagamento': row.tipo_pagamento,
-                'tipo_descricao': row.tipo_descricao,
-                'permite_sem_cliente': row.exige_cliente.strip() == 'N' if row.exige_cliente else False
-            })
-        return condicoes
+        return MAPEADOR_CONDICOES_DETALHADAS.listar(cursor)
         
     except pyodbc.Error as ex:
         print(f"Erro ao buscar condições de pagamento detalhadas: {ex}")
@@ -461,8 +921,9 @@ def get_condicoes_pagamento_detalhadas():
     finally:
         if conn: conn.close()
 
+@instrumentar_consulta
 def condicao_permite_sem_cliente(codigo_condicao):
-    conn = get_db_connection()
+    conn = get_db_connection(leitura=True)
     if not conn: return False
     
     try:
@@ -534,7 +995,7 @@ def validar_tipo_pagamento_permitido(tipo_cli, vispra_cpg):
     
     return True, ""
 
-def _get_search_priority(item, termo_busca):
+def prioridade_busca(item, termo_busca):
     termo_lower = termo_busca.lower()
     
     if 'codigo' in item and 'descricao' in item:
@@ -583,68 +1044,285 @@ def _get_search_priority(item, termo_busca):
     
     return (7, item.get('codigo', '').lower() or item.get('nome', '').lower())
 
-def buscar_produtos(codigo=None, nome=None, termo_inteligente=None):
-    conn = get_db_connection()
-    if not conn: return []
-    produtos = []
-    try:
-        cursor = conn.cursor()
-        query = """
-            SELECT p.AU_ITE, p.AB_ITE, u.AB_UNI, pa.PrecoVendaMax, pa.CustoMedio, pa.DescontoMaximo
-            FROM CE_PRODUTO p
-            LEFT JOIN AUNIDACE u ON p.AH_ITE = u.AA_UNI
-            LEFT JOIN CE_PRODUTOS_ADICIONAIS pa ON p.AU_ITE = pa.CodReduzido
-        """
-        params = []
-
-        if termo_inteligente:
-            query += " WHERE (p.AU_ITE LIKE ? OR UPPER(p.AB_ITE) LIKE ?)"
-            termo_upper = f"%{termo_inteligente.upper()}%"
-            params.extend([f"%{termo_inteligente}%", termo_upper])
-        elif codigo:
-            query += " WHERE p.AU_ITE = ?"
-            params.append(codigo)
-        elif nome:
-            query += " WHERE UPPER(p.AB_ITE) LIKE ?"
-            params.append(f"%{nome.upper()}%")
-
-        query += " ORDER BY p.AB_ITE"
-        cursor.execute(query, *params)
+MAPEADOR_PRODUTOS = Mapeador(
+    texto('codigo', 'AU_ITE'),
+    texto('descricao', 'AB_ITE'),
+    texto('unidade', 'AB_UNI', 'UN'),
+    decimal('preco', 'PrecoVendaMax'),
+    decimal('custo', 'CustoMedio'),
+    decimal('desconto_maximo', 'DescontoMaximo'),
+)
 
-        for row in cursor.fetchall():
-            produtos.append({
-                'codigo': row.AU_ITE.strip() if row.AU_ITE else '',
-                'descricao': row.AB_ITE.strip() if row.AB_ITE else '',
-                'unidade': row.AB_UNI.strip() if row.AB_UNI else 'UN',
-                'preco': Decimal(row.PrecoVendaMax or '0.0'),
-                'custo': Decimal(row.CustoMedio or '0.0'),
-                'desconto_maximo': Decimal(row.DescontoMaximo or '0.0')
-            })
-        
-        if termo_inteligente and produtos:
-            produtos = sorted(produtos, key=lambda p: _get_search_priority(p, termo_inteligente))
-            
-        return produtos
+_SQL_PRODUTOS = """
+        SELECT p.AU_ITE, p.AB_ITE, u.AB_UNI, pa.PrecoVendaMax, pa.CustoMedio, pa.DescontoMaximo
+        FROM CE_PRODUTO p
+        LEFT JOIN AUNIDACE u ON p.AH_ITE = u.AA_UNI
+        LEFT JOIN CE_PRODUTOS_ADICIONAIS pa ON p.AU_ITE = pa.CodReduzido
+    """
+
+def _consulta_produtos(codigo=None, nome=None, termo_inteligente=None, inicio=0, quantidade=None, codigos=None):
+    """(query, params) da busca de produtos; query None se não há o que buscar (lista de códigos vazia)."""
+    query = _SQL_PRODUTOS
+    params = []
+
+    if termo_inteligente:
+        query += " WHERE (p.AU_ITE LIKE ? OR UPPER(p.AB_ITE) LIKE ?)"
+        termo_upper = f"%{termo_inteligente.upper()}%"
+        params.extend([f"%{termo_inteligente}%", termo_upper])
+    elif codigos is not None:
+        if not codigos: return None, []
+        query += f" WHERE p.AU_ITE IN ({', '.join('?' * len(codigos))})"
+        params.extend(codigos)
+    elif codigo:
+        query += " WHERE p.AU_ITE = ?"
+        params.append(codigo)
+    elif nome:
+        query += " WHERE UPPER(p.AB_ITE) LIKE ?"
+        params.append(f"%{nome.upper()}%")
+
+    return _ordenar_e_paginar(query, params, 'AU_ITE', 'AB_ITE', termo_inteligente, inicio, quantidade)
+
+@instrumentar_consulta
+def buscar_produtos(codigo=None, nome=None, termo_inteligente=None, inicio=0, quantidade=None, codigos=None):
+    """Busca produtos; com `quantidade`, devolve só a página que começa em `inicio`.
+
+    `codigos` traz os produtos de uma lista de códigos (página do índice de busca).
+    """
+    query, params = _consulta_produtos(codigo, nome, termo_inteligente, inicio, quantidade, codigos)
+    if query is None: return []
+    try:
+        return list(_iterar_consulta(query, params, MAPEADOR_PRODUTOS))
     except pyodbc.Error as ex:
         print(f"Erro ao buscar produtos: {ex}")
         return []
+
+def iterar_produtos(tamanho_lote=TAMANHO_LOTE, **filtros):
+    """Produtos um a um, com os filtros de buscar_produtos, lidos do banco em lotes (memória constante)."""
+    query, params = _consulta_produtos(**filtros)
+    if query is None: return
+    try:
+        yield from _iterar_consulta(query, params, MAPEADOR_PRODUTOS, tamanho_lote)
+    except pyodbc.Error as ex:
+        print(f"Erro ao ler produtos: {ex}")
+
+@instrumentar_consulta
+def get_catalogo_produtos():
+    return _listar_linhas("SELECT AU_ITE, AB_ITE FROM CE_PRODUTO", "produtos")
+
+# Sincronização do catálogo local (catalogo.py). As linhas vão na ordem de
+# COLUNAS_CATALOGO, com a faixa do código na frente; cada sincronização lê tudo
+# numa conexão só, para a marca d'água e as linhas virem do mesmo banco.
+COLUNAS_CATALOGO = ('FAIXA', 'AU_ITE', 'AB_ITE', 'AB_UNI', 'PrecoVendaMax', 'CustoMedio', 'DescontoMaximo')
+FAIXAS_CATALOGO = 2048
+_LOTE_FILTRO = 1000
+
+# Faixa do produto pelo hash do código; & 2147483647 em vez de ABS, que estoura em -2^31
+_SQL_FAIXA = f"(BINARY_CHECKSUM(p.AU_ITE) & 2147483647) % {FAIXAS_CATALOGO}"
+_SQL_LINHAS_CATALOGO = _SQL_PRODUTOS.replace("SELECT p.AU_ITE", f"SELECT {_SQL_FAIXA} AS FAIXA, p.AU_ITE", 1)
+_SQL_CHECKSUMS_CATALOGO = f"""
+    SELECT FAIXA, CHECKSUM_AGG(LINHA), COUNT(*) FROM (
+        SELECT {_SQL_FAIXA} AS FAIXA,
+               BINARY_CHECKSUM(p.AU_ITE, p.AB_ITE, u.AB_UNI, pa.PrecoVendaMax, pa.CustoMedio, pa.DescontoMaximo) AS LINHA
+        FROM CE_PRODUTO p
+        LEFT JOIN AUNIDACE u ON p.AH_ITE = u.AA_UNI
+        LEFT JOIN CE_PRODUTOS_ADICIONAIS pa ON p.AU_ITE = pa.CodReduzido
+    ) t GROUP BY FAIXA
+"""
+
+def _versao_rastreamento(cursor):
+    """(versão atual, menor versão ainda consultável) do change tracking dos produtos, ou None se não está ativo."""
+    try:
+        cursor.execute("""
+            SELECT CHANGE_TRACKING_CURRENT_VERSION(),
+                   CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('CE_PRODUTO')),
+                   CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('CE_PRODUTOS_ADICIONAIS'))
+        """)
+        atual, minima_produto, minima_adicionais = cursor.fetchone()
+    except pyodbc.Error:
+        return None
+    if atual is None or minima_produto is None or minima_adicionais is None:
+        return None
+    return atual, max(minima_produto, minima_adicionais)
+
+def _checksums_catalogo(cursor):
+    cursor.execute(_SQL_CHECKSUMS_CATALOGO)
+    return {faixa: (checksum, quantidade) for faixa, checksum, quantidade in cursor.fetchall()}
+
+def _linhas_catalogo(cursor, coluna=None, valores=None):
+    """Linhas do catálogo; com `coluna`, só as em que ela está em `valores` (consultas de até _LOTE_FILTRO valores)."""
+    if coluna is None:
+        cursor.execute(_SQL_LINHAS_CATALOGO)
+        return [tuple(linha) for linha in cursor.fetchall()]
+    valores = list(valores)
+    linhas = []
+    for inicio in range(0, len(valores), _LOTE_FILTRO):
+        lote = valores[inicio:inicio + _LOTE_FILTRO]
+        cursor.execute(f"{_SQL_LINHAS_CATALOGO} WHERE {coluna} IN ({', '.join('?' * len(lote))})", *lote)
+        linhas.extend(tuple(linha) for linha in cursor.fetchall())
+    return linhas
+
+@instrumentar_consulta
+def get_catalogo_completo():
+    """(marca d'água, linhas) do catálogo inteiro, ou None se falhar.
+
+    A marca é a versão do change tracking, quando ativo nas duas tabelas; senão,
+    o checksum de cada faixa. Ela é lida antes das linhas: uma alteração feita no
+    meio da leitura volta na próxima sincronização em vez de se perder.
+    """
+    conn = get_db_connection(leitura=True)
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        versao = _versao_rastreamento(cursor)
+        if versao is not None:
+            marca = {'modo': 'rastreamento', 'versao': versao[0]}
+        else:
+            marca = {'modo': 'checksum', 'checksums': _checksums_catalogo(cursor)}
+        return marca, _linhas_catalogo(cursor)
+    except pyodbc.Error as ex:
+        print(f"Erro ao carregar catálogo de produtos: {ex}")
+        return None
     finally:
-        if conn: conn.close()
+        conn.close()
+
+@instrumentar_consulta
+def get_alteracoes_catalogo(marca):
+    """Alterações do catálogo desde `marca` (de get_catalogo_completo ou da chamada anterior).
+
+    Devolve (nova marca, linhas, códigos, faixas): as linhas atuais do que mudou;
+    os códigos (change tracking) ou as faixas (checksum) a substituir por elas,
+    o que some das linhas foi excluído. None se falhar; marca None se for preciso
+    recarregar tudo (change tracking desativado ou limpo depois da última versão).
+    """
+    conn = get_db_connection(leitura=True)
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        if marca['modo'] == 'rastreamento':
+            versao = _versao_rastreamento(cursor)
+            if versao is None or marca['versao'] < versao[1]:
+                return None, [], set(), set()
+            cursor.execute("""
+                SELECT c.AU_ITE FROM CHANGETABLE(CHANGES CE_PRODUTO, ?) AS c
+                UNION
+                SELECT c.CodReduzido FROM CHANGETABLE(CHANGES CE_PRODUTOS_ADICIONAIS, ?) AS c
+            """, marca['versao'], marca['versao'])
+            codigos = {(linha[0] or '').strip() for linha in cursor.fetchall()}
+            linhas = _linhas_catalogo(cursor, 'p.AU_ITE', codigos)
+            return {'modo': 'rastreamento', 'versao': versao[0]}, linhas, codigos, set()
+
+        checksums = _checksums_catalogo(cursor)
+        anteriores = marca['checksums']
+        faixas = {faixa for faixa in checksums.keys() | anteriores.keys() if checksums.get(faixa) != anteriores.get(faixa)}
+        linhas = _linhas_catalogo(cursor, _SQL_FAIXA, faixas)
+        return {'modo': 'checksum', 'checksums': checksums}, linhas, set(), faixas
+    except pyodbc.Error as ex:
+        print(f"Erro ao sincronizar catálogo de produtos: {ex}")
+        return None
+    finally:
+        conn.close()
 
 def get_produto_por_codigo(codigo):
-    produtos = buscar_produtos(codigo=codigo)
+    try:
+        produtos = buscar_produtos(codigo=codigo)
+    except ErroConsulta as ex:
+        print(f"Erro ao buscar produto {codigo}: {ex}")
+        return None
     return produtos[0] if produtos else None
 
-def salvar_orcamento(orcamento: Orcamento, itens: list[ItemOrcamento]):
-    conn = get_db_connection()
-    if not conn:
-        return False, "Não foi possível conectar ao banco de dados."
-    
+SQL_INSERIR_APRODUNO = """
+    INSERT INTO APRODUNO (
+        AA_PCA, AL_PCA, AB_PCA, AC_PCA, AD_PCA, AE_PCA, AF_PCA, AG_PCA, AI_PCA, AK_PCA, 
+        AN_PCA, AO_PCA, AP_PCA, AQ_PCA, QTDE_PCA, AR_PCA, AS_PCA, AT_PCA, AU_PCA, 
+        AV_PCA, AX_PCA, AY_PCA, AZ_PCA, BB_PCA
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _parametros_itens(itens, numero_nota, terminal):
+    """Parâmetros do INSERT em APRODUNO a partir de uma lista de ItemOrcamento ou de um ItemBatch."""
+    if isinstance(itens, ItemBatch):
+        return list(itens.parametros_aproduno(numero_nota, terminal, get_deposito_config()))
+    zero = Decimal('0.0')
+    return [
+        (item.numero_nota, terminal, item.codigo_produto, item.deposito,
+         item.quantidade, item.valor_unitario, item.valor_desconto,
+         item.total_bruto_item, item.sequencia, item.custo, item.total_bruto_item,
+         zero, zero, zero, zero, zero, '', 'N', zero, zero, zero, '', zero, 'N')
+        for item in itens
+    ]
+
+def _inserir_itens(cursor, parametros):
+    # Um único envio em lote em vez de um comando por item
+    if parametros:
+        cursor.fast_executemany = True
+        cursor.executemany(SQL_INSERIR_APRODUNO, parametros)
+
+def _gravar_com_repeticao(gravar, ja_gravado=None):
+    """Executa gravar(cursor) numa transação e faz o commit; em falha passageira,
+    repete a transação inteira numa conexão nova, com espera.
+
+    Se a conexão cair durante o commit, não dá para saber se ele chegou ao banco:
+    antes de repetir, ja_gravado(cursor) confere isso e, se devolver algo além de
+    None, esse é o resultado. Devolve (resultado de gravar, None), ou (None, erro)
+    com o último pyodbc.Error (None se não conectou).
+    """
+    erro = None
+    for tentativa in range(TENTATIVAS):
+        if tentativa:
+            time.sleep(espera(tentativa - 1))
+        conn = get_db_connection()
+        if not conn:
+            return None, erro
+        try:
+            cursor = conn.cursor()
+            if erro is not None and ja_gravado is not None:
+                resultado = ja_gravado(cursor)
+                if resultado is not None:
+                    registrar_fim_repeticao(recuperada=True)
+                    return resultado, None
+            resultado = gravar(cursor)
+            conn.commit()
+            if erro is not None:
+                registrar_fim_repeticao(recuperada=True)
+            return resultado, None
+        except pyodbc.Error as ex:
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                pass
+            transitorio = eh_transitorio(ex)
+            if transitorio and tentativa + 1 < TENTATIVAS:
+                registrar_repeticao(sqlstate(ex), reconexao=True)
+                erro = ex
+                continue
+            if erro is not None:
+                registrar_fim_repeticao(recuperada=False)
+            return None, ex
+        finally:
+            conn.close()
+    return None, erro
+
+def _orcamento_gravado(cursor, orcamento, terminal, quantidade_itens):
+    """Se o orçamento (AA_NFA, AO_NFA) já está no banco, finalizado, com este cliente, total e itens."""
+    cursor.execute("SELECT AB_NFA, AI_NFA, NotaEmLancto_NFA FROM ANOTASNO WHERE AA_NFA = ? AND AO_NFA = ?",
+                   orcamento.numero_nota, terminal)
+    cabecalho = cursor.fetchone()
+    if not cabecalho or (cabecalho[2] or '').strip() != 'N':
+        return False
+    if (cabecalho[0] or '').strip() != (orcamento.codigo_cliente or '').strip():
+        return False
+    if Decimal(cabecalho[1] or 0) != Decimal(orcamento.valor_total or 0):
+        return False
+    cursor.execute("SELECT COUNT(*) FROM APRODUNO WHERE AA_PCA = ? AND AL_PCA = ?", orcamento.numero_nota, terminal)
+    return cursor.fetchone()[0] == quantidade_itens
+
+@instrumentar_consulta
+def salvar_orcamento(orcamento: Orcamento, itens: list[ItemOrcamento] | ItemBatch):
     terminal = get_terminal_config()
-    
-    try:
-        cursor = conn.cursor()
-        
+    parametros_itens = _parametros_itens(itens, orcamento.numero_nota, terminal)
+    sucesso = (True, "Orçamento salvo com sucesso!")
+
+    def gravar(cursor):
         sql_anotasno = """
             INSERT INTO ANOTASNO (
                 AA_NFA, AB_NFA, AC_NFA, AD_NFA, AE_NFA, AF_NFA, AG_NFA, AH_NFA, 
@@ -662,37 +1340,28 @@ def salvar_orcamento(orcamento: Orcamento, itens: list[ItemOrcamento]):
         )
         cursor.execute(sql_anotasno, params_anotasno)
 
-        sql_aproduno = """
-            INSERT INTO APRODUNO (
-                AA_PCA, AL_PCA, AB_PCA, AC_PCA, AD_PCA, AE_PCA, AF_PCA, AG_PCA, AI_PCA, AK_PCA, 
-                AN_PCA, AO_PCA, AP_PCA, AQ_PCA, QTDE_PCA, AR_PCA, AS_PCA, AT_PCA, AU_PCA, 
-                AV_PCA, AX_PCA, AY_PCA, AZ_PCA, BB_PCA
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        for item in itens:
-            params_aproduno = (
-                item.numero_nota, terminal, item.codigo_produto, item.deposito,
-                item.quantidade, item.valor_unitario, item.valor_desconto,
-                item.total_bruto_item, item.sequencia, item.custo, item.total_bruto_item,
-                Decimal('0.0'), Decimal('0.0'), Decimal('0.0'), Decimal('0.0'),
-                Decimal('0.0'), '', 'N', Decimal('0.0'), Decimal('0.0'),
-                Decimal('0.0'), '', Decimal('0.0'), 'N'
-            )
-            cursor.execute(sql_aproduno, params_aproduno)
+        _inserir_itens(cursor, parametros_itens)
 
         sql_finalizar = f"UPDATE ANOTASNO SET NotaEmLancto_NFA = 'N' WHERE AA_NFA = ? AND AO_NFA = '{terminal}'"
         cursor.execute(sql_finalizar, orcamento.numero_nota)
+        return sucesso
 
-        conn.commit()
-        return True, "Orçamento salvo com sucesso!"
-    except pyodbc.Error as ex:
-        conn.rollback()
-        print(f"Erro ao salvar orçamento: {ex}")
-        return False, f"Erro ao salvar no banco de dados: {ex}"
-    finally:
-        if conn: conn.close()
+    # Repetir o INSERT depois de um commit que chegou ao banco daria chave duplicada
+    def ja_gravado(cursor):
+        return sucesso if _orcamento_gravado(cursor, orcamento, terminal, len(parametros_itens)) else None
 
+    resultado, erro = _gravar_com_repeticao(gravar, ja_gravado)
+    if resultado is not None:
+        _ajustar_exposicao(orcamento.codigo_cliente, 1, arredondar(orcamento.valor_total))
+        return resultado
+    if erro is None:
+        return False, "Não foi possível conectar ao banco de dados."
+    print(f"Erro ao salvar orçamento: {erro}")
+    return False, f"Erro ao salvar no banco de dados: {erro}"
+
+@instrumentar_consulta
 def get_orcamento_cabecalho(numero_nota):
+    # No principal, como get_orcamento_itens: o orçamento pode ter acabado de ser gravado
     conn = get_db_connection()
     if not conn: return None
     
@@ -700,7 +1369,7 @@ def get_orcamento_cabecalho(numero_nota):
     
     try:
         cursor = conn.cursor()
-        query = "SELECT AB_NFA, AE_NFA, AD_NFA, AF_NFA FROM ANOTASNO WHERE AA_NFA = ? AND AO_NFA = ?"
+        query = "SELECT AB_NFA, AE_NFA, AD_NFA, AF_NFA, AI_NFA FROM ANOTASNO WHERE AA_NFA = ? AND AO_NFA = ?"
         cursor.execute(query, numero_nota, terminal)
         row = cursor.fetchone()
         if row:
@@ -708,7 +1377,8 @@ def get_orcamento_cabecalho(numero_nota):
                 'codigo_cliente': row.AB_NFA.strip() if row.AB_NFA else '',
                 'codigo_vendedor': row.AE_NFA.strip() if row.AE_NFA else '',
                 'codigo_cond_pag': row.AD_NFA.strip() if row.AD_NFA else '',
-                'status': row.AF_NFA.strip() if row.AF_NFA else ''
+                'status': row.AF_NFA.strip() if row.AF_NFA else '',
+                'valor_total': arredondar(row.AI_NFA or 0)
             }
         return None
     except pyodbc.Error as ex:
@@ -717,13 +1387,23 @@ def get_orcamento_cabecalho(numero_nota):
     finally:
         if conn: conn.close()
 
+MAPEADOR_ITENS_ORCAMENTO = Mapeador(
+    texto('codigo', 'AB_PCA'),
+    texto('descricao', 'AB_ITE'),
+    decimal('quantidade', 'AD_PCA'),
+    texto('unidade', 'AB_UNI', 'UN'),
+    decimal('preco', 'AE_PCA'),
+    decimal('custo', 'CustoMedio'),
+    decimal('desconto', 'AF_PCA'),
+)
+
+@instrumentar_consulta
 def get_orcamento_itens(numero_nota):
     conn = get_db_connection()
     if not conn: return []
     
     terminal = get_terminal_config()
     
-    itens = []
     try:
         cursor = conn.cursor()
         query = """
@@ -735,20 +1415,9 @@ def get_orcamento_itens(numero_nota):
             WHERE p.AA_PCA = ? AND p.AL_PCA = ?
         """
         cursor.execute(query, numero_nota, terminal)
-        for row in cursor.fetchall():
-            quantidade = Decimal(row.AD_PCA or '0.0')
-            preco = Decimal(row.AE_PCA or '0.0')
-            desconto = Decimal(row.AF_PCA or '0.0')
-            itens.append({
-                'codigo': row.AB_PCA.strip() if row.AB_PCA else '',
-                'descricao': row.AB_ITE.strip() if row.AB_ITE else '',
-                'quantidade': quantidade,
-                'unidade': row.AB_UNI.strip() if row.AB_UNI else 'UN',
-                'preco': preco,
-                'custo': Decimal(row.CustoMedio or '0.0'),
-                'subtotal': quantidade * preco,
-                'desconto': desconto
-            })
+        itens = MAPEADOR_ITENS_ORCAMENTO.listar(cursor)
+        for item in itens:
+            item['subtotal'] = arredondar(item['quantidade'] * item['preco'])
         return itens
     except pyodbc.Error as ex:
         print(f"Erro ao buscar itens do orçamento {numero_nota}: {ex}")
@@ -756,22 +1425,206 @@ def get_orcamento_itens(numero_nota):
     finally:
         if conn: conn.close()
 
-def atualizar_orcamento(orcamento: Orcamento, itens: list[ItemOrcamento]):
-    conn = get_db_connection()
-    if not conn:
-        return False, "Não foi possível conectar ao banco de dados."
-    
+# Histórico de orçamentos do terminal, do mais recente para o mais antigo, paginado pela
+# chave (AC_NFA, AA_NFA): cada página continua depois da última linha da anterior, sem
+# OFFSET, e custa o mesmo no começo da lista ou anos para trás. No SQL Server, os índices
+# que cobrem a consulta (a leitura não volta à tabela):
+#   CREATE INDEX IX_ANOTASNO_HISTORICO ON ANOTASNO (AO_NFA, AC_NFA, AA_NFA)
+#       INCLUDE (AB_NFA, AE_NFA, AF_NFA, AI_NFA, NotaEmLancto_NFA)
+#   CREATE INDEX IX_ANOTASNO_CLIENTE ON ANOTASNO (AB_NFA, AO_NFA, AC_NFA, AA_NFA)
+#       INCLUDE (AE_NFA, AF_NFA, AI_NFA, NotaEmLancto_NFA)
+#   CREATE INDEX IX_APRODUNO_PRODUTO ON APRODUNO (AB_PCA, AL_PCA, AA_PCA)
+#       INCLUDE (AD_PCA, AE_PCA)
+# O último também atende buscar_orcamentos_com_produto.
+MAPEADOR_HISTORICO = Mapeador(
+    texto('numero', 'AA_NFA'),
+    valor('data', 'AC_NFA'),
+    texto('codigo_cliente', 'AB_NFA'),
+    texto('cliente', 'NOME_CLI'),
+    texto('codigo_vendedor', 'AE_NFA'),
+    texto('vendedor', 'NOME_VEN'),
+    texto('status', 'AF_NFA'),
+    decimal('valor_total', 'AI_NFA'),
+)
+
+SITUACOES_HISTORICO = {'abertos': "n.AF_NFA = '8'", 'convertidos': "n.AF_NFA <> '8'"}
+
+def _consulta_historico(filtros, apos, quantidade):
+    """(query, params) de uma página do histórico; `apos` é a chave (data, número) da última linha já lida."""
+    query = ("SELECT TOP (?) n.AA_NFA, n.AC_NFA, n.AB_NFA, c.NOME_CLI, n.AE_NFA, v.NOME_VEN, n.AF_NFA, n.AI_NFA"
+             " FROM ANOTASNO n"
+             " LEFT JOIN ACLIENGE c ON c.CODIGO_CLI = n.AB_NFA"
+             " LEFT JOIN AVENDEGE v ON v.CODIGO_VEN = n.AE_NFA"
+             " WHERE n.AO_NFA = ? AND n.NotaEmLancto_NFA = 'N'")
     terminal = get_terminal_config()
-    
+    params = [quantidade, terminal]
+
+    if filtros.get('data_inicial'):
+        query += " AND n.AC_NFA >= ?"
+        params.append(filtros['data_inicial'])
+    if filtros.get('data_final'):
+        # Até o fim do dia, com a coluna livre para o índice
+        query += " AND n.AC_NFA < ?"
+        params.append(filtros['data_final'] + timedelta(days=1))
+    if filtros.get('codigo_cliente'):
+        query += " AND n.AB_NFA = ?"
+        params.append(filtros['codigo_cliente'])
+    if filtros.get('codigo_vendedor'):
+        query += " AND n.AE_NFA = ?"
+        params.append(filtros['codigo_vendedor'])
+    if filtros.get('situacao') in SITUACOES_HISTORICO:
+        query += f" AND {SITUACOES_HISTORICO[filtros['situacao']]}"
+    if filtros.get('codigo_produto'):
+        # Parte dos itens do produto (IX_APRODUNO_PRODUTO), poucos, em vez de conferir cada orçamento
+        query += " AND n.AA_NFA IN (SELECT i.AA_PCA FROM APRODUNO i WHERE i.AB_PCA = ? AND i.AL_PCA = ?)"
+        params.extend([filtros['codigo_produto'], terminal])
+    if apos is not None:
+        data, numero = apos
+        # O "<=" sozinho na data é o que deixa o banco começar a leitura do índice na chave
+        query += " AND n.AC_NFA <= ? AND (n.AC_NFA < ? OR n.AA_NFA < ?)"
+        params.extend([data, data, numero])
+
+    query += " ORDER BY n.AC_NFA DESC, n.AA_NFA DESC"
+    return query, params
+
+@instrumentar_consulta
+def buscar_historico_orcamentos(filtros, apos=None, quantidade=100):
+    """Até `quantidade` orçamentos do terminal que atendem `filtros`, depois da chave `apos`.
+
+    filtros: data_inicial e data_final (datetime, dias inteiros), codigo_cliente,
+    codigo_vendedor, situacao ('abertos' ou 'convertidos') e codigo_produto (orçamentos
+    que contêm o produto); os ausentes não filtram. A chave da última linha, para
+    pedir a página seguinte, é chave_historico(registro).
+    """
+    query, params = _consulta_historico(filtros, apos, quantidade)
     try:
-        cursor = conn.cursor()
+        return list(_iterar_consulta(query, params, MAPEADOR_HISTORICO))
+    except pyodbc.Error as ex:
+        print(f"Erro ao buscar histórico de orçamentos: {ex}")
+        return []
+
+def chave_historico(registro):
+    return registro['data'], registro['numero']
+
+# Orçamentos em aberto que contêm um produto, de todos os terminais: a leitura parte dos
+# itens do produto em IX_APRODUNO_PRODUTO (poucas linhas, mesmo com milhões de itens na
+# tabela) e só então vai aos cabeçalhos
+MAPEADOR_ITENS_PRODUTO = Mapeador(
+    texto('numero', 'AA_NFA'),
+    texto('terminal', 'AO_NFA'),
+    valor('data', 'AC_NFA'),
+    texto('codigo_cliente', 'AB_NFA'),
+    texto('cliente', 'NOME_CLI'),
+    decimal('valor_total', 'AI_NFA'),
+    decimal('quantidade', 'AD_PCA'),
+    decimal('preco', 'AE_PCA'),
+)
+
+@instrumentar_consulta
+def buscar_orcamentos_com_produto(codigo_produto):
+    """Orçamentos em aberto (AF_NFA = '8') com o produto, do mais recente para o mais antigo.
+
+    Um registro por orçamento, com 'chave' (número, terminal), a quantidade somada do
+    produto e o maior preço unitário dele no orçamento.
+    """
+    query = """
+        SELECT n.AA_NFA, n.AO_NFA, n.AC_NFA, n.AB_NFA, c.NOME_CLI, n.AI_NFA, i.AD_PCA, i.AE_PCA
+        FROM APRODUNO i
+        JOIN ANOTASNO n ON n.AA_NFA = i.AA_PCA AND n.AO_NFA = i.AL_PCA
+        LEFT JOIN ACLIENGE c ON c.CODIGO_CLI = n.AB_NFA
+        WHERE i.AB_PCA = ? AND n.AF_NFA = '8' AND n.NotaEmLancto_NFA = 'N'
+        ORDER BY n.AC_NFA DESC, n.AA_NFA DESC, n.AO_NFA
+    """
+    orcamentos = {}
+    try:
+        # No principal: a lista vai para reajustar_preco_orcamentos e tem de incluir os
+        # orçamentos recém-gravados, que a réplica pode ainda não ter
+        for item in _iterar_consulta(query, [codigo_produto], MAPEADOR_ITENS_PRODUTO, leitura=False):
+            chave = (item['numero'], item['terminal'])
+            orcamento = orcamentos.get(chave)
+            if orcamento is None:
+                item['chave'] = chave
+                orcamentos[chave] = item
+            else:
+                # O produto em mais de uma linha do orçamento
+                orcamento['quantidade'] += item['quantidade']
+                orcamento['preco'] = max(orcamento['preco'], item['preco'])
+    except pyodbc.Error as ex:
+        print(f"Erro ao buscar orçamentos com o produto {codigo_produto}: {ex}")
+        return []
+    return list(orcamentos.values())
+
+_SQL_ORCAMENTO_ABERTO = """EXISTS (SELECT 1 FROM ANOTASNO n WHERE n.AA_NFA = APRODUNO.AA_PCA
+    AND n.AO_NFA = APRODUNO.AL_PCA AND n.AF_NFA = '8' AND n.NotaEmLancto_NFA = 'N')"""
+
+@instrumentar_consulta
+def reajustar_preco_orcamentos(codigo_produto, novo_preco, orcamentos):
+    """Troca o preço unitário do produto nos orçamentos `orcamentos` (registros de
+    buscar_orcamentos_com_produto), numa transação só.
+
+    O desconto de cada linha acompanha o novo subtotal (mesmo percentual) e o valor do
+    orçamento é somado de novo dos itens. Orçamentos convertidos ou em alteração desde a
+    busca ficam como estão. Refazer a transação dá o mesmo resultado, por isso ela pode
+    ser repetida em falha passageira. Devolve (sucesso, mensagem).
+    """
+    novo_preco = arredondar(novo_preco)
+    chaves = [orcamento['chave'] for orcamento in orcamentos]
+    if not chaves:
+        return False, "Nenhum orçamento para reajustar."
+
+    def gravar(cursor):
+        sql_itens = f"""
+            UPDATE APRODUNO SET
+                AF_PCA = CASE WHEN AG_PCA <> 0 THEN ROUND(AF_PCA * ROUND(AD_PCA * ?, 2) / AG_PCA, 2) ELSE AF_PCA END,
+                AE_PCA = ?, AG_PCA = ROUND(AD_PCA * ?, 2), AN_PCA = ROUND(AD_PCA * ?, 2)
+            WHERE AB_PCA = ? AND AA_PCA = ? AND AL_PCA = ? AND {_SQL_ORCAMENTO_ABERTO}
+        """
+        sql_total = """
+            UPDATE ANOTASNO SET AI_NFA = (SELECT SUM(i.AG_PCA) FROM APRODUNO i
+                                          WHERE i.AA_PCA = ANOTASNO.AA_NFA AND i.AL_PCA = ANOTASNO.AO_NFA)
+            WHERE AA_NFA = ? AND AO_NFA = ? AND AF_NFA = '8' AND NotaEmLancto_NFA = 'N'
+        """
+        cursor.fast_executemany = True
+        cursor.executemany(sql_itens, [(novo_preco, novo_preco, novo_preco, novo_preco, codigo_produto, numero,
+                                        terminal) for numero, terminal in chaves])
+        cursor.executemany(sql_total, chaves)
+        return True, f"Preço do produto {codigo_produto} reajustado em {len(chaves)} orçamento(s)."
+
+    resultado, erro = _gravar_com_repeticao(gravar)
+    if resultado is not None:
+        # O valor em aberto dos clientes mudou: a próxima conferência de limite relê do banco
+        for codigo_cliente in {orcamento['codigo_cliente'] for orcamento in orcamentos}:
+            chave = _chave_exposicao(codigo_cliente)
+            if chave:
+                _cache_exposicao.invalidar(chave)
+        return resultado
+    if erro is None:
+        return False, "Não foi possível conectar ao banco de dados."
+    print(f"Erro ao reajustar preço nos orçamentos: {erro}")
+    return False, f"Erro ao reajustar no banco de dados: {erro}"
+
+@instrumentar_consulta
+def atualizar_orcamento(orcamento: Orcamento, itens: list[ItemOrcamento] | ItemBatch):
+    terminal = get_terminal_config()
+    parametros_itens = _parametros_itens(itens, orcamento.numero_nota, terminal)
 
-        query_status = f"SELECT AF_NFA FROM ANOTASNO WHERE AA_NFA = ? AND AO_NFA = '{terminal}'"
+    # Cliente e valor do orçamento antes da alteração, para o ajuste da exposição de crédito
+    anterior = {}
+
+    # Apaga e regrava os itens: repetir a transação depois de um commit que chegou ao banco dá o mesmo resultado
+    def gravar(cursor):
+        query_status = f"SELECT AF_NFA, AB_NFA, AI_NFA, NotaEmLancto_NFA FROM ANOTASNO WHERE AA_NFA = ? AND AO_NFA = '{terminal}'"
         cursor.execute(query_status, orcamento.numero_nota)
         status_row = cursor.fetchone()
 
         if status_row and status_row[0] != '8':
             return False, "Este orçamento já foi convertido em venda e não pode ser alterado."
+        # Só a primeira tentativa lê o orçamento de antes: numa repetição depois de um commit que
+        # chegou ao banco, a leitura já traria o novo
+        if 'lido' not in anterior:
+            anterior['lido'] = True
+            if status_row and (status_row[3] or '').strip() == 'N':
+                anterior.update(cliente=status_row[1], valor=arredondar(status_row[2] or 0))
 
         sql_delete_itens = f"DELETE FROM APRODUNO WHERE AA_PCA = ? AND AL_PCA = '{terminal}'"
         cursor.execute(sql_delete_itens, orcamento.numero_nota)
@@ -787,38 +1640,27 @@ def atualizar_orcamento(orcamento: Orcamento, itens: list[ItemOrcamento]):
         )
         cursor.execute(sql_update_anotasno, params_update)
 
-        sql_aproduno = """
-            INSERT INTO APRODUNO (
-                AA_PCA, AL_PCA, AB_PCA, AC_PCA, AD_PCA, AE_PCA, AF_PCA, AG_PCA, AI_PCA, AK_PCA, 
-                AN_PCA, AO_PCA, AP_PCA, AQ_PCA, QTDE_PCA, AR_PCA, AS_PCA, AT_PCA, AU_PCA, 
-                AV_PCA, AX_PCA, AY_PCA, AZ_PCA, BB_PCA
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        for item in itens:
-            params_aproduno = (
-                item.numero_nota, terminal, item.codigo_produto, item.deposito,
-                item.quantidade, item.valor_unitario, item.valor_desconto,
-                item.total_bruto_item, item.sequencia, item.custo, item.total_bruto_item,
-                Decimal('0.0'), Decimal('0.0'), Decimal('0.0'), Decimal('0.0'),
-                Decimal('0.0'), '', 'N', Decimal('0.0'), Decimal('0.0'),
-                Decimal('0.0'), '', Decimal('0.0'), 'N'
-            )
-            cursor.execute(sql_aproduno, params_aproduno)
+        _inserir_itens(cursor, parametros_itens)
 
         sql_finalizar = f"UPDATE ANOTASNO SET NotaEmLancto_NFA = 'N' WHERE AA_NFA = ? AND AO_NFA = '{terminal}'"
         cursor.execute(sql_finalizar, orcamento.numero_nota)
-
-        conn.commit()
         return True, "Orçamento atualizado com sucesso!"
-    except pyodbc.Error as ex:
-        conn.rollback()
-        print(f"Erro ao atualizar orçamento: {ex}")
-        return False, f"Erro ao atualizar no banco de dados: {ex}"
-    finally:
-        if conn: conn.close()
 
+    resultado, erro = _gravar_com_repeticao(gravar)
+    if resultado is not None:
+        if resultado[0]:
+            if 'cliente' in anterior:
+                _ajustar_exposicao(anterior['cliente'], -1, -anterior['valor'])
+            _ajustar_exposicao(orcamento.codigo_cliente, 1, arredondar(orcamento.valor_total))
+        return resultado
+    if erro is None:
+        return False, "Não foi possível conectar ao banco de dados."
+    print(f"Erro ao atualizar orçamento: {erro}")
+    return False, f"Erro ao atualizar no banco de dados: {erro}"
+
+@instrumentar_consulta
 def get_dados_empresa():
-    conn = get_db_connection()
+    conn = get_db_connection(leitura=True)
     if not conn: return None
     
     try:
@@ -842,6 +1684,7 @@ def get_dados_empresa():
     finally:
         if conn: conn.close()
 
+@instrumentar_consulta
 def inserir_desconto_vendedor(codigo_usuario, codigo_vendedor, percentual_max):
     conn = get_db_connection()
     if not conn:
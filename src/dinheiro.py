@@ -0,0 +1,63 @@
+"""Aritmética de dinheiro em centavos inteiros e formatação no padrão brasileiro.
+
+Valores monetários entram e saem do sistema como Decimal com 2 casas; as contas
+que precisam fechar ao centavo (totais, rateio de desconto) são feitas em int.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTAVO = Decimal('0.01')
+
+
+def para_centavos(valor):
+    """Converte Decimal, int, float ou texto ("1.234,56") para centavos, arredondando meio para cima."""
+    if isinstance(valor, str):
+        valor = interpretar(valor)
+    elif isinstance(valor, float):
+        valor = Decimal(repr(valor))
+    elif not isinstance(valor, Decimal):
+        valor = Decimal(valor)
+    return int((valor * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def de_centavos(centavos):
+    """Centavos (int) para Decimal com exatamente 2 casas."""
+    return (Decimal(centavos) / 100).quantize(CENTAVO)
+
+
+def arredondar(valor):
+    """Arredonda um valor monetário para 2 casas (meio para cima)."""
+    return de_centavos(para_centavos(valor))
+
+
+def percentual(parte_centavos, total_centavos):
+    """Percentual que `parte` representa de `total`, em Decimal (0 se total for 0)."""
+    if not total_centavos:
+        return Decimal('0.0')
+    return Decimal(parte_centavos) * 100 / Decimal(total_centavos)
+
+
+def interpretar(texto, padrao=None):
+    """Lê um número digitado ("1234,5", "1.234,56" ou "1234.56"); devolve `padrao` se inválido.
+
+    Com vírgula e ponto juntos, o ponto é separador de milhar; só com ponto, é decimal.
+    """
+    limpo = (texto or '').strip().replace('R$', '').replace(' ', '')
+    if ',' in limpo:
+        limpo = limpo.replace('.', '').replace(',', '.')
+    try:
+        return Decimal(limpo)
+    except (InvalidOperation, ValueError):
+        if padrao is None:
+            raise
+        return padrao
+
+
+def formatar_numero(valor, casas=2):
+    """Formato 1234,56, para campos editáveis e colunas da tabela (sem separador de milhar)."""
+    return f"{valor:.{casas}f}".replace('.', ',')
+
+
+def formatar_moeda(valor, simbolo=True):
+    """Formato R$ 1.234,56."""
+    texto = f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+    return f"R$ {texto}" if simbolo else texto
@@ -0,0 +1,264 @@
+"""Índice de busca em memória para produtos e clientes, sem acento e sem caixa.
+
+Os textos são normalizados ("Conexão" -> "CONEXAO") e quebrados em palavras.
+Uma busca com várias palavras ("tubo 25 pvc") traz os registros em que cada
+palavra do termo aparece dentro de alguma palavra do registro, em qualquer
+ordem; com 3 letras ou mais, vale também o trecho no código. Para achar as
+palavras do vocabulário que contêm um trecho, o vocabulário tem um índice de
+trigramas; trechos de 1 ou 2 letras varrem só as palavras dos textos (os
+códigos ficam de fora). O registro é encontrado pelas listas de ocorrência
+(palavra -> registros).
+
+Os registros são numerados na ordem (texto, código), de modo que a ordem
+numérica já é a ordem alfabética usada no desempate.
+
+IndiceDocumentos é o índice dos clientes por CPF/CNPJ e telefone, só com os
+dígitos: o balcão digita o documento com ou sem pontuação e cai direto no dict.
+"""
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+# Resultados maiores que isso não passam pela classificação completa: só os
+# códigos exatos ou por prefixo sobem, e o resto fica em ordem alfabética
+LIMITE_CLASSIFICACAO = 5000
+# Conferir o texto de um registro custa umas 30 vezes mais que juntar uma ocorrência
+CUSTO_CONFERIR = 30
+
+# Termos com pelo menos isso de dígitos (telefone sem DDD) e só pontuação de
+# documento ou telefone vão para o IndiceDocumentos; os códigos têm 5 dígitos
+MINIMO_DIGITOS_DOCUMENTO = 8
+
+_RE_SEPARADORES = re.compile(r'[^0-9A-Z]+')
+_RE_NAO_DIGITOS = re.compile(r'\D+')
+_RE_DOCUMENTO = re.compile(r'[0-9 .\-/()+]+')
+
+
+def normalizar(texto):
+    """Maiúsculas sem acentos: 'Conexão ½' -> 'CONEXAO 1/2'."""
+    if not texto:
+        return ''
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).upper()
+
+
+def tokenizar(texto_normalizado):
+    return [token for token in _RE_SEPARADORES.split(texto_normalizado) if token]
+
+
+def _trigramas(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _atende(token, texto_normalizado, codigo_normalizado):
+    # O token não tem separadores: achá-lo no texto é achá-lo dentro de uma palavra
+    return token in texto_normalizado or (len(token) >= 3 and token in codigo_normalizado)
+
+
+def corresponde(codigo, texto, termo):
+    """Se o registro (código, texto original) atende ao termo, como IndiceBusca.buscar."""
+    texto_normalizado, codigo_normalizado = normalizar(texto), normalizar(codigo)
+    return all(_atende(token, texto_normalizado, codigo_normalizado) for token in tokenizar(normalizar(termo)))
+
+
+def prioridade(codigo, texto_normalizado, termo_normalizado, tokens_termo):
+    """Classificação do resultado (menor vem antes).
+
+    0 código igual ao termo, 1 código começa com o termo, 2 texto igual,
+    3 texto começa com o termo, 4 toda palavra do termo começa uma palavra
+    do texto, 5 as demais (palavras contidas no meio).
+    """
+    if codigo == termo_normalizado:
+        return 0
+    if codigo.startswith(termo_normalizado):
+        return 1
+    if texto_normalizado == termo_normalizado:
+        return 2
+    if texto_normalizado.startswith(termo_normalizado):
+        return 3
+    palavras = tokenizar(texto_normalizado)
+    if all(any(palavra.startswith(token) for palavra in palavras) for token in tokens_termo):
+        return 4
+    return 5
+
+
+def chave_ordenacao(codigo, texto, termo):
+    """Chave de sort() para registros já carregados, na mesma ordem de IndiceBusca.buscar."""
+    termo_normalizado = normalizar(termo).strip()
+    texto_normalizado = normalizar(texto)
+    return (prioridade(normalizar(codigo), texto_normalizado, termo_normalizado, tokenizar(termo_normalizado)),
+            texto_normalizado, codigo)
+
+
+class IndiceBusca:
+    """Índice de (código, texto) montado uma vez a partir do cadastro.
+
+    buscar(termo) devolve as posições dos registros encontrados, já classificadas;
+    codigos[posicao] dá o código para buscar os detalhes no banco.
+    """
+
+    def __init__(self, registros):
+        pares = sorted(((normalizar(texto), (codigo or '').strip()) for codigo, texto in registros))
+        self.textos = [texto for texto, _ in pares]
+        self.codigos = [codigo for _, codigo in pares]
+        self.posicoes = {codigo: posicao for posicao, codigo in enumerate(self.codigos)}
+        self.codigos_normalizados = [codigo if codigo == normalizado else normalizado
+                                     for codigo, normalizado in ((c, normalizar(c)) for c in self.codigos)]
+        self.codigos_ordenados = sorted((codigo, posicao) for posicao, codigo in enumerate(self.codigos_normalizados))
+
+        ids_vocabulario = {}
+        ocorrencias = []
+        de_texto = bytearray()
+        for posicao, (texto, codigo) in enumerate(zip(self.textos, self.codigos_normalizados)):
+            vistos = set()
+            for eh_texto, tokens in ((0, tokenizar(codigo)), (1, tokenizar(texto))):
+                for token in tokens:
+                    id_token = ids_vocabulario.get(token)
+                    if id_token is None:
+                        id_token = ids_vocabulario[token] = len(ocorrencias)
+                        ocorrencias.append(array('i'))
+                        de_texto.append(0)
+                    de_texto[id_token] |= eh_texto
+                    if id_token not in vistos:
+                        vistos.add(id_token)
+                        ocorrencias[id_token].append(posicao)
+        self.ocorrencias = ocorrencias
+        self.vocabulario = [None] * len(ids_vocabulario)
+        for token, id_token in ids_vocabulario.items():
+            self.vocabulario[id_token] = token
+        self._palavras_texto = [id_token for id_token in range(len(de_texto)) if de_texto[id_token]]
+        self._curtos = {}
+
+        self.trigramas = {}
+        for id_token, token in enumerate(self.vocabulario):
+            for trigrama in _trigramas(token):
+                self.trigramas.setdefault(trigrama, []).append(id_token)
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _tokens_com(self, trecho):
+        """Ids das palavras do vocabulário que contêm `trecho`."""
+        if len(trecho) < 3:
+            # Poucos trechos curtos possíveis: a varredura das palavras de texto fica guardada
+            encontrados = self._curtos.get(trecho)
+            if encontrados is None:
+                vocabulario = self.vocabulario
+                encontrados = self._curtos[trecho] = [
+                    id_token for id_token in self._palavras_texto if trecho in vocabulario[id_token]]
+            return encontrados
+        listas = sorted((self.trigramas.get(trigrama, ()) for trigrama in _trigramas(trecho)), key=len)
+        if not listas[0]:
+            return []
+        candidatos = set(listas[0])
+        for lista in listas[1:]:
+            candidatos.intersection_update(lista)
+            if not candidatos:
+                return []
+        return [id_token for id_token in candidatos if trecho in self.vocabulario[id_token]]
+
+    def _conferir(self, posicoes, token):
+        """Mantém as posições que atendem a `token`, conferindo o texto de cada uma."""
+        textos = self.textos
+        if len(token) < 3:
+            return {posicao for posicao in posicoes if token in textos[posicao]}
+        codigos = self.codigos_normalizados
+        return {posicao for posicao in posicoes if token in textos[posicao] or token in codigos[posicao]}
+
+    def encontrar(self, termo):
+        """Posições que atendem a todas as palavras do termo, sem ordem definida."""
+        tokens = set(tokenizar(normalizar(termo)))
+        if not tokens:
+            return None
+
+        por_token = []
+        for token in tokens:
+            ids_tokens = self._tokens_com(token)
+            if not ids_tokens:
+                return set()
+            por_token.append((sum(len(self.ocorrencias[i]) for i in ids_tokens), token, ids_tokens))
+        por_token.sort(key=lambda item: item[0])
+
+        resultado = set()
+        for id_token in por_token[0][2]:
+            resultado.update(self.ocorrencias[id_token])
+        for tamanho, token, ids_tokens in por_token[1:]:
+            if tamanho > CUSTO_CONFERIR * len(resultado):
+                # Palavra comum e poucos registros restantes: conferir o texto sai mais barato
+                resultado = self._conferir(resultado, token)
+            else:
+                outros = set()
+                for id_token in ids_tokens:
+                    outros.update(self.ocorrencias[id_token])
+                resultado &= outros
+            if not resultado:
+                break
+        return resultado
+
+    def buscar(self, termo):
+        """Posições dos registros que atendem ao termo, classificadas; sem termo, todas."""
+        encontrados = self.encontrar(termo)
+        if encontrados is None:
+            return range(len(self.codigos))
+
+        termo_normalizado = normalizar(termo).strip()
+        if len(encontrados) <= LIMITE_CLASSIFICACAO:
+            tokens = tokenizar(termo_normalizado)
+            return sorted(encontrados, key=lambda posicao: (
+                prioridade(self.codigos_normalizados[posicao], self.textos[posicao], termo_normalizado, tokens), posicao))
+
+        destaques = []
+        inicio = bisect_left(self.codigos_ordenados, (termo_normalizado,))
+        for codigo, posicao in self.codigos_ordenados[inicio:inicio + LIMITE_CLASSIFICACAO]:
+            if not codigo.startswith(termo_normalizado):
+                break
+            if posicao in encontrados:
+                destaques.append((codigo != termo_normalizado, posicao))
+        destaques.sort()
+        primeiros = [posicao for _, posicao in destaques]
+        vistos = set(primeiros)
+        return primeiros + [posicao for posicao in sorted(encontrados) if posicao not in vistos]
+
+
+def somente_digitos(texto):
+    return _RE_NAO_DIGITOS.sub('', texto or '')
+
+
+def eh_documento(termo):
+    """Se o termo parece um CPF/CNPJ ou telefone: '123.456.789-09', '(11) 98765-4321'."""
+    termo = (termo or '').strip()
+    return (bool(_RE_DOCUMENTO.fullmatch(termo))
+            and len(somente_digitos(termo)) >= MINIMO_DIGITOS_DOCUMENTO)
+
+
+class IndiceDocumentos:
+    """Dígitos do CPF/CNPJ, do telefone e do DDD + telefone -> códigos dos clientes.
+
+    registros: (código, CPF/CNPJ, DDD, telefone) como estão no cadastro, formatados.
+    """
+
+    def __init__(self, registros):
+        self.codigos = {}
+        for codigo, documento, ddd, telefone in registros:
+            codigo = (codigo or '').strip()
+            telefone = somente_digitos(telefone)
+            chaves = {somente_digitos(documento), telefone}
+            if telefone:
+                # DDD gravado como '11' ou '011'
+                chaves.add(somente_digitos(ddd).lstrip('0') + telefone)
+            for chave in chaves:
+                if chave:
+                    self.codigos.setdefault(chave, []).append(codigo)
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def buscar(self, termo):
+        """Códigos dos clientes cujo documento ou telefone tem exatamente os dígitos do termo."""
+        digitos = somente_digitos(termo)
+        codigos = self.codigos.get(digitos)
+        if codigos is None and digitos.startswith('0'):
+            # Telefone digitado com o zero do DDD: '011 98765-4321'
+            codigos = self.codigos.get(digitos.lstrip('0'))
+        return list(codigos or ())
@@ -0,0 +1,83 @@
+"""Conversão das linhas do banco em dicts, compilada uma vez por consulta.
+
+Cada consulta declara seus campos (texto, decimal, ...). O Mapeador gera, a
+partir de cursor.description, uma função que monta o dict de uma linha com os
+índices das colunas já resolvidos: sem busca de atributo por nome e sem as
+expressões `row.X.strip() if row.X else ''` repetidas a cada linha. iterar()
+lê o cursor com fetchmany, em memória constante, para quem percorre resultados
+grandes (catálogo, exportações).
+"""
+from decimal import Decimal
+
+TAMANHO_LOTE = 500
+
+
+def _texto(indice, padrao):
+    return f"(r[{indice}].strip() if r[{indice}] else {padrao!r})"
+
+
+def texto(chave, coluna, padrao=''):
+    """Texto sem espaços nas pontas; `padrao` se nulo ou vazio."""
+    return chave, (coluna,), lambda i: _texto(i[0], padrao)
+
+
+def decimal(chave, coluna, padrao='0.0'):
+    """Decimal da coluna; Decimal(padrao) se nula ou zero."""
+    return chave, (coluna,), lambda i: f"Decimal(r[{i[0]}] or {padrao!r})"
+
+
+def valor(chave, coluna):
+    """Valor da coluna como veio do driver."""
+    return chave, (coluna,), lambda i: f"r[{i[0]}]"
+
+
+def igual(chave, coluna, esperado):
+    """Se o texto da coluna é `esperado` (False se nula)."""
+    return chave, (coluna,), lambda i: f"(r[{i[0]}].strip() == {esperado!r} if r[{i[0]}] else False)"
+
+
+def formatado(chave, modelo, *colunas):
+    """modelo.format() com os textos das colunas: formatado('endereco', '{}, {}', 'ENDER', 'NUMER')."""
+    return chave, colunas, lambda i: f"{modelo!r}.format({', '.join(_texto(indice, '') for indice in i)})"
+
+
+class Mapeador:
+    """Campos de uma consulta; compilar(cursor.description) devolve a função linha -> dict.
+
+    As funções ficam guardadas pelo conjunto de colunas do resultado, então a
+    geração do código acontece uma vez por formato de consulta.
+    """
+
+    def __init__(self, *campos):
+        self.campos = campos
+        self._compilados = {}
+
+    def compilar(self, descricao):
+        colunas = tuple(coluna[0].upper() for coluna in descricao)
+        converter = self._compilados.get(colunas)
+        if converter is None:
+            indices = {}
+            for indice, nome in enumerate(colunas):
+                indices.setdefault(nome, indice)
+            expressoes = []
+            for chave, colunas_campo, gerar in self.campos:
+                try:
+                    posicoes = [indices[coluna.upper()] for coluna in colunas_campo]
+                except KeyError as e:
+                    raise ValueError(f"Coluna {e.args[0]} não está no resultado da consulta") from None
+                expressoes.append(f"{chave!r}: {gerar(posicoes)}")
+            converter = eval(f"lambda r: {{{', '.join(expressoes)}}}", {'Decimal': Decimal})
+            self._compilados[colunas] = converter
+        return converter
+
+    def iterar(self, cursor, tamanho_lote=TAMANHO_LOTE):
+        """Dicts das linhas do cursor já executado, lidas em lotes de `tamanho_lote`."""
+        converter = self.compilar(cursor.description)
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                return
+            yield from map(converter, linhas)
+
+    def listar(self, cursor, tamanho_lote=TAMANHO_LOTE):
+        return list(self.iterar(cursor, tamanho_lote))
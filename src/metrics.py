@@ -0,0 +1,511 @@
+import atexit
+import configparser
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Limites (ms) dos baldes do histograma; o último balde acumula o que passar de 5s
+LIMITES_HISTOGRAMA_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TAMANHO_JANELA = 1000
+
+def _get_base_path():
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_config_path():
+    # Permite apontar outro config.ini (banco local, benchmarks, testes de carga)
+    if os.environ.get('ORCAMENTOS_CONFIG'):
+        return os.environ['ORCAMENTOS_CONFIG']
+    if getattr(sys, 'frozen', False):
+        return os.path.join(_get_base_path(), 'config.ini')
+    return os.path.join(_get_base_path(), 'config', 'config.ini')
+
+def get_logs_dir():
+    logs_dir = os.path.join(_get_base_path(), 'logs')
+    os.makedirs(logs_dir, exist_ok=True)
+    return logs_dir
+
+def get_diagnostico_config():
+    config = configparser.ConfigParser()
+    config_path = get_config_path()
+    padrao = {'limite_consulta_lenta_ms': 500.0, 'salvar_estatisticas': True}
+
+    if not os.path.exists(config_path):
+        return padrao
+
+    try:
+        config.read(config_path, encoding='utf-8')
+        return {
+            'limite_consulta_lenta_ms': config.getfloat('Diagnostico', 'limite_consulta_lenta_ms', fallback=500.0),
+            'salvar_estatisticas': config.getboolean('Diagnostico', 'salvar_estatisticas', fallback=True)
+        }
+    except (ValueError, configparser.Error):
+        return padrao
+
+
+class HistogramaRolante:
+    """Mantém as últimas amostras (ms) para percentis e contagem por balde."""
+
+    def __init__(self, tamanho=TAMANHO_JANELA):
+        self.amostras = deque(maxlen=tamanho)
+        self.baldes = [0] * (len(LIMITES_HISTOGRAMA_MS) + 1)
+
+    @staticmethod
+    def _indice_balde(valor_ms):
+        for i, limite in enumerate(LIMITES_HISTOGRAMA_MS):
+            if valor_ms <= limite:
+                return i
+        return len(LIMITES_HISTOGRAMA_MS)
+
+    def adicionar(self, valor_ms):
+        if len(self.amostras) == self.amostras.maxlen:
+            self.baldes[self._indice_balde(self.amostras[0])] -= 1
+        self.amostras.append(valor_ms)
+        self.baldes[self._indice_balde(valor_ms)] += 1
+
+    def percentis(self, *ps):
+        if not self.amostras:
+            return [0.0 for _ in ps]
+        ordenadas = sorted(self.amostras)
+        ultimo = len(ordenadas) - 1
+        return [ordenadas[min(ultimo, int(round(p / 100 * ultimo)))] for p in ps]
+
+    def histograma(self):
+        rotulos = [f"<={limite}ms" for limite in LIMITES_HISTOGRAMA_MS] + [f">{LIMITES_HISTOGRAMA_MS[-1]}ms"]
+        return dict(zip(rotulos, self.baldes))
+
+
+class EstatisticaConsulta:
+    def __init__(self, nome):
+        self.nome = nome
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.linhas = 0
+        self.bytes = 0
+        self.conexao_ms = 0.0
+        self.histograma = HistogramaRolante()
+
+    def resumo(self):
+        p50, p95, p99 = self.histograma.percentis(50, 95, 99)
+        return {
+            'chamadas': self.chamadas,
+            'total_ms': round(self.total_ms, 2),
+            'media_ms': round(self.total_ms / self.chamadas, 2) if self.chamadas else 0.0,
+            'p50_ms': round(p50, 2),
+            'p95_ms': round(p95, 2),
+            'p99_ms': round(p99, 2),
+            'max_ms': round(self.max_ms, 2),
+            'linhas': self.linhas,
+            'bytes_estimados': self.bytes,
+            'conexao_ms': round(self.conexao_ms, 2),
+            'histograma': self.histograma.histograma()
+        }
+
+
+class _ChamadaConsulta:
+    __slots__ = ('nome', 'linhas', 'bytes', 'conexao_ms', 'execucoes', 'ultimo_sql')
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.linhas = 0
+        self.bytes = 0
+        self.conexao_ms = 0.0
+        self.execucoes = 0
+        self.ultimo_sql = ''
+
+
+class EstatisticaAcao:
+    def __init__(self, nome):
+        self.nome = nome
+        self.execucoes = 0
+        self.max_ms = 0.0
+        self.histograma = HistogramaRolante()
+
+    def resumo(self):
+        p50, p95, p99 = self.histograma.percentis(50, 95, 99)
+        return {
+            'execucoes': self.execucoes,
+            'p50_ms': round(p50, 1),
+            'p95_ms': round(p95, 1),
+            'p99_ms': round(p99, 1),
+            'max_ms': round(self.max_ms, 1)
+        }
+
+
+_lock = threading.Lock()
+_local = threading.local()
+_estatisticas = {}
+_acoes = {}
+_acoes_pendentes = []
+_viagens = deque()
+_consultas_lentas = deque(maxlen=50)
+_conexoes = {'abertas': 0, 'pico': 0, 'total': 0}
+_caches = {}
+_filas = {}
+_repeticoes = {'repeticoes': 0, 'reconexoes': 0, 'recuperadas': 0, 'esgotadas': 0, 'por_estado': {}}
+_replica = None
+_sincronizacoes = {}
+_config = None
+
+
+def _get_config():
+    global _config
+    if _config is None:
+        _config = get_diagnostico_config()
+    return _config
+
+def _chamada_atual():
+    return getattr(_local, 'chamada', None)
+
+def _tamanho_valor(valor):
+    if valor is None:
+        return 0
+    if isinstance(valor, (str, bytes, bytearray)):
+        return len(valor)
+    return 8
+
+def tamanho_linhas(linhas):
+    """Bytes aproximados das linhas trazidas do banco (textos pelo tamanho, números com 8)."""
+    return sum(_tamanho_valor(valor) for linha in linhas for valor in linha)
+
+def _registrar_linhas(linhas):
+    chamada = _chamada_atual()
+    if chamada is None:
+        return
+    chamada.linhas += len(linhas)
+    chamada.bytes += tamanho_linhas(linhas)
+
+def registrar_conexao(duracao_s):
+    """Soma o tempo de obtenção da conexão à consulta em andamento."""
+    chamada = _chamada_atual()
+    if chamada is not None:
+        chamada.conexao_ms += duracao_s * 1000
+
+def _registrar_viagem():
+    agora = time.monotonic()
+    with _lock:
+        _viagens.append(agora)
+        while _viagens and _viagens[0] < agora - 60:
+            _viagens.popleft()
+
+def viagens_por_minuto():
+    """Quantidade de comandos enviados ao banco nos últimos 60 segundos."""
+    agora = time.monotonic()
+    with _lock:
+        while _viagens and _viagens[0] < agora - 60:
+            _viagens.popleft()
+        return len(_viagens)
+
+def _registrar_consulta_lenta(chamada, duracao_ms):
+    with _lock:
+        _consultas_lentas.append({
+            'data': datetime.now().strftime('%H:%M:%S'),
+            'consulta': chamada.nome,
+            'ms': round(duracao_ms, 1),
+            'linhas': chamada.linhas,
+            'sql': ' '.join(chamada.ultimo_sql.split())[:200]
+        })
+    try:
+        caminho = os.path.join(get_logs_dir(), 'consultas_lentas.log')
+        sql = ' '.join(chamada.ultimo_sql.split())[:500]
+        with open(caminho, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(
+                f"{datetime.now():%Y-%m-%d %H:%M:%S} {chamada.nome} {duracao_ms:.1f}ms "
+                f"linhas={chamada.linhas} bytes={chamada.bytes} conexao={chamada.conexao_ms:.1f}ms "
+                f"sql={sql}\n"
+            )
+    except OSError as e:
+        print(f"Erro ao gravar log de consultas lentas: {e}")
+
+def _registrar_chamada(chamada, duracao_ms):
+    with _lock:
+        estatistica = _estatisticas.get(chamada.nome)
+        if estatistica is None:
+            estatistica = _estatisticas[chamada.nome] = EstatisticaConsulta(chamada.nome)
+        estatistica.chamadas += 1
+        estatistica.total_ms += duracao_ms
+        estatistica.max_ms = max(estatistica.max_ms, duracao_ms)
+        estatistica.linhas += chamada.linhas
+        estatistica.bytes += chamada.bytes
+        estatistica.conexao_ms += chamada.conexao_ms
+        estatistica.histograma.adicionar(duracao_ms)
+
+    if duracao_ms >= _get_config()['limite_consulta_lenta_ms']:
+        _registrar_consulta_lenta(chamada, duracao_ms)
+
+def instrumentar_consulta(funcao):
+    """Mede tempo total, linhas, bytes e tempo de conexão de uma função de banco."""
+    nome = funcao.__name__
+
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        pai = _chamada_atual()
+        chamada = _ChamadaConsulta(nome)
+        _local.chamada = chamada
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            _local.chamada = pai
+            if pai is not None:
+                pai.linhas += chamada.linhas
+                pai.bytes += chamada.bytes
+                pai.conexao_ms += chamada.conexao_ms
+                pai.execucoes += chamada.execucoes
+                pai.ultimo_sql = chamada.ultimo_sql or pai.ultimo_sql
+            _registrar_chamada(chamada, duracao_ms)
+
+    return wrapper
+
+
+class CursorInstrumentado:
+    """Repassa tudo ao cursor pyodbc, contando linhas e bytes retornados."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *params):
+        chamada = _chamada_atual()
+        if chamada is not None:
+            chamada.execucoes += 1
+            chamada.ultimo_sql = sql
+        _registrar_viagem()
+        self._cursor.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, seq_params):
+        chamada = _chamada_atual()
+        if chamada is not None:
+            chamada.execucoes += 1
+            chamada.ultimo_sql = sql
+        _registrar_viagem()
+        self._cursor.executemany(sql, seq_params)
+        return self
+
+    @property
+    def fast_executemany(self):
+        return self._cursor.fast_executemany
+
+    @fast_executemany.setter
+    def fast_executemany(self, valor):
+        self._cursor.fast_executemany = valor
+
+    def fetchone(self):
+        linha = self._cursor.fetchone()
+        if linha is not None:
+            _registrar_linhas((linha,))
+        return linha
+
+    def fetchall(self):
+        linhas = self._cursor.fetchall()
+        _registrar_linhas(linhas)
+        return linhas
+
+    def fetchmany(self, *args):
+        linhas = self._cursor.fetchmany(*args)
+        _registrar_linhas(linhas)
+        return linhas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoInstrumentada:
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._aberta = True
+        with _lock:
+            _conexoes['abertas'] += 1
+            _conexoes['total'] += 1
+            _conexoes['pico'] = max(_conexoes['pico'], _conexoes['abertas'])
+
+    def cursor(self):
+        return CursorInstrumentado(self._conexao.cursor())
+
+    def close(self):
+        if self._aberta:
+            self._aberta = False
+            with _lock:
+                _conexoes['abertas'] -= 1
+        self._conexao.close()
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+
+def registrar_acao(nome, duracao_ms):
+    """Registra a duração de uma ação do usuário (do evento até a tela atualizada)."""
+    with _lock:
+        estatistica = _acoes.get(nome)
+        if estatistica is None:
+            estatistica = _acoes[nome] = EstatisticaAcao(nome)
+        estatistica.execucoes += 1
+        estatistica.max_ms = max(estatistica.max_ms, duracao_ms)
+        estatistica.histograma.adicionar(duracao_ms)
+        _acoes_pendentes.append({
+            'data': datetime.now().isoformat(timespec='milliseconds'),
+            'acao': nome,
+            'ms': round(duracao_ms, 1)
+        })
+        gravar = len(_acoes_pendentes) >= 20
+    if gravar:
+        gravar_metricas_acoes()
+
+def iniciar_acao():
+    return time.perf_counter()
+
+def medir_acao(nome, inicio):
+    """Encerra a medição agora (antes de um diálogo modal, que seguraria o after_idle)."""
+    registrar_acao(nome, (time.perf_counter() - inicio) * 1000)
+
+def concluir_acao(widget, nome, inicio):
+    """Encerra a medição quando o Tk ficar ocioso, ou seja, depois de redesenhar a tela."""
+    def _concluir():
+        medir_acao(nome, inicio)
+    try:
+        widget.after_idle(_concluir)
+    except Exception:
+        _concluir()
+
+def gravar_metricas_acoes():
+    """Acrescenta as medições pendentes em logs/metricas_ui.jsonl."""
+    with _lock:
+        pendentes = _acoes_pendentes[:]
+        _acoes_pendentes.clear()
+    if not pendentes:
+        return
+    try:
+        with open(os.path.join(get_logs_dir(), 'metricas_ui.jsonl'), 'a', encoding='utf-8') as arquivo:
+            for registro in pendentes:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"Erro ao gravar métricas da interface: {e}")
+
+def resumo_acoes():
+    with _lock:
+        return {nome: estatistica.resumo() for nome, estatistica in sorted(_acoes.items())}
+
+def registrar_cache(nome, obter_estatisticas):
+    """Publica um cache na janela de diagnóstico.
+
+    obter_estatisticas deve retornar um dict com 'itens', 'acertos' e 'falhas'.
+    """
+    with _lock:
+        _caches[nome] = obter_estatisticas
+
+def registrar_fila(nome, obter_tamanho):
+    """Publica o tamanho de uma fila de trabalho na janela de diagnóstico."""
+    with _lock:
+        _filas[nome] = obter_tamanho
+
+def registrar_repeticao(estado, reconexao=False):
+    """Conta um comando repetido por falha passageira (estado = SQLSTATE do erro)."""
+    with _lock:
+        _repeticoes['repeticoes'] += 1
+        if reconexao:
+            _repeticoes['reconexoes'] += 1
+        _repeticoes['por_estado'][estado] = _repeticoes['por_estado'].get(estado, 0) + 1
+
+def registrar_fim_repeticao(recuperada):
+    """Conta o desfecho de um comando que precisou ser repetido."""
+    with _lock:
+        _repeticoes['recuperadas' if recuperada else 'esgotadas'] += 1
+
+def resumo_repeticoes():
+    with _lock:
+        return dict(_repeticoes, por_estado=dict(_repeticoes['por_estado']))
+
+def registrar_replica(obter_estatisticas):
+    """Publica o estado da réplica de leitura (dict com 'estado', 'leituras_replica', 'leituras_principal')."""
+    global _replica
+    with _lock:
+        _replica = obter_estatisticas
+
+def resumo_replica():
+    """Estado da réplica de leitura, ou None se não há réplica configurada."""
+    with _lock:
+        obter_estatisticas = _replica
+    return obter_estatisticas() if obter_estatisticas else None
+
+def registrar_sincronizacao(nome, obter_estatisticas):
+    """Publica uma sincronização incremental (dict com 'sincronizacoes', 'linhas', 'bytes' e 'ultima')."""
+    with _lock:
+        _sincronizacoes[nome] = obter_estatisticas
+
+def resumo_sincronizacoes():
+    with _lock:
+        sincronizacoes = list(_sincronizacoes.items())
+    return {nome: obter_estatisticas() for nome, obter_estatisticas in sincronizacoes}
+
+def resumo_caches():
+    with _lock:
+        caches = list(_caches.items())
+    resumo = {}
+    for nome, obter_estatisticas in caches:
+        try:
+            estatisticas = dict(obter_estatisticas())
+        except Exception as e:
+            print(f"Erro ao obter estatísticas do cache {nome}: {e}")
+            continue
+        consultas = estatisticas.get('acertos', 0) + estatisticas.get('falhas', 0)
+        estatisticas['taxa_acerto'] = estatisticas.get('acertos', 0) / consultas * 100 if consultas else 0.0
+        resumo[nome] = estatisticas
+    return resumo
+
+def resumo_filas():
+    with _lock:
+        filas = list(_filas.items())
+    resumo = {}
+    for nome, obter_tamanho in filas:
+        try:
+            resumo[nome] = obter_tamanho()
+        except Exception as e:
+            print(f"Erro ao obter tamanho da fila {nome}: {e}")
+    return resumo
+
+def resumo_conexoes():
+    with _lock:
+        return dict(_conexoes)
+
+def consultas_lentas_recentes():
+    with _lock:
+        return list(reversed(_consultas_lentas))
+
+def resumo_consultas():
+    with _lock:
+        return {nome: estatistica.resumo() for nome, estatistica in sorted(_estatisticas.items())}
+
+def salvar_estatisticas(caminho=None):
+    """Grava em JSON as estatísticas agregadas das consultas desta sessão."""
+    resumo = resumo_consultas()
+    if not resumo:
+        return None
+    try:
+        if caminho is None:
+            caminho = os.path.join(get_logs_dir(), f"estatisticas_consultas_{datetime.now():%Y%m%d_%H%M%S}.json")
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'gerado_em': datetime.now().isoformat(timespec='seconds'), 'consultas': resumo,
+                       'repeticoes': resumo_repeticoes()},
+                      arquivo, ensure_ascii=False, indent=2)
+        return caminho
+    except OSError as e:
+        print(f"Erro ao salvar estatísticas das consultas: {e}")
+        return None
+
+def _salvar_ao_sair():
+    gravar_metricas_acoes()
+    if _get_config()['salvar_estatisticas']:
+        salvar_estatisticas()
+
+atexit.register(_salvar_ao_sair)
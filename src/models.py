@@ -1,6 +1,7 @@
+from array import array
 from dataclasses import dataclass, field
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from typing import List
 
 @dataclass
@@ -25,3 +26,307 @@ class Orcamento:
     valor_total: Decimal
     hora_emissao: str = field(default_factory=lambda: datetime.now().strftime('%H:%M:%S'))
     itens: List[ItemOrcamento] = field(default_factory=list)
+
+
+ESCALA_QUANTIDADE = 1000
+ESCALA_CUSTO = 10000
+
+
+def _dividir_arredondando(numerador, denominador):
+    """Divisão inteira arredondando meio para cima (valores não negativos)."""
+    return (2 * numerador + denominador) // (2 * denominador)
+
+
+def _escalar(valor, escala):
+    return int((Decimal(str(valor)) * escala).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+@dataclass(frozen=True, slots=True)
+class LinhaItem:
+    """Linha do orçamento em inteiros: quantidade em milésimos, preço e desconto em
+    centavos, custo em décimos de milésimo e desconto máximo em centésimos de %."""
+    codigo_produto: str
+    descricao: str
+    unidade: str
+    quantidade_milesimos: int
+    preco_centavos: int
+    custo_decimilesimos: int = 0
+    desconto_maximo_centesimos: int = 0
+    desconto_centavos: int = 0
+
+    @property
+    def subtotal_centavos(self):
+        return _dividir_arredondando(self.quantidade_milesimos * self.preco_centavos, ESCALA_QUANTIDADE)
+
+    @classmethod
+    def de_valores(cls, codigo, descricao, unidade, quantidade, preco, custo=0, desconto_maximo=0, desconto=0):
+        """Cria a linha a partir de valores Decimal (quantidade, preço, custo, % máximo e desconto)."""
+        return cls(
+            codigo_produto=codigo, descricao=descricao, unidade=unidade,
+            quantidade_milesimos=_escalar(quantidade, ESCALA_QUANTIDADE),
+            preco_centavos=_escalar(preco, 100),
+            custo_decimilesimos=_escalar(custo, ESCALA_CUSTO),
+            desconto_maximo_centesimos=_escalar(desconto_maximo, 100),
+            desconto_centavos=_escalar(desconto, 100)
+        )
+
+    @classmethod
+    def de_produto(cls, produto, quantidade):
+        """Cria a linha a partir do dict de buscar_produtos e da quantidade (Decimal)."""
+        return cls.de_valores(produto['codigo'], produto['descricao'], produto['unidade'], quantidade,
+                              produto['preco'], produto.get('custo', 0), produto.get('desconto_maximo', 0))
+
+    def para_item_orcamento(self, numero_nota, sequencia, deposito):
+        return ItemOrcamento(
+            numero_nota=numero_nota, codigo_produto=self.codigo_produto, deposito=deposito,
+            quantidade=Decimal(self.quantidade_milesimos) / ESCALA_QUANTIDADE,
+            valor_unitario=Decimal(self.preco_centavos) / 100, sequencia=sequencia,
+            valor_desconto=Decimal(self.desconto_centavos) / 100,
+            total_bruto_item=Decimal(self.subtotal_centavos) / 100,
+            custo=Decimal(self.custo_decimilesimos) / ESCALA_CUSTO
+        )
+
+
+# chave do dict de itens da interface -> (coluna do ItemBatch, escala)
+_CAMPOS_VISAO = {
+    'codigo': ('codigos', None), 'descricao': ('descricoes', None), 'unidade': ('unidades', None),
+    'quantidade': ('quantidades', ESCALA_QUANTIDADE), 'valor_unitario': ('precos', 100),
+    'subtotal': ('subtotais', 100), 'desconto': ('descontos', 100), 'custo': ('custos', ESCALA_CUSTO),
+    'desconto_maximo': ('descontos_maximos', 100),
+}
+
+
+class _LinhaVisao:
+    """Leitura de uma linha do ItemBatch com as chaves do dict de itens da interface."""
+    __slots__ = ('_lote', '_indice')
+
+    def __init__(self, lote, indice):
+        self._lote = lote
+        self._indice = indice
+
+    def __getitem__(self, chave):
+        coluna, escala = _CAMPOS_VISAO[chave]
+        valor = getattr(self._lote, coluna)[self._indice]
+        return valor if escala is None else Decimal(valor) / escala
+
+    def get(self, chave, padrao=None):
+        return self[chave] if chave in _CAMPOS_VISAO else padrao
+
+
+class _VisaoLinhas:
+    """Sequência das linhas vivas como _LinhaVisao, criadas sob demanda, sem copiar as colunas."""
+    __slots__ = ('_lote',)
+
+    def __init__(self, lote):
+        self._lote = lote
+
+    def __len__(self):
+        return len(self._lote)
+
+    def __getitem__(self, posicao):
+        return _LinhaVisao(self._lote, self._lote.chave_na_posicao(range(len(self._lote))[posicao]))
+
+    def __iter__(self):
+        return (_LinhaVisao(self._lote, chave) for chave in self._lote.chaves())
+
+
+class _ContagemFenwick:
+    """Árvore de Fenwick de 0/1 por linha: conta as linhas vivas antes de uma
+    posição e encontra a k-ésima linha viva em O(log n)."""
+    __slots__ = ('_arvore',)
+
+    def __init__(self):
+        self._arvore = array('q', [0])
+
+    def acrescentar(self):
+        """Nova linha viva no fim."""
+        i = len(self._arvore)
+        valor = 1
+        j = i - 1
+        limite = i - (i & -i)
+        while j > limite:
+            valor += self._arvore[j]
+            j -= j & -j
+        self._arvore.append(valor)
+
+    def somar(self, indice, delta):
+        i = indice + 1
+        tamanho = len(self._arvore)
+        while i < tamanho:
+            self._arvore[i] += delta
+            i += i & -i
+
+    def prefixo(self, indice):
+        """Linhas vivas em [0, indice)."""
+        total = 0
+        i = indice
+        while i > 0:
+            total += self._arvore[i]
+            i -= i & -i
+        return total
+
+    def localizar(self, k):
+        """Índice da k-ésima linha viva (k a partir de 0)."""
+        posicao = 0
+        restante = k + 1
+        tamanho = len(self._arvore) - 1
+        passo = 1 << tamanho.bit_length()
+        while passo:
+            proxima = posicao + passo
+            if proxima <= tamanho and self._arvore[proxima] < restante:
+                posicao = proxima
+                restante -= self._arvore[proxima]
+            passo >>= 1
+        return posicao
+
+
+class ItemBatch:
+    """Itens do orçamento em colunas (array de inteiros), com total mantido a cada alteração.
+
+    Serve para orçamentos grandes e importações: totais, rateio de desconto e
+    gravação em lote percorrem as colunas sem criar um objeto por linha.
+    Cada linha tem uma chave fixa (índice nas colunas); a exclusão só marca a
+    linha como removida, e a árvore de Fenwick traduz posição visível <-> chave.
+    """
+
+    def __init__(self, linhas=()):
+        self.limpar()
+        self.extend(linhas)
+
+    def limpar(self):
+        self.codigos = []
+        self.descricoes = []
+        self.unidades = []
+        self.quantidades = array('q')
+        self.precos = array('q')
+        self.custos = array('q')
+        self.descontos_maximos = array('q')
+        self.subtotais = array('q')
+        self.descontos = array('q')
+        self.vivas = bytearray()
+        self._fenwick = _ContagemFenwick()
+        self._quantidade_vivas = 0
+        self.total_centavos = 0
+
+    def __len__(self):
+        return self._quantidade_vivas
+
+    def __contains__(self, chave):
+        """Se `chave` é de uma linha viva."""
+        return 0 <= chave < len(self.vivas) and bool(self.vivas[chave])
+
+    def __getitem__(self, chave):
+        return LinhaItem(
+            self.codigos[chave], self.descricoes[chave], self.unidades[chave], self.quantidades[chave],
+            self.precos[chave], self.custos[chave], self.descontos_maximos[chave], self.descontos[chave]
+        )
+
+    def __iter__(self):
+        return (self[chave] for chave in self.chaves())
+
+    def chaves(self):
+        """Chaves das linhas vivas, na ordem do orçamento."""
+        vivas = self.vivas
+        return (chave for chave in range(len(vivas)) if vivas[chave])
+
+    def chave_na_posicao(self, posicao):
+        return self._fenwick.localizar(posicao)
+
+    def posicao_da_chave(self, chave):
+        return self._fenwick.prefixo(chave)
+
+    def linha_visao(self, chave):
+        """Acesso por nome de campo (como o dict de itens da interface) à linha `chave`."""
+        return _LinhaVisao(self, chave)
+
+    def append(self, linha):
+        """Acrescenta a linha e devolve a sua chave."""
+        chave = len(self.codigos)
+        self.codigos.append(linha.codigo_produto)
+        self.descricoes.append(linha.descricao)
+        self.unidades.append(linha.unidade)
+        self.quantidades.append(linha.quantidade_milesimos)
+        self.precos.append(linha.preco_centavos)
+        self.custos.append(linha.custo_decimilesimos)
+        self.descontos_maximos.append(linha.desconto_maximo_centesimos)
+        subtotal = linha.subtotal_centavos
+        self.subtotais.append(subtotal)
+        self.descontos.append(linha.desconto_centavos)
+        self.vivas.append(1)
+        self._fenwick.acrescentar()
+        self._quantidade_vivas += 1
+        self.total_centavos += subtotal
+        return chave
+
+    def extend(self, linhas):
+        for linha in linhas:
+            self.append(linha)
+
+    def _recalcular_subtotal(self, chave):
+        novo = _dividir_arredondando(self.quantidades[chave] * self.precos[chave], ESCALA_QUANTIDADE)
+        self.total_centavos += novo - self.subtotais[chave]
+        self.subtotais[chave] = novo
+
+    def definir_quantidade(self, chave, quantidade):
+        self.quantidades[chave] = _escalar(quantidade, ESCALA_QUANTIDADE)
+        self._recalcular_subtotal(chave)
+
+    def definir_preco(self, chave, preco):
+        self.precos[chave] = _escalar(preco, 100)
+        self._recalcular_subtotal(chave)
+
+    def remover(self, chave):
+        """Marca a linha como removida: O(log n), sem deslocar as colunas."""
+        if not self.vivas[chave]:
+            return
+        self.vivas[chave] = 0
+        self._fenwick.somar(chave, -1)
+        self._quantidade_vivas -= 1
+        self.total_centavos -= self.subtotais[chave]
+        # Subtotal zerado tira a linha dos rateios e somas feitos sobre as colunas
+        self.subtotais[chave] = 0
+        self.descontos[chave] = 0
+
+    @property
+    def desconto_total_centavos(self):
+        return sum(self.descontos)
+
+    def limites_desconto(self):
+        """Desconto máximo de cada linha em centavos (0% = sem limite)."""
+        return [s if not m else min(s, s * m // 10000) for s, m in zip(self.subtotais, self.descontos_maximos)]
+
+    def ratear_desconto(self, desconto_centavos, respeitar_limites=True):
+        """Distribui o desconto nas linhas (coluna `descontos`); retorna o total aplicado.
+
+        Com respeitar_limites=False (desconto liberado por senha), usa o subtotal como limite.
+        """
+        try:
+            from .rateio_desconto import ratear_desconto
+        except ImportError:
+            from rateio_desconto import ratear_desconto
+        subtotais = self.subtotais.tolist()
+        limites = self.limites_desconto() if respeitar_limites else subtotais
+        descontos, aplicado = ratear_desconto(subtotais, limites, desconto_centavos)
+        self.descontos = array('q', descontos)
+        return aplicado
+
+    def colunas(self):
+        """memoryviews das colunas numéricas, sem cópia (inclui linhas removidas; ver `vivas`)."""
+        return {nome: memoryview(getattr(self, nome)) for nome in
+                ('quantidades', 'precos', 'custos', 'descontos_maximos', 'subtotais', 'descontos', 'vivas')}
+
+    def visao_pdf(self):
+        """Sequência de linhas no formato esperado por gerar_pdf_orcamento, lidas direto das colunas."""
+        return _VisaoLinhas(self)
+
+    def parametros_aproduno(self, numero_nota, terminal, deposito):
+        """Tuplas de parâmetros do INSERT em APRODUNO, geradas sob demanda para executemany."""
+        zero = Decimal('0.0')
+        for sequencia, i in enumerate(self.chaves(), 1):
+            subtotal = Decimal(self.subtotais[i]) / 100
+            yield (
+                numero_nota, terminal, self.codigos[i], deposito,
+                Decimal(self.quantidades[i]) / ESCALA_QUANTIDADE, Decimal(self.precos[i]) / 100,
+                Decimal(self.descontos[i]) / 100, subtotal, sequencia, Decimal(self.custos[i]) / ESCALA_CUSTO,
+                subtotal, zero, zero, zero, zero, zero, '', 'N', zero, zero, zero, '', zero, 'N'
+            )
@@ -12,8 +12,10 @@ from typing import Any, List
 
 try:
     from .database import get_dados_empresa
+    from .dinheiro import formatar_numero, formatar_moeda
 except ImportError:
     from database import get_dados_empresa
+    from dinheiro import formatar_numero, formatar_moeda
 
 UNIDADES_ABREVIADAS = {
     'UNIDADE': 'UN',
@@ -30,12 +32,12 @@ def _get_base_path():
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 def _format_currency(value):
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return formatar_moeda(value)
 
 def _abbreviate_unit(unit_name):
     return UNIDADES_ABREVIADAS.get(unit_name.upper(), unit_name[:3].upper())
 
-def gerar_pdf_orcamento(orcamento, itens, cliente_info, vendedor_info, condicao_pagamento=None, desconto_aplicado=0.0, valor_final=None):
+def gerar_pdf_orcamento(orcamento, itens, cliente_info, vendedor_info, condicao_pagamento=None, desconto_aplicado=0.0, valor_final=None, abrir=True):
     base_path = _get_base_path()
     output_dir = os.path.join(base_path, 'Impressao')
     os.makedirs(output_dir, exist_ok=True)
@@ -107,7 +109,7 @@ def gerar_pdf_orcamento(orcamento, itens, cliente_info, vendedor_info, condicao_
     table_data: List[List[Any]] = [table_header]
     
     for i, item in enumerate(itens, 1):
-        qty_str = f"{item['quantidade']:.2f}".replace('.', ',')
+        qty_str = formatar_numero(item['quantidade'])
         unit_str = _abbreviate_unit(item['unidade'])
         
         table_data.append([
@@ -206,7 +208,8 @@ def gerar_pdf_orcamento(orcamento, itens, cliente_info, vendedor_info, condicao_
 
     try:
         doc.build(story)
-        abrir_pdf(file_path)
+        if abrir:
+            abrir_pdf(file_path)
         return True
     except Exception as e:
         return False
@@ -0,0 +1,106 @@
+"""Condições de pagamento (ACONPGFA) e o que cada tipo de cliente pode usar, consultados em memória.
+
+As condições são lidas do banco (database.get_condicoes_pagamento_detalhadas) e
+relidas a cada VALIDADE segundos, ou antes se pedem um código que não está na lista
+(condição criada depois da leitura); a matriz TIPO_CLI x VISPRA_CPG sai das regras de
+database.validar_tipo_pagamento_permitido. Conferir a condição escolhida para o
+cliente, saber se ela dispensa o cliente e listar as condições que ele pode
+usar não vão mais ao banco.
+"""
+import threading
+import time
+
+try:
+    from .database import get_condicoes_pagamento_detalhadas, validar_tipo_pagamento_permitido
+except ImportError:
+    from database import get_condicoes_pagamento_detalhadas, validar_tipo_pagamento_permitido
+
+TIPOS_CLIENTE = ('1', '2', '3', '4', '5', '6', '7', '8')
+TIPOS_PAGAMENTO = range(1, 10)
+VALIDADE = 300
+# Código desconhecido relê a lista no máximo uma vez neste intervalo (segundos): um código
+# digitado errado não vai ao banco a cada tecla
+RELEITURA_MINIMA = 30
+
+# (TIPO_CLI, VISPRA_CPG) -> (permitido, mensagem)
+MATRIZ = {(tipo_cli, tipo_pagamento): validar_tipo_pagamento_permitido(tipo_cli, tipo_pagamento)
+          for tipo_cli in TIPOS_CLIENTE for tipo_pagamento in TIPOS_PAGAMENTO}
+
+
+def permissao(tipo_cli, tipo_pagamento):
+    """(permitido, mensagem) do tipo de cliente com o tipo de pagamento, pela matriz."""
+    if not tipo_pagamento:
+        return True, ""
+    resultado = MATRIZ.get((str(tipo_cli).strip(), int(tipo_pagamento)))
+    # Tipo fora da tabela: a regra decide (hoje, sem restrição)
+    return resultado if resultado is not None else validar_tipo_pagamento_permitido(tipo_cli, tipo_pagamento)
+
+
+class PoliticaPagamento:
+    """Condições de pagamento guardadas por `validade` segundos; listar() é
+    database.get_condicoes_pagamento_detalhadas.
+
+    Se a leitura falhar, fica a lista anterior (ou nenhuma) e a próxima consulta
+    tenta de novo; sem lista, condição desconhecida não bloqueia o tipo de
+    pagamento e não dispensa o cliente, como nas consultas ao banco.
+    """
+
+    def __init__(self, listar=get_condicoes_pagamento_detalhadas, validade=VALIDADE):
+        self.listar = listar
+        self.validade = validade
+        self._condicoes = None
+        self._por_codigo = {}
+        self._carregadas = 0.0
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        condicoes = self.listar()
+        if condicoes:
+            self._por_codigo = {condicao['codigo']: condicao for condicao in condicoes}
+            self._condicoes = condicoes
+            self._carregadas = time.monotonic()
+
+    def condicoes(self):
+        with self._lock:
+            if self._condicoes is None or time.monotonic() - self._carregadas > self.validade:
+                self._carregar()
+            return self._condicoes or []
+
+    def recarregar(self):
+        with self._lock:
+            self._condicoes = None
+
+    def _buscar(self, codigo):
+        return self._por_codigo.get(codigo) or self._por_codigo.get(codigo.zfill(2))
+
+    def condicao(self, codigo):
+        """Condição pelo código ('1' também acha '01'), ou None."""
+        self.condicoes()
+        codigo = (codigo or '').strip()
+        condicao = self._buscar(codigo)
+        if condicao is None and codigo:
+            with self._lock:
+                if time.monotonic() - self._carregadas > RELEITURA_MINIMA:
+                    self._carregar()
+            condicao = self._buscar(codigo)
+        return condicao
+
+    def validar(self, tipo_cli, codigo):
+        """(permitido, mensagem, condição) da condição `codigo` para o tipo de cliente."""
+        condicao = self.condicao(codigo)
+        if condicao is None:
+            return True, "", None
+        permitido, mensagem = permissao(tipo_cli, condicao['tipo_pagamento'])
+        return permitido, mensagem, condicao
+
+    def permite_sem_cliente(self, codigo):
+        condicao = self.condicao(codigo)
+        return condicao is not None and condicao['permite_sem_cliente']
+
+    def condicoes_para(self, tipo_cli=None):
+        """Condições da lista de busca; com tipo_cli, só as que o tipo de cliente pode usar."""
+        return [condicao for condicao in self.condicoes() if not condicao['oculta']
+                and (tipo_cli is None or permissao(tipo_cli, condicao['tipo_pagamento'])[0])]
+
+
+politica_pagamento = PoliticaPagamento()
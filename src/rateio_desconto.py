@@ -0,0 +1,70 @@
+"""Rateio do desconto do orçamento entre os itens, em centavos inteiros.
+
+Cada item recebe desconto proporcional ao seu subtotal, limitado pelo desconto
+máximo do produto; o que um item não comporta é redistribuído entre os demais
+(preenchimento por nível). Os valores são calculados em centavos e arredondados
+pelo maior resto, de modo que a soma dos descontos dos itens é exatamente o total.
+"""
+from decimal import Decimal
+
+
+def limite_centavos(subtotal_centavos, percentual_maximo):
+    """Desconto máximo do item em centavos (truncado); percentual 0 significa sem limite."""
+    if not percentual_maximo or percentual_maximo <= 0:
+        return subtotal_centavos
+    return min(subtotal_centavos, int(subtotal_centavos * Decimal(str(percentual_maximo)) / 100))
+
+
+def ratear_desconto(subtotais, limites, desconto):
+    """Distribui `desconto` (centavos) entre os itens.
+
+    subtotais e limites são listas de centavos na mesma ordem dos itens.
+    Retorna (descontos, total_aplicado); total_aplicado só fica abaixo de
+    `desconto` quando a soma dos limites não comporta o valor pedido.
+    """
+    quantidade = len(subtotais)
+    descontos = [0] * quantidade
+    if desconto <= 0 or not quantidade:
+        return descontos, 0
+
+    ativos = [i for i in range(quantidade) if subtotais[i] > 0 and limites[i] > 0]
+    if sum(limites[i] for i in ativos) <= desconto:
+        for i in ativos:
+            descontos[i] = limites[i]
+        return descontos, sum(descontos)
+
+    # Itens com menor limite relativo ao subtotal saturam primeiro. A razão vai
+    # escalada em inteiro: com subtotais abaixo de 2**50 centavos, razões
+    # diferentes nunca caem no mesmo valor, e a ordem sai exata.
+    ativos.sort(key=lambda i: (limites[i] << 100) // subtotais[i])
+    restante = desconto
+    peso_restante = sum(subtotais[i] for i in ativos)
+    posicao = 0
+    while posicao < len(ativos):
+        i = ativos[posicao]
+        # Satura se a fatia proporcional (restante * subtotal / peso) alcança o limite
+        if limites[i] * peso_restante > restante * subtotais[i]:
+            break
+        descontos[i] = limites[i]
+        restante -= limites[i]
+        peso_restante -= subtotais[i]
+        posicao += 1
+
+    livres = ativos[posicao:]
+    restos = []
+    distribuido = 0
+    for i in livres:
+        parte, resto = divmod(restante * subtotais[i], peso_restante)
+        descontos[i] = parte
+        distribuido += parte
+        restos.append((resto, i))
+
+    # Maior resto: como a fatia exata de cada item livre fica abaixo do limite,
+    # o centavo extra nunca o ultrapassa
+    faltam = restante - distribuido
+    if faltam:
+        restos.sort(reverse=True)
+        for _, i in restos[:faltam]:
+            descontos[i] += 1
+
+    return descontos, desconto
@@ -0,0 +1,138 @@
+"""Leituras numa réplica do banco (secundário do Always On, log shipping, cópia local para testes).
+
+Com a seção [DatabaseRead] no config.ini, as consultas só de leitura (buscas,
+cadastros, carga dos índices) abrem a conexão na réplica; gravações, numeração
+de orçamentos e a releitura do orçamento gravado ficam no banco principal.
+Se a réplica não conecta ou está atrasada, a leitura vai para o principal e a
+réplica só é tentada de novo depois de `pausa_apos_falha` segundos (se caiu)
+ou de `verificar_a_cada` segundos (se atrasada).
+
+Atraso: a cada `verificar_a_cada` segundos, o mesmo marcador (o MAX(AA_NFA)
+de cada terminal, que cresce a cada orçamento ou nota gravada) é lido nos dois
+bancos. Cada marcador lido no principal fica guardado com a hora da leitura; a
+réplica está atrasada se ainda não tem os valores que o principal já tinha há
+`atraso_maximo` segundos. Antes de haver leitura tão antiga (início do
+sistema), qualquer diferença conta como atraso.
+"""
+import threading
+import time
+from collections import deque
+
+import pyodbc
+
+ATIVA = 'ativa'
+ATRASADA = 'atrasada'
+INDISPONIVEL = 'indisponível'
+
+
+def atrasada(marcador_replica, referencia):
+    """Se falta na réplica algum valor do marcador de referência (dicts chave -> valor crescente)."""
+    return any(valor is not None and (marcador_replica.get(chave) is None or marcador_replica[chave] < valor)
+               for chave, valor in referencia.items())
+
+
+class RoteadorLeitura:
+    """Escolhe onde abrir as conexões de leitura.
+
+    abrir_principal() e abrir_replica() devolvem uma conexão nova, None
+    (configuração inválida) ou levantam pyodbc.Error; marcador(conexao) devolve
+    o dict comparado na verificação de atraso.
+    """
+
+    def __init__(self, abrir_principal, abrir_replica, marcador, atraso_maximo=60.0, verificar_a_cada=30.0,
+                 pausa_apos_falha=60.0, relogio=time.monotonic):
+        self.abrir_principal = abrir_principal
+        self.abrir_replica = abrir_replica
+        self.marcador = marcador
+        self.atraso_maximo = atraso_maximo
+        self.verificar_a_cada = verificar_a_cada
+        self.pausa_apos_falha = pausa_apos_falha
+        self.relogio = relogio
+        self.estado = ATIVA
+        self.leituras_replica = 0
+        self.leituras_principal = 0
+        self._amostras = deque()
+        self._proxima_verificacao = 0.0
+        self._tentar_apos = 0.0
+        self._lock = threading.Lock()
+
+    def abrir_leitura(self):
+        """Conexão para uma leitura: na réplica se disponível e em dia; senão None (usar o principal)."""
+        if self._replica_utilizavel():
+            try:
+                conexao = self.abrir_replica()
+            except pyodbc.Error as ex:
+                print(f"Réplica de leitura indisponível, usando o banco principal: {ex}")
+                conexao = None
+            if conexao is not None:
+                with self._lock:
+                    self.leituras_replica += 1
+                return conexao
+            self._suspender(INDISPONIVEL, self.pausa_apos_falha)
+        with self._lock:
+            self.leituras_principal += 1
+        return None
+
+    def _replica_utilizavel(self):
+        agora = self.relogio()
+        with self._lock:
+            if agora < self._tentar_apos:
+                return False
+            # Só uma thread verifica; as outras seguem com o último estado
+            verificar = agora >= self._proxima_verificacao
+            if verificar:
+                self._proxima_verificacao = agora + self.verificar_a_cada
+        if verificar:
+            self._verificar_atraso(agora)
+        return self.estado == ATIVA
+
+    def _suspender(self, estado, pausa):
+        with self._lock:
+            self.estado = estado
+            self._tentar_apos = self.relogio() + pausa
+            # Ao fim da pausa, a réplica é verificada antes de voltar a ser usada
+            self._proxima_verificacao = 0.0
+
+    def _ler_marcador(self, abrir):
+        conexao = abrir()
+        if conexao is None:
+            raise pyodbc.OperationalError('08001', 'Configuração do banco inválida')
+        try:
+            return self.marcador(conexao)
+        finally:
+            conexao.close()
+
+    def _verificar_atraso(self, agora):
+        try:
+            marca_principal = self._ler_marcador(self.abrir_principal)
+        except pyodbc.Error as ex:
+            # Sem o principal não há com o que comparar; a réplica continua como estava
+            print(f"Verificação da réplica: banco principal indisponível: {ex}")
+            return
+        try:
+            marca_replica = self._ler_marcador(self.abrir_replica)
+        except pyodbc.Error as ex:
+            print(f"Réplica de leitura indisponível, usando o banco principal: {ex}")
+            self._suspender(INDISPONIVEL, self.pausa_apos_falha)
+            return
+
+        with self._lock:
+            amostras = self._amostras
+            amostras.append((agora, marca_principal))
+            limite = agora - self.atraso_maximo
+            # Basta a amostra mais recente entre as mais antigas que o limite
+            while len(amostras) > 1 and amostras[1][0] <= limite:
+                amostras.popleft()
+            referencia = amostras[0][1] if amostras[0][0] <= limite else marca_principal
+        if atrasada(marca_replica, referencia):
+            if self.estado != ATRASADA:
+                print("Réplica de leitura atrasada, usando o banco principal")
+            self._suspender(ATRASADA, self.verificar_a_cada)
+        else:
+            with self._lock:
+                self.estado = ATIVA
+
+    def estatisticas(self):
+        with self._lock:
+            return {'estado': self.estado, 'leituras_replica': self.leituras_replica,
+                    'leituras_principal': self.leituras_principal}
@@ -0,0 +1,161 @@
+"""Repetição de comandos ao banco em falhas passageiras (queda de rede na VPN, deadlock).
+
+ConexaoResiliente embrulha a conexão de get_db_connection: um execute de leitura
+que falha por erro passageiro é repetido com espera exponencial com jitter e,
+se a conexão caiu, numa conexão nova. Depois do primeiro comando de gravação a
+transação está em andamento e nada é repetido por aqui; quem grava repete a
+transação inteira (database._gravar_com_repeticao).
+"""
+import random
+import time
+
+import pyodbc
+
+try:
+    from .metrics import registrar_repeticao, registrar_fim_repeticao
+except ImportError:
+    from metrics import registrar_repeticao, registrar_fim_repeticao
+
+TENTATIVAS = 3
+ESPERA_BASE = 0.2
+ESPERA_MAXIMA = 2.0
+
+# Falhas da conexão: o comando só pode ser repetido numa conexão nova
+SQLSTATES_CONEXAO = {'08S01', '08001', '08003', '08004', '08007', 'HYT01'}
+# 40001: vítima de deadlock (erro 1205) ou conflito de serialização. HYT00 (tempo da consulta
+# esgotado) não entra: repetir só faria o usuário esperar o timeout mais vezes
+SQLSTATES_TRANSITORIOS = SQLSTATES_CONEXAO | {'40001'}
+ERROS_NATIVOS_TRANSITORIOS = ('(1205)',)
+
+
+def sqlstate(erro):
+    return erro.args[0] if erro.args and isinstance(erro.args[0], str) else ''
+
+
+def eh_transitorio(erro):
+    """Se vale a pena repetir o comando que falhou com este pyodbc.Error."""
+    if sqlstate(erro) in SQLSTATES_TRANSITORIOS:
+        return True
+    mensagem = str(erro)
+    return any(codigo in mensagem for codigo in ERROS_NATIVOS_TRANSITORIOS)
+
+
+def exige_reconexao(erro):
+    return sqlstate(erro) in SQLSTATES_CONEXAO
+
+
+def espera(tentativa):
+    """Segundos antes da repetição `tentativa` (0, 1, ...): exponencial, limitada, com jitter total."""
+    return random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa))
+
+
+def _eh_leitura(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+class CursorResiliente:
+    """Cursor que repete leituras que falham por erro passageiro; o resto repassa ao cursor atual."""
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._cursor = conexao._atual.cursor()
+
+    def execute(self, sql, *params):
+        if not _eh_leitura(sql):
+            self._conexao.em_transacao = True
+        tentativa = 0
+        while True:
+            try:
+                if self._cursor is None:
+                    self._conexao.reconectar()
+                    self._cursor = self._conexao._atual.cursor()
+                self._cursor.execute(sql, *params)
+                if tentativa:
+                    registrar_fim_repeticao(recuperada=True)
+                return self
+            except pyodbc.Error as ex:
+                if not eh_transitorio(ex) or self._conexao.em_transacao:
+                    raise
+                if tentativa + 1 >= TENTATIVAS:
+                    registrar_fim_repeticao(recuperada=False)
+                    raise
+                reconectar = exige_reconexao(ex)
+                registrar_repeticao(sqlstate(ex), reconectar)
+                if reconectar:
+                    self._conexao.descartar()
+                    self._cursor = None
+                else:
+                    self._conexao.desfazer()
+                time.sleep(espera(tentativa))
+                tentativa += 1
+
+    def executemany(self, sql, seq_params):
+        self._conexao.em_transacao = True
+        self._cursor.executemany(sql, seq_params)
+        return self
+
+    @property
+    def fast_executemany(self):
+        return self._cursor.fast_executemany
+
+    @fast_executemany.setter
+    def fast_executemany(self, valor):
+        self._cursor.fast_executemany = valor
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoResiliente:
+    """Conexão que se reabre com abrir() quando cai entre leituras.
+
+    abrir() devolve uma conexão nova, None (configuração inválida) ou levanta pyodbc.Error.
+    """
+
+    def __init__(self, conexao, abrir):
+        self._atual = conexao
+        self._abrir = abrir
+        self.em_transacao = False
+
+    def cursor(self):
+        return CursorResiliente(self)
+
+    def descartar(self):
+        """Fecha a conexão que caiu; a próxima reconectar() abre outra."""
+        try:
+            self._atual.close()
+        except pyodbc.Error:
+            pass
+
+    def reconectar(self):
+        # A conexão do pool que caiu junto com a rede é descartada pelo gerenciador ODBC ao falhar
+        nova = self._abrir()
+        if nova is None:
+            raise pyodbc.OperationalError('08001', 'Não foi possível reabrir a conexão com o banco de dados')
+        self._atual = nova
+
+    def desfazer(self):
+        try:
+            self._atual.rollback()
+        except pyodbc.Error:
+            pass
+
+    def commit(self):
+        self._atual.commit()
+        self.em_transacao = False
+
+    def rollback(self):
+        self._atual.rollback()
+        self.em_transacao = False
+
+    def close(self):
+        try:
+            self._atual.close()
+        except pyodbc.Error:
+            pass
+
+    def __getattr__(self, nome):
+        return getattr(self._atual, nome)
@@ -0,0 +1,272 @@
+"""Conexão SQLite com a mesma interface do pyodbc, usada como banco local de testes.
+
+Permite rodar o sistema, os benchmarks e os testes de carga sem um SQL Server do
+VTi: basta configurar ``backend = sqlite`` na seção [Database] do config.ini e
+gerar o banco com benchmarks/gerar_banco_local.py.
+"""
+import re
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+import pyodbc
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=' '))
+sqlite3.register_converter('NUMERIC', lambda b: Decimal(b.decode()))
+sqlite3.register_converter('DATETIME', lambda b: datetime.fromisoformat(b.decode()))
+
+_RE_TOP = re.compile(r'^(\s*SELECT\s+(?:DISTINCT\s+)?)TOP\s*\(?\s*(\d+|\?)\s*\)?\s+', re.IGNORECASE)
+_RE_OFFSET = re.compile(r'OFFSET\s+(\d+|\?)\s+ROWS?\s+FETCH\s+(?:NEXT|FIRST)\s+(\d+|\?)\s+ROWS?\s+ONLY', re.IGNORECASE)
+_RE_HINTS = re.compile(r'\s+WITH\s*\(\s*(?:NOLOCK|UPDLOCK|HOLDLOCK|ROWLOCK|READPAST|XLOCK|SERIALIZABLE)(?:\s*,\s*\w+)*\s*\)', re.IGNORECASE)
+_FUNCOES = ((re.compile(r'\bISNULL\s*\(', re.IGNORECASE), 'IFNULL('),
+            (re.compile(r'\bLEN\s*\(', re.IGNORECASE), 'LENGTH('),
+            (re.compile(r'\bGETDATE\s*\(\s*\)', re.IGNORECASE), 'CURRENT_TIMESTAMP'))
+
+_cache_traducoes = {}
+
+# Instruções da VM do SQLite entre as verificações do tempo limite e do cancelamento
+PASSOS_VERIFICACAO = 10000
+
+
+def traduzir_sql(sql, params):
+    """Converte o dialeto T-SQL usado em database.py para SQLite.
+
+    Retorna (sql, params), pois TOP e OFFSET/FETCH mudam a posição dos parâmetros.
+    """
+    chave = sql
+    traducao = _cache_traducoes.get(chave)
+    if traducao is None:
+        traduzido = _RE_HINTS.sub('', sql)
+        for padrao, substituto in _FUNCOES:
+            traduzido = padrao.sub(substituto, traduzido)
+
+        mover_top = False
+        match = _RE_TOP.match(traduzido)
+        limite = None
+        if match:
+            limite = match.group(2)
+            mover_top = limite == '?'
+            traduzido = match.group(1) + traduzido[match.end():]
+
+        trocar_offset = False
+        match_offset = _RE_OFFSET.search(traduzido)
+        if match_offset:
+            deslocamento, quantidade = match_offset.group(1), match_offset.group(2)
+            trocar_offset = deslocamento == '?' and quantidade == '?'
+            traduzido = (traduzido[:match_offset.start()] + f"LIMIT {quantidade} OFFSET {deslocamento}"
+                         + traduzido[match_offset.end():])
+        elif limite is not None:
+            traduzido = traduzido.rstrip().rstrip(';') + f" LIMIT {limite}"
+
+        traducao = _cache_traducoes[chave] = (traduzido, mover_top, trocar_offset)
+
+    traduzido, mover_top, trocar_offset = traducao
+    if mover_top or trocar_offset:
+        params = list(params)
+        if mover_top:
+            params.append(params.pop(0))
+        if trocar_offset:
+            params[-2], params[-1] = params[-1], params[-2]
+    return traduzido, params
+
+
+def _converter_erro(erro):
+    mensagem = str(erro)
+    if isinstance(erro, sqlite3.IntegrityError):
+        return pyodbc.IntegrityError('23000', mensagem)
+    if 'locked' in mensagem or 'busy' in mensagem:
+        # Conflito de bloqueio: equivalente ao deadlock (1205) do SQL Server
+        return pyodbc.OperationalError('40001', mensagem)
+    if isinstance(erro, sqlite3.OperationalError):
+        return pyodbc.ProgrammingError('42000', mensagem)
+    return pyodbc.Error('HY000', mensagem)
+
+
+def _binary_checksum(*valores):
+    """Inteiro de 32 bits com sinal que muda quando algum dos valores muda, como o do SQL Server."""
+    valor = zlib.crc32(repr(valores).encode())
+    return valor - (1 << 32) if valor >= 1 << 31 else valor
+
+
+class _ChecksumAgg:
+    def __init__(self):
+        self.valor = 0
+
+    def step(self, valor):
+        if valor is not None:
+            self.valor ^= valor
+
+    def finalize(self):
+        return self.valor
+
+
+def _normalizar_valor(valor):
+    if isinstance(valor, float):
+        return Decimal(repr(valor))
+    return valor
+
+
+class Linha:
+    """Linha de resultado com acesso por índice e por nome de coluna, como pyodbc.Row."""
+    __slots__ = ('_valores', '_indices')
+
+    def __init__(self, valores, indices):
+        self._valores = valores
+        self._indices = indices
+
+    def __getattr__(self, nome):
+        try:
+            return self._valores[self._indices[nome]]
+        except KeyError:
+            raise AttributeError(nome) from None
+
+    def __getitem__(self, indice):
+        return self._valores[indice]
+
+    def __iter__(self):
+        return iter(self._valores)
+
+    def __len__(self):
+        return len(self._valores)
+
+    def __repr__(self):
+        return repr(self._valores)
+
+
+class Cursor:
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._cursor = conexao._sqlite.cursor()
+        self._indices = {}
+        self.arraysize = 1
+        self.fast_executemany = False
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _params(self, params):
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            return params[0]
+        return params
+
+    def execute(self, sql, *params):
+        sql, params = traduzir_sql(sql, self._params(params))
+        self._conexao._iniciar_execucao()
+        try:
+            self._cursor.execute(sql, params)
+        except sqlite3.Error as e:
+            raise self._conexao._converter_erro(e) from e
+        descricao = self._cursor.description
+        self._indices = {coluna[0]: i for i, coluna in enumerate(descricao)} if descricao else {}
+        return self
+
+    def executemany(self, sql, seq_params):
+        sql, _ = traduzir_sql(sql, ())
+        self._conexao._iniciar_execucao()
+        try:
+            self._cursor.executemany(sql, seq_params)
+        except sqlite3.Error as e:
+            raise self._conexao._converter_erro(e) from e
+        return self
+
+    def _linha(self, valores):
+        return Linha(tuple(_normalizar_valor(v) for v in valores), self._indices)
+
+    def fetchone(self):
+        try:
+            valores = self._cursor.fetchone()
+        except sqlite3.Error as e:
+            raise self._conexao._converter_erro(e) from e
+        return self._linha(valores) if valores is not None else None
+
+    def fetchmany(self, tamanho=None):
+        try:
+            linhas = self._cursor.fetchmany(tamanho or self.arraysize)
+        except sqlite3.Error as e:
+            raise self._conexao._converter_erro(e) from e
+        return [self._linha(valores) for valores in linhas]
+
+    def fetchall(self):
+        try:
+            linhas = self._cursor.fetchall()
+        except sqlite3.Error as e:
+            raise self._conexao._converter_erro(e) from e
+        return [self._linha(valores) for valores in linhas]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def cancel(self):
+        """Interrompe, de outra thread, a consulta em andamento (como pyodbc: erro HY008)."""
+        self._conexao.cancelar()
+
+    def close(self):
+        self._cursor.close()
+
+
+class Conexao:
+    def __init__(self, caminho, timeout=30):
+        self._sqlite = sqlite3.connect(caminho, timeout=timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                                       check_same_thread=False)
+        # UPPER nativo do SQLite ignora letras acentuadas
+        self._sqlite.create_function('UPPER', 1, lambda s: s.upper() if isinstance(s, str) else s, deterministic=True)
+        # Usadas pela sincronização do catálogo por checksum de faixas (o change tracking não existe aqui)
+        self._sqlite.create_function('BINARY_CHECKSUM', -1, _binary_checksum, deterministic=True)
+        self._sqlite.create_aggregate('CHECKSUM_AGG', 1, _ChecksumAgg)
+        self.autocommit = False
+        # Tempo limite de cada consulta em segundos (0 = sem limite), como Connection.timeout do pyodbc
+        self.timeout = 0
+        self._limite = None
+        self._interrupcao = None
+        self._sqlite.set_progress_handler(self._verificar_limite, PASSOS_VERIFICACAO)
+
+    def _iniciar_execucao(self):
+        self._interrupcao = None
+        self._limite = time.monotonic() + self.timeout if self.timeout else None
+
+    def _verificar_limite(self):
+        if self._limite is not None and time.monotonic() > self._limite:
+            self._interrupcao = 'HYT00'
+            return 1
+        return 0
+
+    def cancelar(self):
+        self._interrupcao = 'HY008'
+        self._sqlite.interrupt()
+
+    def _converter_erro(self, erro):
+        if 'interrupted' in str(erro):
+            if self._interrupcao == 'HYT00':
+                return pyodbc.OperationalError('HYT00', '[HYT00] Tempo limite da consulta esgotado')
+            return pyodbc.OperationalError('HY008', '[HY008] Operação cancelada')
+        return _converter_erro(erro)
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        try:
+            self._sqlite.commit()
+        except sqlite3.Error as e:
+            raise self._converter_erro(e) from e
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+
+
+def conectar(caminho, timeout=30):
+    try:
+        return Conexao(caminho, timeout=timeout)
+    except sqlite3.Error as e:
+        raise _converter_erro(e) from e
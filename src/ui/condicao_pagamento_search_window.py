@@ -1,21 +1,32 @@
 import tkinter as tk
 from tkinter import ttk
 try:
-    from database import get_condicoes_pagamento
+    from politica_pagamento import politica_pagamento
+    from metrics import iniciar_acao, concluir_acao
+    from busca import ResultadosPaginados
+    from ui.virtual_grid import GradeVirtual
 except ImportError:
-    from src.database import get_condicoes_pagamento
+    from src.politica_pagamento import politica_pagamento
+    from src.metrics import iniciar_acao, concluir_acao
+    from src.busca import ResultadosPaginados
+    from src.ui.virtual_grid import GradeVirtual
 
 class CondicaoPagamentoSearchWindow(tk.Toplevel):
-    def __init__(self, parent, callback):
+    """Busca de condições de pagamento; com tipo_cli (cliente já escolhido), só as que ele pode usar."""
+
+    def __init__(self, parent, callback, tipo_cli=None):
+        inicio = iniciar_acao()
         super().__init__(parent)
         self.title("Consulta de Condições de Pagamento")
         self.geometry("700x400")
         self.callback = callback
+        self.tipo_cli = tipo_cli
         
         self.transient(parent)
         self.grab_set()
         
-        self.condicoes_exibidas = []
+        self.condicoes = None
+        self.resultados = ResultadosPaginados.de_lista([])
 
         self.create_widgets()
         self.filtrar_condicoes()
@@ -23,6 +34,7 @@ class CondicaoPagamentoSearchWindow(tk.Toplevel):
         self.center_window()
         
         self.after(100, lambda: self.search_entry.focus_set())
+        concluir_acao(self, 'abrir_busca_condicoes', inicio)
         
     def center_window(self):
         self.update_idletasks()
@@ -49,19 +61,19 @@ class CondicaoPagamentoSearchWindow(tk.Toplevel):
         search_button = ttk.Button(search_frame, text="Filtrar", command=self.filtrar_condicoes)
         search_button.pack(side='left', padx=5)
 
-        columns = ('codigo', 'descricao')
-        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=15)
-        
-        self.tree.heading('codigo', text='Código', anchor='w')
-        self.tree.heading('descricao', text='Descrição', anchor='w')
-        
-        self.tree.column('codigo', width=80, anchor='w')
-        self.tree.column('descricao', width=400, anchor='w')
-        
-        self.tree.pack(expand=True, fill='both', padx=10, pady=5)
+        if self.tipo_cli is not None:
+            ttk.Label(self, text="Mostrando só as condições permitidas para o tipo do cliente selecionado",
+                      foreground='gray').pack(fill='x', padx=10)
+
+        colunas = [
+            ('codigo', 'Código', 80, 'w'),
+            ('descricao', 'Descrição', 400, 'w'),
+        ]
+        self.lista = GradeVirtual(self, colunas, self.formatar_linha)
+        self.lista.pack(expand=True, fill='both', padx=10, pady=5)
         
-        self.tree.bind('<Double-1>', self.on_select)
-        self.tree.bind('<Return>', self.on_select)
+        self.lista.tree.bind('<Double-1>', self.on_select)
+        self.lista.tree.bind('<Return>', self.on_select)
         
         button_frame = ttk.Frame(self, padding=(10, 5))
         button_frame.pack(fill='x')
@@ -72,45 +84,39 @@ class CondicaoPagamentoSearchWindow(tk.Toplevel):
         cancel_button = ttk.Button(button_frame, text="Cancelar", command=self.destroy)
         cancel_button.pack(side='right', padx=5)
 
+    def formatar_linha(self, chave):
+        condicao = self.resultados.registro(chave)
+        return (condicao['codigo'], condicao['descricao'])
+
     def filtrar_condicoes(self, event=None):
+        inicio = iniciar_acao()
         search_text = self.search_entry.get().lower()
         
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        condicoes = get_condicoes_pagamento()
-        self.condicoes_exibidas = []
+        # A lista é pequena e fica em memória: filtra localmente a cada tecla
+        if self.condicoes is None:
+            self.condicoes = politica_pagamento.condicoes_para(self.tipo_cli)
         
-        for condicao in condicoes:
-            codigo = condicao['codigo'].lower()
-            descricao = condicao['descricao'].lower()
-            
-            if (search_text in codigo or search_text in descricao or not search_text):
-                item = self.tree.insert('', 'end', values=(condicao['codigo'], condicao['descricao']))
-                self.condicoes_exibidas.append(condicao)
+        exibidos = [condicao for condicao in self.condicoes
+                    if not search_text or search_text in condicao['codigo'].lower() or search_text in condicao['descricao'].lower()]
+        self.resultados = ResultadosPaginados.de_lista(exibidos)
+        self.lista.definir_lote(self.resultados)
+        self.lista.selecionar_primeira()
         
-        if self.condicoes_exibidas:
-            self.tree.selection_set(self.tree.get_children()[0])
-            self.tree.focus(self.tree.get_children()[0])
+        if event is not None:
+            concluir_acao(self, 'busca_condicoes_digitacao', inicio)
 
     def on_enter_search(self, event):
-        if self.tree.get_children():
-            self.tree.selection_set(self.tree.get_children()[0])
-            self.tree.focus(self.tree.get_children()[0])
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
             self.on_select()
 
     def move_to_list(self, event):
-        if self.tree.get_children():
-            self.tree.focus(self.tree.get_children()[0])
-            self.tree.selection_set(self.tree.get_children()[0])
-            self.tree.focus_set()
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
+            self.lista.tree.focus_set()
 
     def on_select(self, event=None):
-        selection = self.tree.selection()
-        if selection:
-            item = selection[0]
-            index = self.tree.index(item)
-            if index < len(self.condicoes_exibidas):
-                condicao_selecionada = self.condicoes_exibidas[index]
-                self.callback(condicao_selecionada)
-                self.destroy()
+        chave = self.lista.chave_selecionada
+        if chave is not None and chave in self.resultados:
+            self.callback(self.resultados.registro(chave))
+            self.destroy()
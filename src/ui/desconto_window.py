@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal
 import sys
 import os
 
@@ -8,14 +8,16 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from src.database import get_desconto_config
+    from src.dinheiro import arredondar, interpretar, formatar_numero, formatar_moeda
 except ImportError:
     from database import get_desconto_config
+    from dinheiro import arredondar, interpretar, formatar_numero, formatar_moeda
 
 
 class DescontoWindow:
     def __init__(self, parent, valor_total, callback_desconto=None, itens_orcamento=None, callback_fechar=None):
         self.parent = parent
-        self.valor_total = Decimal(str(valor_total))
+        self.valor_total = arredondar(valor_total)
         self.callback_desconto = callback_desconto
         self.callback_fechar = callback_fechar
         self.desconto_config = get_desconto_config()
@@ -70,7 +72,7 @@ class DescontoWindow:
         info_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(0, 15))
         
         ttk.Label(info_frame, text="Valor Total:").grid(row=0, column=0, sticky="w")
-        ttk.Label(info_frame, text=f"R$ {self.valor_total:.2f}".replace('.', ','), 
+        ttk.Label(info_frame, text=formatar_moeda(self.valor_total), 
                  font=('Arial', 10, 'bold')).grid(row=0, column=1, sticky="e", padx=(20, 0))
         
         if self.desconto_medio_produtos > 0:
@@ -109,7 +111,7 @@ class DescontoWindow:
         self.desconto_label.grid(row=0, column=1, sticky="e", padx=(20, 0))
         
         ttk.Label(resultado_frame, text="Valor final:").grid(row=1, column=0, sticky="w")
-        self.valor_final_label = ttk.Label(resultado_frame, text=f"R$ {self.valor_total:.2f}".replace('.', ','), 
+        self.valor_final_label = ttk.Label(resultado_frame, text=formatar_moeda(self.valor_total), 
                                          font=('Arial', 12, 'bold'), foreground='blue')
         self.valor_final_label.grid(row=1, column=1, sticky="e", padx=(20, 0))
         
@@ -129,15 +131,7 @@ class DescontoWindow:
         self.window.bind('<Return>', lambda e: self.aplicar_desconto())
         
     def safe_decimal(self, value_str):
-        if not value_str:
-            return Decimal('0')
-        try:
-            clean_str = value_str.replace(',', '.').strip()
-            if not clean_str:
-                return Decimal('0')
-            return Decimal(clean_str)
-        except (ValueError, InvalidOperation):
-            return Decimal('0')
+        return interpretar(value_str, Decimal('0'))
         
     def on_percentual_change(self, *args):
         if self.updating:
@@ -150,9 +144,9 @@ class DescontoWindow:
             if percentual < 0 or percentual > 100:
                 percentual = Decimal('0')
                 
-            valor_desconto = (self.valor_total * percentual) / Decimal('100')
+            valor_desconto = arredondar((self.valor_total * percentual) / Decimal('100'))
             
-            self.valor_var.set(f"{valor_desconto:.2f}".replace('.', ','))
+            self.valor_var.set(formatar_numero(valor_desconto))
             
             self.calcular_e_atualizar_resultado(valor_desconto)
             
@@ -167,12 +161,12 @@ class DescontoWindow:
             
         self.updating = True
         try:
-            valor_desconto = self.safe_decimal(self.valor_var.get())
+            valor_desconto = arredondar(self.safe_decimal(self.valor_var.get()))
             
             if valor_desconto < 0 or valor_desconto > self.valor_total:
                 if valor_desconto > self.valor_total:
                     valor_desconto = self.valor_total
-                    self.valor_var.set(f"{valor_desconto:.2f}".replace('.', ','))
+                    self.valor_var.set(formatar_numero(valor_desconto))
                 elif valor_desconto < 0:
                     valor_desconto = Decimal('0')
                     self.valor_var.set("0,00")
@@ -182,7 +176,7 @@ class DescontoWindow:
             else:
                 percentual = Decimal('0')
                 
-            self.percentual_var.set(f"{percentual:.2f}".replace('.', ','))
+            self.percentual_var.set(formatar_numero(percentual))
             
             self.calcular_e_atualizar_resultado(valor_desconto)
             
@@ -195,8 +189,8 @@ class DescontoWindow:
         self.desconto_aplicado = valor_desconto
         self.valor_final = self.valor_total - self.desconto_aplicado
         
-        self.desconto_label.config(text=f"R$ {self.desconto_aplicado:.2f}".replace('.', ','))
-        self.valor_final_label.config(text=f"R$ {self.valor_final:.2f}".replace('.', ','))
+        self.desconto_label.config(text=formatar_moeda(self.desconto_aplicado))
+        self.valor_final_label.config(text=formatar_moeda(self.valor_final))
             
     def verificar_limite_desconto(self):
         if self.desconto_aplicado == 0:
@@ -282,18 +276,18 @@ class DescontoWindow:
             return
             
         if self.callback_desconto:
-            percentual = (self.desconto_aplicado / self.valor_total) * 100 if self.valor_total > 0 else 0
-            self.callback_desconto(float(self.desconto_aplicado), float(percentual), float(self.valor_final))
+            percentual = (self.desconto_aplicado / self.valor_total) * 100 if self.valor_total > 0 else Decimal('0')
+            self.callback_desconto(self.desconto_aplicado, percentual, self.valor_final)
             
         messagebox.showinfo("Sucesso", 
-                          f"Desconto de R$ {self.desconto_aplicado:.2f}".replace('.', ',') + " aplicado com sucesso!\n" +
-                          f"Valor final: R$ {self.valor_final:.2f}".replace('.', ','))
+                          f"Desconto de {formatar_moeda(self.desconto_aplicado)} aplicado com sucesso!\n"
+                          f"Valor final: {formatar_moeda(self.valor_final)}")
         
         self.fechar_janela()
 
     def limpar_desconto(self):
         if self.callback_desconto:
-            self.callback_desconto(0.0, 0.0, float(self.valor_total))
+            self.callback_desconto(Decimal('0'), Decimal('0'), self.valor_total)
             
         messagebox.showinfo("Desconto Removido", "Desconto foi removido com sucesso!")
         self.fechar_janela()
@@ -311,7 +305,7 @@ def main():
     def callback_teste(valor_desconto, percentual, valor_final):
         pass
         
-    DescontoWindow(root, 1000.00, callback_teste)
+    DescontoWindow(root, Decimal('1000.00'), callback_teste)
     root.mainloop()
 
 
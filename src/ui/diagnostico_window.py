@@ -0,0 +1,194 @@
+import tkinter as tk
+from tkinter import ttk
+try:
+    from metrics import (resumo_acoes, gravar_metricas_acoes, resumo_consultas, resumo_caches,
+                         resumo_filas, resumo_conexoes, resumo_repeticoes, resumo_replica,
+                         resumo_sincronizacoes, viagens_por_minuto, consultas_lentas_recentes)
+except ImportError:
+    from src.metrics import (resumo_acoes, gravar_metricas_acoes, resumo_consultas, resumo_caches,
+                             resumo_filas, resumo_conexoes, resumo_repeticoes, resumo_replica,
+                             resumo_sincronizacoes, viagens_por_minuto, consultas_lentas_recentes)
+
+INTERVALO_ATUALIZACAO_MS = 1000
+
+class DiagnosticoWindow(tk.Toplevel):
+    """Janela oculta (Ctrl+Shift+F12) com estatísticas de banco, caches, filas e interface."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.title("Diagnóstico")
+        self.geometry("800x500")
+
+        self.transient(parent)
+
+        self.after_id = None
+
+        self.create_widgets()
+        self.atualizar()
+
+        self.center_window()
+
+        self.protocol("WM_DELETE_WINDOW", self.fechar_janela)
+
+    def center_window(self):
+        self.update_idletasks()
+        width = self.winfo_width()
+        height = self.winfo_height()
+        x = (self.winfo_screenwidth() - width) // 2
+        y = (self.winfo_screenheight() - height) // 2
+        self.geometry(f"+{x}+{y}")
+
+    def _criar_tabela(self, parent, colunas, height=8):
+        """colunas: lista de (id, título, largura); a primeira coluna fica alinhada à esquerda."""
+        tree = ttk.Treeview(parent, columns=[c[0] for c in colunas], show='headings', height=height)
+        for i, (coluna, titulo, largura) in enumerate(colunas):
+            tree.heading(coluna, text=titulo, anchor='w' if i == 0 else 'center')
+            tree.column(coluna, width=largura, anchor='w' if i == 0 else 'e')
+        return tree
+
+    def create_widgets(self):
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(expand=True, fill='both', padx=10, pady=5)
+
+        resumo_frame = ttk.Frame(self.notebook, padding=(10, 5))
+        self.notebook.add(resumo_frame, text="Resumo")
+
+        self.viagens_var = tk.StringVar()
+        self.conexoes_var = tk.StringVar()
+        self.repeticoes_var = tk.StringVar()
+        self.replica_var = tk.StringVar()
+        ttk.Label(resumo_frame, textvariable=self.viagens_var, font=("Arial", 10, "bold")).pack(anchor='w')
+        ttk.Label(resumo_frame, textvariable=self.conexoes_var, font=("Arial", 10, "bold")).pack(anchor='w')
+        ttk.Label(resumo_frame, textvariable=self.repeticoes_var, font=("Arial", 10, "bold")).pack(anchor='w')
+        ttk.Label(resumo_frame, textvariable=self.replica_var, font=("Arial", 10, "bold")).pack(anchor='w', pady=(0, 5))
+
+        ttk.Label(resumo_frame, text="Caches:").pack(anchor='w')
+        self.caches_tree = self._criar_tabela(resumo_frame, [
+            ('cache', 'Cache', 200), ('itens', 'Itens', 80), ('acertos', 'Acertos', 80),
+            ('falhas', 'Falhas', 80), ('taxa', 'Acerto %', 80)
+        ], height=5)
+        self.caches_tree.pack(fill='x', pady=(0, 5))
+
+        ttk.Label(resumo_frame, text="Filas:").pack(anchor='w')
+        self.filas_tree = self._criar_tabela(resumo_frame, [('fila', 'Fila', 200), ('tamanho', 'Pendentes', 80)], height=4)
+        self.filas_tree.pack(fill='x', pady=(0, 5))
+
+        ttk.Label(resumo_frame, text="Sincronizações:").pack(anchor='w')
+        self.sincronizacoes_tree = self._criar_tabela(resumo_frame, [
+            ('nome', 'Sincronização', 200), ('vezes', 'Vezes', 60), ('linhas', 'Linhas', 80), ('kb', 'KB', 80),
+            ('ultima', 'Última', 320)
+        ], height=3)
+        self.sincronizacoes_tree.pack(fill='x')
+
+        consultas_frame = ttk.Frame(self.notebook, padding=(10, 5))
+        self.notebook.add(consultas_frame, text="Consultas (ms)")
+        self.consultas_tree = self._criar_tabela(consultas_frame, [
+            ('consulta', 'Consulta', 220), ('chamadas', 'Qtd.', 60), ('p50', 'p50', 60), ('p95', 'p95', 60),
+            ('p99', 'p99', 60), ('max', 'Máx.', 60), ('linhas', 'Linhas', 80), ('bytes', 'Bytes', 90)
+        ])
+        self.consultas_tree.pack(expand=True, fill='both')
+
+        lentas_frame = ttk.Frame(self.notebook, padding=(10, 5))
+        self.notebook.add(lentas_frame, text="Consultas lentas")
+        self.lentas_tree = self._criar_tabela(lentas_frame, [
+            ('hora', 'Hora', 80), ('consulta', 'Consulta', 180), ('ms', 'ms', 70), ('linhas', 'Linhas', 70), ('sql', 'SQL', 400)
+        ])
+        self.lentas_tree.column('hora', anchor='w')
+        self.lentas_tree.column('sql', anchor='w')
+        self.lentas_tree.pack(expand=True, fill='both')
+
+        acoes_frame = ttk.Frame(self.notebook, padding=(10, 5))
+        self.notebook.add(acoes_frame, text="Ações da interface (ms)")
+        self.acoes_tree = self._criar_tabela(acoes_frame, [
+            ('acao', 'Ação', 220), ('execucoes', 'Qtd.', 70), ('p50', 'p50', 70),
+            ('p95', 'p95', 70), ('p99', 'p99', 70), ('max', 'Máx.', 70)
+        ])
+        self.acoes_tree.pack(expand=True, fill='both')
+
+        button_frame = ttk.Frame(self, padding=(10, 5))
+        button_frame.pack(fill='x')
+
+        ttk.Button(button_frame, text="Fechar", command=self.fechar_janela).pack(side='right', padx=5)
+        ttk.Button(button_frame, text="Gravar métricas", command=gravar_metricas_acoes).pack(side='right', padx=5)
+
+        self.bind("<Escape>", lambda e: self.fechar_janela())
+
+    def _preencher(self, tree, linhas):
+        """Atualiza as linhas no lugar (iid = chave) para não piscar a cada ciclo."""
+        existentes = set(tree.get_children())
+        vistos = set()
+        for chave, valores in linhas:
+            vistos.add(chave)
+            if chave in existentes:
+                tree.item(chave, values=valores)
+            else:
+                tree.insert('', 'end', iid=chave, values=valores)
+        obsoletas = existentes - vistos
+        if obsoletas:
+            tree.delete(*obsoletas)
+
+    @staticmethod
+    def _descrever_sincronizacao(ultima):
+        if not ultima:
+            return ""
+        if ultima.get('erro'):
+            return f"{ultima['modo']}: falhou"
+        return (f"{ultima['modo']}: {ultima['linhas']} linhas, {ultima['bytes'] / 1024:.1f} KB, "
+                f"{ultima['alterados']} alterados, {ultima['segundos']:.2f}s")
+
+    def atualizar(self):
+        conexoes = resumo_conexoes()
+        self.viagens_var.set(f"Comandos ao banco no último minuto: {viagens_por_minuto()}")
+        self.conexoes_var.set(
+            f"Conexões abertas: {conexoes['abertas']} (pico {conexoes['pico']}, total {conexoes['total']})"
+        )
+        repeticoes = resumo_repeticoes()
+        estados = ', '.join(f"{estado}: {qtd}" for estado, qtd in sorted(repeticoes['por_estado'].items()))
+        self.repeticoes_var.set(
+            f"Comandos repetidos por falha passageira: {repeticoes['repeticoes']} "
+            f"(reconexões {repeticoes['reconexoes']}, recuperados {repeticoes['recuperadas']}, "
+            f"esgotados {repeticoes['esgotadas']})" + (f" [{estados}]" if estados else "")
+        )
+        replica = resumo_replica()
+        self.replica_var.set(
+            f"Réplica de leitura: {replica['estado']} ({replica['leituras_replica']} leituras na réplica, "
+            f"{replica['leituras_principal']} no principal)" if replica else "Réplica de leitura: não configurada"
+        )
+
+        self._preencher(self.caches_tree, [
+            (nome, (nome, c.get('itens', 0), c.get('acertos', 0), c.get('falhas', 0), f"{c['taxa_acerto']:.1f}"))
+            for nome, c in resumo_caches().items()
+        ])
+        self._preencher(self.filas_tree, [(nome, (nome, tamanho)) for nome, tamanho in resumo_filas().items()])
+        self._preencher(self.sincronizacoes_tree, [
+            (nome, (nome, s['sincronizacoes'], s['linhas'], f"{s['bytes'] / 1024:.1f}", self._descrever_sincronizacao(s['ultima'])))
+            for nome, s in resumo_sincronizacoes().items()
+        ])
+
+        # Só as abas visíveis pedem percentis, que exigem ordenar as amostras
+        aba = self.notebook.index(self.notebook.select())
+        if aba == 1:
+            self._preencher(self.consultas_tree, [
+                (nome, (nome, r['chamadas'], f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}", f"{r['p99_ms']:.1f}",
+                        f"{r['max_ms']:.1f}", r['linhas'], r['bytes_estimados']))
+                for nome, r in resumo_consultas().items()
+            ])
+        elif aba == 2:
+            self._preencher(self.lentas_tree, [
+                (str(i), (c['data'], c['consulta'], f"{c['ms']:.1f}", c['linhas'], c['sql']))
+                for i, c in enumerate(consultas_lentas_recentes())
+            ])
+        elif aba == 3:
+            self._preencher(self.acoes_tree, [
+                (nome, (nome, r['execucoes'], f"{r['p50_ms']:.1f}", f"{r['p95_ms']:.1f}",
+                        f"{r['p99_ms']:.1f}", f"{r['max_ms']:.1f}"))
+                for nome, r in resumo_acoes().items()
+            ])
+
+        self.after_id = self.after(INTERVALO_ATUALIZACAO_MS, self.atualizar)
+
+    def fechar_janela(self):
+        if self.after_id:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+        self.destroy()
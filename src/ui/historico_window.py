@@ -0,0 +1,230 @@
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+from database import buscar_historico_orcamentos, chave_historico
+from dinheiro import formatar_moeda
+from metrics import iniciar_acao, concluir_acao
+from busca import ConsultaEmSegundoPlano, ResultadosPaginados
+from ui.search_window import SearchWindow
+from ui.product_search_window import ProductSearchWindow
+from ui.virtual_grid import GradeVirtual
+
+INTERVALO_CONSULTA_MS = 20
+
+SITUACOES = [('Todos', None), ('Em aberto', 'abertos'), ('Convertidos', 'convertidos')]
+TODOS_VENDEDORES = 'Todos'
+
+class HistoricoOrcamentosWindow(tk.Toplevel):
+    """Orçamentos do terminal, do mais recente para o mais antigo, com filtros.
+
+    A lista é carregada por páginas conforme rola (database.buscar_historico_orcamentos,
+    paginado por data e número); escolher um orçamento chama callback(numero).
+    """
+
+    def __init__(self, parent, callback, vendedores=()):
+        inicio = iniciar_acao()
+        super().__init__(parent)
+        self.title("Histórico de Orçamentos")
+        self.geometry("860x480")
+        self.callback = callback
+        self.vendedores = {f"{v['codigo']} - {v['nome']}": v['codigo'] for v in vendedores}
+
+        self.transient(parent)
+        self.grab_set()
+
+        self.resultados = ResultadosPaginados.de_lista([], 'numero')
+        self.consulta = None
+
+        self.create_widgets()
+        self.filtrar()
+
+        self.center_window()
+
+        self.after(100, lambda: self.data_inicial_entry.focus_set())
+        concluir_acao(self, 'abrir_historico_orcamentos', inicio)
+
+    def center_window(self):
+        """Centraliza a janela na tela"""
+        self.update_idletasks()
+        width = self.winfo_width()
+        height = self.winfo_height()
+        x = (self.winfo_screenwidth() - width) // 2
+        y = (self.winfo_screenheight() - height) // 2
+        self.geometry(f"+{x}+{y}")
+
+    def create_widgets(self):
+        filtros_frame = ttk.LabelFrame(self, text="Filtros", padding=(10, 5))
+        filtros_frame.pack(fill='x', padx=10, pady=5)
+
+        ttk.Label(filtros_frame, text="De:").grid(row=0, column=0, padx=5, pady=3, sticky='w')
+        self.data_inicial_entry = ttk.Entry(filtros_frame, width=12)
+        self.data_inicial_entry.grid(row=0, column=1, padx=5, pady=3, sticky='w')
+        ttk.Label(filtros_frame, text="Até:").grid(row=0, column=2, padx=5, pady=3, sticky='w')
+        self.data_final_entry = ttk.Entry(filtros_frame, width=12)
+        self.data_final_entry.grid(row=0, column=3, padx=5, pady=3, sticky='w')
+
+        ttk.Label(filtros_frame, text="Situação:").grid(row=0, column=4, padx=5, pady=3, sticky='w')
+        self.situacao_combo = ttk.Combobox(filtros_frame, values=[s[0] for s in SITUACOES], state='readonly', width=14)
+        self.situacao_combo.current(0)
+        self.situacao_combo.grid(row=0, column=5, padx=5, pady=3, sticky='w')
+        self.situacao_combo.bind("<<ComboboxSelected>>", self.filtrar)
+
+        ttk.Label(filtros_frame, text="Cliente:").grid(row=1, column=0, padx=5, pady=3, sticky='w')
+        self.cliente_entry = ttk.Entry(filtros_frame, width=12)
+        self.cliente_entry.grid(row=1, column=1, padx=5, pady=3, sticky='w')
+        ttk.Button(filtros_frame, text="...", width=3, command=self.buscar_cliente).grid(row=1, column=2, sticky='w')
+
+        ttk.Label(filtros_frame, text="Vendedor:").grid(row=1, column=4, padx=5, pady=3, sticky='w')
+        self.vendedor_combo = ttk.Combobox(filtros_frame, values=[TODOS_VENDEDORES] + list(self.vendedores),
+                                           state='readonly', width=30)
+        self.vendedor_combo.current(0)
+        self.vendedor_combo.grid(row=1, column=5, padx=5, pady=3, sticky='w')
+        self.vendedor_combo.bind("<<ComboboxSelected>>", self.filtrar)
+
+        ttk.Label(filtros_frame, text="Produto:").grid(row=2, column=0, padx=5, pady=3, sticky='w')
+        self.produto_entry = ttk.Entry(filtros_frame, width=12)
+        self.produto_entry.grid(row=2, column=1, padx=5, pady=3, sticky='w')
+        ttk.Button(filtros_frame, text="...", width=3, command=self.buscar_produto).grid(row=2, column=2, sticky='w')
+
+        ttk.Button(filtros_frame, text="Filtrar", command=self.filtrar).grid(row=2, column=5, padx=5, pady=3, sticky='e')
+
+        for entry in (self.data_inicial_entry, self.data_final_entry, self.cliente_entry, self.produto_entry):
+            entry.bind("<Return>", self.filtrar)
+            entry.bind("<Down>", self.move_to_list)
+
+        self.bind("<Escape>", lambda e: self.destroy())
+
+        colunas = [
+            ('numero', 'Número', 70, 'w'),
+            ('data', 'Data', 80, 'center'),
+            ('cliente', 'Cliente', 260, 'w'),
+            ('vendedor', 'Vendedor', 180, 'w'),
+            ('situacao', 'Situação', 90, 'center'),
+            ('valor', 'Valor', 100, 'e'),
+        ]
+        self.lista = GradeVirtual(self, colunas, self.formatar_linha)
+        self.lista.pack(expand=True, fill='both', padx=10, pady=5)
+        self.lista.tree.bind("<Double-1>", self.on_select)
+        self.lista.tree.bind("<Return>", self.on_select)
+
+        footer_frame = ttk.Frame(self, padding=(10, 5))
+        footer_frame.pack(fill='x')
+
+        select_button = ttk.Button(footer_frame, text="Abrir", command=self.on_select)
+        select_button.pack(side='right')
+
+        self.status_var = tk.StringVar()
+        ttk.Label(footer_frame, textvariable=self.status_var, foreground='gray').pack(side='left')
+
+    def _abrir_busca(self, janela):
+        # A busca toma o foco exclusivo; ao fechar, ele volta para esta janela
+        self.wait_window(janela)
+        if self.winfo_exists():
+            self.grab_set()
+
+    def buscar_cliente(self):
+        self._abrir_busca(SearchWindow(self, self.on_cliente_selecionado))
+
+    def on_cliente_selecionado(self, cliente):
+        self.cliente_entry.delete(0, 'end')
+        self.cliente_entry.insert(0, cliente['codigo'])
+        self.filtrar()
+
+    def buscar_produto(self):
+        self._abrir_busca(ProductSearchWindow(self, self.on_produto_selecionado))
+
+    def on_produto_selecionado(self, produto):
+        self.produto_entry.delete(0, 'end')
+        self.produto_entry.insert(0, produto['codigo'])
+        self.filtrar()
+
+    def move_to_list(self, event):
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
+            self.lista.tree.focus_set()
+
+    def _data(self, entry, descricao):
+        texto = entry.get().strip()
+        if not texto:
+            return None
+        try:
+            return datetime.strptime(texto, "%d/%m/%Y")
+        except ValueError:
+            raise ValueError(f"Data {descricao} inválida; use dd/mm/aaaa.")
+
+    def _filtros(self):
+        filtros = {
+            'data_inicial': self._data(self.data_inicial_entry, 'inicial'),
+            'data_final': self._data(self.data_final_entry, 'final'),
+            'situacao': SITUACOES[self.situacao_combo.current()][1],
+            'codigo_vendedor': self.vendedores.get(self.vendedor_combo.get()),
+        }
+        cliente = self.cliente_entry.get().strip()
+        if cliente:
+            filtros['codigo_cliente'] = cliente.zfill(5) if cliente.isdigit() else cliente
+        produto = self.produto_entry.get().strip()
+        if produto:
+            filtros['codigo_produto'] = produto.zfill(6) if produto.isdigit() else produto
+        return filtros
+
+    def filtrar(self, event=None):
+        """Refaz a lista com os filtros; a primeira página é buscada numa thread."""
+        inicio = iniciar_acao()
+        try:
+            filtros = self._filtros()
+        except ValueError as e:
+            self.status_var.set(str(e))
+            return
+
+        if self.consulta is not None:
+            self.consulta.cancelar()
+        self.status_var.set("Buscando...")
+        self.consulta = ConsultaEmSegundoPlano(lambda: ResultadosPaginados.por_chave(
+            lambda apos, quantidade: buscar_historico_orcamentos(filtros, apos, quantidade),
+            chave_historico, 'numero'))
+        self.aguardar_consulta(self.consulta, inicio)
+
+    def aguardar_consulta(self, consulta, inicio):
+        if consulta is not self.consulta:
+            return
+        if not consulta.concluida:
+            self.after(INTERVALO_CONSULTA_MS, lambda: self.aguardar_consulta(consulta, inicio))
+            return
+        self.consulta = None
+
+        if consulta.resultados is None:
+            self.status_var.set("A consulta demorou demais; mostrando o resultado anterior.")
+            return
+        self.resultados = consulta.resultados
+        self.lista.definir_lote(self.resultados)
+        self.lista.selecionar_primeira()
+        if consulta.erro:
+            self.status_var.set("Lista incompleta: a consulta demorou demais.")
+        elif not len(self.resultados):
+            self.status_var.set("Nenhum orçamento encontrado.")
+        else:
+            self.status_var.set("")
+        concluir_acao(self, 'historico_orcamentos_filtrar', inicio)
+
+    def formatar_linha(self, chave):
+        orcamento = self.resultados.registro(chave)
+        data = orcamento['data']
+        return (orcamento['numero'],
+                data.strftime("%d/%m/%Y") if hasattr(data, 'strftime') else (data or ''),
+                f"{orcamento['codigo_cliente']} - {orcamento['cliente']}" if orcamento['codigo_cliente'] else '',
+                orcamento['vendedor'] or orcamento['codigo_vendedor'],
+                "Em aberto" if orcamento['status'] == '8' else "Convertido",
+                formatar_moeda(orcamento['valor_total']))
+
+    def on_select(self, event=None):
+        chave = self.lista.chave_selecionada
+        if chave is None or chave not in self.resultados:
+            return
+        self.callback(chave)
+        self.after_idle(self.destroy)
+
+    def destroy(self):
+        if self.consulta is not None:
+            self.consulta.cancelar()
+            self.consulta = None
+        super().destroy()
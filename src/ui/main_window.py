@@ -6,27 +6,25 @@ import traceback
 import sys
 import configparser
 import os
-from database import (get_proximo_numero_orcamento, get_vendedores, get_cliente_por_codigo,
-                      get_condicoes_pagamento, get_produto_por_codigo, salvar_orcamento,
-                      get_orcamento_cabecalho, get_orcamento_itens, atualizar_orcamento,
-                      condicao_permite_sem_cliente, get_deposito_config, get_desconto_config,
-                      validar_tipo_pagamento_permitido, get_condicoes_pagamento_detalhadas)
-from models import Orcamento, ItemOrcamento
+from database import (get_config_path, get_proximo_numero_orcamento, get_vendedores, get_cliente_por_codigo,
+                      salvar_orcamento, get_orcamento_cabecalho, get_orcamento_itens, atualizar_orcamento,
+                      get_desconto_config, get_exposicao_cliente, antecipar_exposicao_cliente)
+from models import Orcamento, ItemBatch, LinhaItem, ESCALA_QUANTIDADE
 from pdf_generator import gerar_pdf_orcamento
-from ui.search_window import SearchWindow
-from ui.product_search_window import ProductSearchWindow
+from politica_pagamento import politica_pagamento
+from rateio_desconto import ratear_desconto
+from dinheiro import (para_centavos, de_centavos, arredondar, percentual, interpretar,
+                      formatar_numero, formatar_moeda)
+from metrics import iniciar_acao, concluir_acao, medir_acao
+from ui.search_window import SearchWindow, busca_clientes, busca_documentos
+from ui.product_search_window import ProductSearchWindow, busca_produtos
 from ui.desconto_window import DescontoWindow
 from ui.vendedor_search_window import VendedorSearchWindow
 from ui.condicao_pagamento_search_window import CondicaoPagamentoSearchWindow
-
-def get_config_path():
-    if getattr(sys, 'frozen', False):
-        base_path = os.path.dirname(sys.executable)
-        config_path = os.path.join(base_path, 'config.ini')
-    else:
-        base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        config_path = os.path.join(base_path, 'config', 'config.ini')
-    return config_path
+from ui.diagnostico_window import DiagnosticoWindow
+from ui.historico_window import HistoricoOrcamentosWindow
+from ui.orcamentos_produto_window import OrcamentosComProdutoWindow
+from ui.virtual_grid import GradeVirtual
 
 def get_fullscreen_setting():
     try:
@@ -70,19 +68,24 @@ class MainApplication(tk.Frame):
 
         self.cliente_selecionado = None
         self.vendedores_map = {}
-        self.cond_pag_map = {}
         self.total_orcamento = Decimal('0.0')
         self.desconto_aplicado = Decimal('0.0')
         self.percentual_desconto = Decimal('0.0')
         self.valor_final = Decimal('0.0')
-        self.itens_para_salvar = []
+        self.itens = ItemBatch()
         self.modo_edicao = False
+        self.orcamento_salvo = None
         self.janela_desconto_aberta = False
 
         self.create_widgets()
         self.setup_keyboard_shortcuts()
         self.novo_orcamento()
 
+        # Índices de busca em segundo plano, para estarem prontos na primeira consulta
+        busca_produtos.carregar_indice()
+        busca_clientes.carregar_indice()
+        busca_documentos.carregar_indice()
+
     def configurar_icone(self):
         try:
             if getattr(sys, 'frozen', False):
@@ -130,16 +133,42 @@ class MainApplication(tk.Frame):
         self.parent.bind('<Control-s>', lambda e: self.salvar_ou_atualizar_orcamento())
         self.parent.bind('<Control-p>', lambda e: self.gerar_pdf_se_disponivel())
         self.parent.bind('<Control-d>', lambda e: self.abrir_janela_desconto())
+        self.parent.bind('<Control-o>', lambda e: self.abrir_historico())
+        self.parent.bind('<Control-r>', lambda e: self.abrir_orcamentos_com_produto())
         self.parent.bind('<F9>', self.on_f9_search)
         self.parent.bind('<Escape>', self.on_escape_key)
         self.parent.bind('<Delete>', self.on_delete_key)
+        self.parent.bind('<Control-Shift-F12>', lambda e: self.abrir_diagnostico())
+        
+    def abrir_diagnostico(self):
+        DiagnosticoWindow(self.parent)
+
+    def abrir_historico(self):
+        HistoricoOrcamentosWindow(self.parent, self.carregar_orcamento_existente, list(self.vendedores_map.values()))
+
+    def abrir_orcamentos_com_produto(self):
+        # Parte do produto que está no campo de inclusão, se houver
+        OrcamentosComProdutoWindow(self.parent, self.carregar_orcamento_existente,
+                                   self.produto_codigo_entry.get().strip(), self.orcamentos_reajustados)
+
+    def orcamentos_reajustados(self, chaves):
+        """Recarrega o orçamento aberto se o reajuste o alterou: os itens na tela têm o preço
+        antigo e, atualizados, desfariam o reajuste."""
+        if not self.modo_edicao:
+            return
+        numero = self.numero_orcamento_var.get().strip()
+        if (numero, get_terminal_config()) in chaves:
+            messagebox.showinfo("Orçamento Reajustado",
+                                f"O orçamento nº {numero}, aberto na tela, teve o preço reajustado "
+                                "e será recarregado.")
+            self.carregar_orcamento_existente(numero)
         
     def gerar_pdf_se_disponivel(self):
         if not self.modo_edicao:
             messagebox.showinfo("Informação", "Salve o orçamento primeiro antes de gerar o PDF.")
             return
             
-        if not self.items_treeview.get_children():
+        if not len(self.itens):
             messagebox.showinfo("Informação", "Para gerar PDF, é necessário ter pelo menos um item no orçamento.")
             return
             
@@ -184,16 +213,16 @@ class MainApplication(tk.Frame):
             display_list = [f"{v['codigo']} - {v['nome']}" for v in vendedores]
             self.vendedores_map = {v['codigo']: v for v in vendedores}
 
-        condicoes = get_condicoes_pagamento()
-        if condicoes:
-            display_list = [f"{c['codigo']} - {c['descricao']}" for c in condicoes]
-            self.cond_pag_map = {c['codigo']: c for c in condicoes}
+        # As condições ficam na política (relidas quando vencem); aqui só a primeira leitura
+        politica_pagamento.condicoes()
     
     def open_search_cliente(self):
         SearchWindow(self.parent, self.on_cliente_selecionado)
 
     def on_cliente_selecionado(self, cliente_data):
         self.cliente_selecionado = cliente_data
+        if cliente_data.get('bk_cli', '1') != '1':
+            antecipar_exposicao_cliente(cliente_data['codigo'])
         self.cliente_var.set(f"{cliente_data['codigo']} - {cliente_data['nome']}")
         if self.focus_get() == self.cliente_entry:
             self.vendedor_entry.focus()
@@ -250,6 +279,7 @@ class MainApplication(tk.Frame):
         self.produto_qtd_entry.focus()
 
     def on_enter_codigo_produto(self, event):
+        inicio = iniciar_acao()
         codigo_produto = self.produto_codigo_entry.get().strip()
         
         if not codigo_produto:
@@ -257,9 +287,10 @@ class MainApplication(tk.Frame):
             return
             
         try:
-            produto = get_produto_por_codigo(codigo_produto.zfill(6))
+            produto = busca_produtos.produto(codigo_produto.zfill(6))
             if produto:
                 self.produto_qtd_entry.focus()
+                concluir_acao(self, 'codigo_produto_enter', inicio)
             else:
                 messagebox.showwarning("Atenção", f"Produto com código '{codigo_produto}' não encontrado.")
                 self.produto_codigo_entry.delete(0, 'end')
@@ -299,7 +330,8 @@ class MainApplication(tk.Frame):
                 self.vendedor_var.set("")
 
     def open_search_cond_pagamento(self):
-        CondicaoPagamentoSearchWindow(self.parent, self.on_cond_pag_selecionada)
+        tipo_cli = self.cliente_selecionado.get('tipo_cli', '1') if self.cliente_selecionado else None
+        CondicaoPagamentoSearchWindow(self.parent, self.on_cond_pag_selecionada, tipo_cli)
     
     def on_cond_pag_selecionada(self, cond_pag_data):
         self.cond_pag_var.set(f"{cond_pag_data['codigo']} - {cond_pag_data['descricao']}")
@@ -311,19 +343,21 @@ class MainApplication(tk.Frame):
             codigo = cond_pag_texto.split(' - ')[0] if ' - ' in cond_pag_texto else cond_pag_texto
             codigo = codigo.strip()
             
-            cond_pag = self.cond_pag_map.get(codigo)
-            
-            if not cond_pag and codigo.isdigit():
-                codigo_formatado = codigo.zfill(2)
-                cond_pag = self.cond_pag_map.get(codigo_formatado)
+            # Pela política, a cada uso: acha condição criada depois de aberto o sistema e
+            # recusa a que foi ocultada desde então
+            cond_pag = politica_pagamento.condicao(codigo)
             
-            if cond_pag:
+            if cond_pag and not cond_pag['oculta']:
                 self.cond_pag_var.set(f"{cond_pag['codigo']} - {cond_pag['descricao']}")
                 self.validar_compatibilidade_pagamento()
             else:
                 messagebox.showwarning("Atenção", f"Condição de pagamento com código '{codigo}' não encontrada.")
                 self.cond_pag_var.set("")
 
+    def _descricao_cond_pag(self, codigo, padrao=''):
+        cond_pag = politica_pagamento.condicao(codigo)
+        return cond_pag['descricao'] if cond_pag else padrao
+
     def validar_compatibilidade_pagamento(self):
         if not self.cliente_selecionado:
             return True
@@ -335,21 +369,8 @@ class MainApplication(tk.Frame):
         codigo = cond_pag_texto.split(' - ')[0] if ' - ' in cond_pag_texto else cond_pag_texto
         codigo = codigo.strip()
         
-        condicoes = get_condicoes_pagamento_detalhadas()
-        cond_pag_detalhada = None
-        
-        for cond in condicoes:
-            if cond['codigo'] == codigo or cond['codigo'] == codigo.zfill(2):
-                cond_pag_detalhada = cond
-                break
-        
-        if not cond_pag_detalhada:
-            return True
-        
         tipo_cli = self.cliente_selecionado.get('tipo_cli', '1')
-        vispra_cpg = cond_pag_detalhada.get('tipo_pagamento')
-        
-        is_valid, mensagem = validar_tipo_pagamento_permitido(tipo_cli, vispra_cpg)
+        is_valid, mensagem, cond_pag_detalhada = politica_pagamento.validar(tipo_cli, codigo)
         
         if not is_valid:
             messagebox.showerror(
@@ -393,15 +414,27 @@ class MainApplication(tk.Frame):
             print(f"⚠ BL_CLI não definido ou zero, validação de limite não aplicada")
             return True
         
-        total_orcamento = self.valor_final if hasattr(self, 'valor_final') else self.total_orcamento
-        
-        if total_orcamento > bl_cli:
+        # Tudo pelo valor sem desconto: é o que fica gravado em AI_NFA e soma a exposição
+        # dos outros orçamentos em aberto do cliente, que também consomem o limite
+        total_orcamento = self.total_orcamento
+        exposicao = get_exposicao_cliente(self.cliente_selecionado['codigo'])
+        em_aberto, quantidade = (exposicao['valor'], exposicao['orcamentos']) if exposicao else (Decimal('0.00'), 0)
+        if self.modo_edicao and self.orcamento_salvo and self.orcamento_salvo[0] == self.cliente_selecionado['codigo']:
+            em_aberto -= self.orcamento_salvo[1]
+            quantidade -= 1
+        if exposicao is None:
+            print("⚠ Orçamentos em aberto do cliente não consultados, limite conferido só com este orçamento")
+        comprometido = em_aberto + total_orcamento
+
+        if comprometido > bl_cli:
             mensagem = (
                 f"Valor do orçamento excede o limite de crédito do cliente!\n\n"
                 f"Cliente: {self.cliente_selecionado['nome']}\n"
                 f"Limite de Crédito: R$ {bl_cli:,.2f}\n"
+                f"Outros Orçamentos em Aberto: R$ {em_aberto:,.2f} ({quantidade})\n"
                 f"Valor do Orçamento: R$ {total_orcamento:,.2f}\n"
-                f"Excedente: R$ {(total_orcamento - bl_cli):,.2f}\n\n"
+                f"Excedente: R$ {(comprometido - bl_cli):,.2f}\n"
+                f"(valores dos orçamentos sem desconto)\n\n"
                 f"Digite a senha de liberação para autorizar:"
             )
             
@@ -431,6 +464,7 @@ class MainApplication(tk.Frame):
         return True
 
     def carregar_orcamento_existente(self, numero_nota):
+        inicio = iniciar_acao()
         cabecalho = get_orcamento_cabecalho(numero_nota)
         if not cabecalho:
             messagebox.showerror("Erro", f"Orçamento nº {numero_nota} não encontrado.")
@@ -458,6 +492,8 @@ class MainApplication(tk.Frame):
 
         self.novo_orcamento(limpar_combos=False)
         self.modo_edicao = True
+        # Já conta na exposição de crédito do cliente; a conferência ao salvar desconta
+        self.orcamento_salvo = (cabecalho['codigo_cliente'], cabecalho['valor_total'])
         self.save_button.config(text="Atualizar Orçamento (Ctrl+S)")
         
         self.numero_orcamento_var.set(numero_nota)
@@ -475,45 +511,33 @@ class MainApplication(tk.Frame):
         vendedor_display = f"{cabecalho['codigo_vendedor']} - {self.vendedores_map.get(cabecalho['codigo_vendedor'], {}).get('nome', '')}"
         self.vendedor_var.set(vendedor_display)
         
-        cond_pag_display = f"{cabecalho['codigo_cond_pag']} - {self.cond_pag_map.get(cabecalho['codigo_cond_pag'], {}).get('descricao', '')}"
+        cond_pag_display = f"{cabecalho['codigo_cond_pag']} - {self._descricao_cond_pag(cabecalho['codigo_cond_pag'])}"
         self.cond_pag_var.set(cond_pag_display)
 
         itens = get_orcamento_itens(numero_nota)
-        desconto_total = Decimal('0.0')
-        total_bruto = Decimal('0.0')
         for item in itens:
-            produto_info = get_produto_por_codigo(item['codigo'])
+            produto_info = busca_produtos.produto(item['codigo'])
             desconto_maximo = produto_info.get('desconto_maximo', Decimal('0.0')) if produto_info else Decimal('0.0')
-            
-            item_id = self.items_treeview.insert('', 'end', values=(
-                item['codigo'], item['descricao'],
-                f"{item['quantidade']:.2f}".replace('.',','), item['unidade'],
-                f"{item['preco']:.2f}".replace('.',','), f"{item['subtotal']:.2f}".replace('.',',')
+            self.itens.append(LinhaItem.de_valores(
+                item['codigo'], item['descricao'], item['unidade'], item['quantidade'], item['preco'],
+                item['custo'], desconto_maximo, item.get('desconto', Decimal('0.0'))
             ))
-            self.itens_para_salvar.append({
-                'id': item_id, 'codigo': item['codigo'], 'quantidade': item['quantidade'],
-                'valor_unitario': item['preco'], 'custo': item['custo'],
-                'subtotal': item['subtotal'], 'descricao': item['descricao'], 'unidade': item['unidade'],
-                'desconto_maximo': desconto_maximo
-            })
-            total_bruto += item['subtotal']
-            if 'desconto' in item:
-                desconto_total += item['desconto']
-        
-        if desconto_total > 0:
-            self.desconto_aplicado = desconto_total
-            if total_bruto > 0:
-                self.percentual_desconto = (desconto_total / total_bruto) * 100
-            else:
-                self.percentual_desconto = Decimal('0.0')
+        self.grade_itens.atualizar()
+
+        desconto_centavos = self.itens.desconto_total_centavos
+        if desconto_centavos > 0:
+            self.desconto_aplicado = de_centavos(desconto_centavos)
+            self.percentual_desconto = percentual(desconto_centavos, self.itens.total_centavos)
         
         self.atualizar_total()
         
         self.atualizar_visibilidade_botao_pdf()
+        concluir_acao(self, 'carregar_orcamento', inicio)
 
     def adicionar_item(self, event=None):
+        inicio = iniciar_acao()
         cod_produto_raw = self.produto_codigo_entry.get().strip()
-        qtd_str = self.produto_qtd_entry.get().replace(',', '.').strip()
+        qtd_str = self.produto_qtd_entry.get().strip()
 
         if not cod_produto_raw or not qtd_str:
             messagebox.showwarning("Atenção", "Preencha o código do produto e a quantidade.")
@@ -526,7 +550,7 @@ class MainApplication(tk.Frame):
         cod_produto = cod_produto_raw.zfill(6)
 
         try:
-            quantidade = Decimal(qtd_str)
+            quantidade = interpretar(qtd_str)
             if quantidade <= 0:
                 raise ValueError("Quantidade deve ser maior que zero")
         except (InvalidOperation, ValueError) as e:
@@ -536,7 +560,7 @@ class MainApplication(tk.Frame):
             return
 
         try:
-            produto = get_produto_por_codigo(cod_produto)
+            produto = busca_produtos.produto(cod_produto)
             if not produto:
                 messagebox.showerror("Erro", f"Produto com o código '{cod_produto}' não encontrado.")
                 self.produto_codigo_entry.delete(0, 'end')
@@ -547,28 +571,8 @@ class MainApplication(tk.Frame):
             self.produto_codigo_entry.focus()
             return
 
-        subtotal = quantidade * produto['preco']
-        
-        item_id = self.items_treeview.insert('', 'end', values=(
-            produto['codigo'],
-            produto['descricao'],
-            f"{quantidade:.2f}".replace('.',','),
-            produto['unidade'],
-            f"{produto['preco']:.2f}".replace('.',','),
-            f"{subtotal:.2f}".replace('.',',')
-        ))
-
-        self.itens_para_salvar.append({
-            'id': item_id,
-            'codigo': produto['codigo'],
-            'quantidade': quantidade,
-            'valor_unitario': produto['preco'],
-            'custo': produto['custo'],
-            'subtotal': subtotal,
-            'descricao': produto['descricao'],
-            'unidade': produto['unidade'],
-            'desconto_maximo': produto.get('desconto_maximo', Decimal('0.0'))
-        })
+        chave = self.itens.append(LinhaItem.de_produto(produto, quantidade))
+        self.grade_itens.mostrar(chave)
 
         self.produto_codigo_entry.delete(0, 'end')
         self.produto_qtd_entry.delete(0, 'end')
@@ -576,22 +580,31 @@ class MainApplication(tk.Frame):
         self.atualizar_total()
         
         self.atualizar_visibilidade_botao_pdf()
+        concluir_acao(self, 'adicionar_item', inicio)
+
+    @property
+    def itens_para_salvar(self):
+        """Itens como sequência de registros com as chaves usadas por DescontoWindow e pelo PDF."""
+        return self.itens.visao_pdf()
+
+    def formatar_linha_item(self, chave):
+        return (
+            self.itens.codigos[chave], self.itens.descricoes[chave],
+            formatar_numero(Decimal(self.itens.quantidades[chave]) / ESCALA_QUANTIDADE), self.itens.unidades[chave],
+            formatar_numero(de_centavos(self.itens.precos[chave])), formatar_numero(de_centavos(self.itens.subtotais[chave]))
+        )
 
     def atualizar_total(self):
-        self.total_orcamento = Decimal('0.0')
-        for item_id in self.items_treeview.get_children():
-            subtotal_str = self.items_treeview.item(item_id)['values'][5].replace(',', '.')
-            self.total_orcamento += Decimal(subtotal_str)
-        
-        self.valor_final = self.total_orcamento - self.desconto_aplicado
+        total_centavos = self.itens.total_centavos
+        self.total_orcamento = de_centavos(total_centavos)
+        self.valor_final = de_centavos(total_centavos - para_centavos(self.desconto_aplicado))
         
         if self.desconto_aplicado > 0:
-            total_text = f"TOTAL: R$ {self.total_orcamento:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            desconto_text = f" - Desconto: R$ {self.desconto_aplicado:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            final_text = f" = FINAL: R$ {self.valor_final:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-            self.total_var.set(total_text + desconto_text + final_text)
+            self.total_var.set(f"TOTAL: {formatar_moeda(self.total_orcamento)}"
+                               f" - Desconto: {formatar_moeda(self.desconto_aplicado)}"
+                               f" = FINAL: {formatar_moeda(self.valor_final)}")
         else:
-            self.total_var.set(f"TOTAL: R$ {self.total_orcamento:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.'))
+            self.total_var.set(f"TOTAL: {formatar_moeda(self.total_orcamento)}")
     
     def abrir_janela_desconto(self):
         if self.janela_desconto_aberta:
@@ -606,7 +619,7 @@ class MainApplication(tk.Frame):
         
         DescontoWindow(
             self.parent, 
-            float(self.total_orcamento), 
+            self.total_orcamento, 
             self.aplicar_desconto_callback,
             self.itens_para_salvar,
             self.resetar_flag_desconto
@@ -616,86 +629,46 @@ class MainApplication(tk.Frame):
         self.janela_desconto_aberta = False
     
     def validar_e_distribuir_desconto(self, percentual_desconto):
-        if not self.itens_para_salvar:
+        if not len(self.itens):
             return False, "Não há itens no orçamento", Decimal('0.0'), []
-        
-        desconto_total_desejado = (self.total_orcamento * percentual_desconto) / Decimal('100')
-        desconto_por_item = []
-        desconto_aplicado_total = Decimal('0.0')
-        
-        for item in self.itens_para_salvar:
-            proporcao = item['subtotal'] / self.total_orcamento if self.total_orcamento > 0 else Decimal('0')
-            desconto_desejado = desconto_total_desejado * proporcao
-            
-            desconto_max_item = item.get('desconto_maximo', Decimal('0.0'))
-            desconto_max_valor = (item['subtotal'] * desconto_max_item) / Decimal('100') if desconto_max_item > 0 else item['subtotal']
-            
-            desconto_item = min(desconto_desejado, desconto_max_valor)
-            
-            desconto_por_item.append({
-                'item': item,
-                'desconto_aplicado': desconto_item,
-                'desconto_maximo_valor': desconto_max_valor,
-                'pode_mais': desconto_item < desconto_max_valor
-            })
-            desconto_aplicado_total += desconto_item
-        
-        desconto_faltante = desconto_total_desejado - desconto_aplicado_total
-        
-        if desconto_faltante > Decimal('0.01'):
-            itens_com_margem = [d for d in desconto_por_item if d['pode_mais']]
-            
-            if not itens_com_margem:
-                percentual_real = (desconto_aplicado_total / self.total_orcamento * 100) if self.total_orcamento > 0 else Decimal('0')
-                return False, (
-                    f"Não é possível aplicar {percentual_desconto:.1f}% de desconto.\\n\\n"
-                    f"Alguns produtos têm limite inferior a esse percentual.\\n"
-                    f"Desconto máximo possível: {percentual_real:.2f}%\\n\\n"
-                    f"Detalhes dos limites por produto:\\n" +
-                    "\\n".join([
-                        f"• {d['item']['descricao'][:30]}: máx {d['item'].get('desconto_maximo', 0):.1f}%"
-                        for d in desconto_por_item
-                    ])
-                ), desconto_aplicado_total, desconto_por_item
-            
-            while desconto_faltante > Decimal('0.01') and itens_com_margem:
-                margem_total = sum(d['desconto_maximo_valor'] - d['desconto_aplicado'] for d in itens_com_margem)
-                
-                if margem_total <= Decimal('0'):
-                    break
-                
-                for d in itens_com_margem[:]:
-                    margem_disponivel = d['desconto_maximo_valor'] - d['desconto_aplicado']
-                    if margem_disponivel <= Decimal('0.01'):
-                        itens_com_margem.remove(d)
-                        continue
-                    
-                    proporcao_margem = margem_disponivel / margem_total if margem_total > 0 else Decimal('0')
-                    desconto_adicional = min(desconto_faltante * proporcao_margem, margem_disponivel)
-                    
-                    d['desconto_aplicado'] += desconto_adicional
-                    desconto_aplicado_total += desconto_adicional
-                    desconto_faltante -= desconto_adicional
-                    
-                    d['pode_mais'] = d['desconto_aplicado'] < d['desconto_maximo_valor']
-                    
-                    if desconto_faltante <= Decimal('0.01'):
-                        break
-        
-        if abs(desconto_aplicado_total - desconto_total_desejado) > Decimal('0.50'):
+
+        limites = self.itens.limites_desconto()
+        desconto_desejado = para_centavos(self.total_orcamento * percentual_desconto / Decimal('100'))
+
+        descontos, aplicado = ratear_desconto(self.itens.subtotais.tolist(), limites, desconto_desejado)
+        desconto_aplicado_total = de_centavos(aplicado)
+        desconto_por_item = [{
+            'item': self.itens.linha_visao(chave),
+            'desconto_aplicado': de_centavos(descontos[chave]),
+            'desconto_maximo_valor': de_centavos(limites[chave]),
+            'pode_mais': descontos[chave] < limites[chave]
+        } for chave in self.itens.chaves()]
+
+        if aplicado < desconto_desejado:
             percentual_real = (desconto_aplicado_total / self.total_orcamento * 100) if self.total_orcamento > 0 else Decimal('0')
             return False, (
-                f"Desconto de {percentual_desconto:.1f}% excede o limite de alguns produtos.\\n\\n"
-                f"Desconto máximo aplicável: {percentual_real:.2f}% (R$ {desconto_aplicado_total:.2f})\\n\\n"
-                "Deseja aplicar este desconto reduzido?"
+                f"Não é possível aplicar {percentual_desconto:.1f}% de desconto.\\n\\n"
+                f"Alguns produtos têm limite inferior a esse percentual.\\n"
+                f"Desconto máximo possível: {percentual_real:.2f}%\\n\\n"
+                f"Detalhes dos limites por produto:\\n" +
+                "\\n".join([
+                    f"• {d['item']['descricao'][:30]}: máx {d['item'].get('desconto_maximo', 0):.1f}%"
+                    for d in desconto_por_item
+                ])
             ), desconto_aplicado_total, desconto_por_item
-        
+
         return True, "Desconto validado com sucesso", desconto_aplicado_total, desconto_por_item
     
+    def ratear_desconto_itens(self):
+        """Preenche o desconto de cada item, somando exatamente o desconto do orçamento."""
+        desconto = para_centavos(self.desconto_aplicado)
+        if self.itens.ratear_desconto(desconto) < desconto:
+            # Desconto acima dos limites dos produtos só chega aqui liberado por senha
+            self.itens.ratear_desconto(desconto, respeitar_limites=False)
+
     def aplicar_desconto_callback(self, valor_desconto, percentual, valor_final):
-        self.desconto_aplicado = Decimal(str(valor_desconto))
-        self.percentual_desconto = Decimal(str(percentual))
-        self.valor_final = Decimal(str(valor_final))
+        self.desconto_aplicado = arredondar(valor_desconto)
+        self.percentual_desconto = percentual
         self.atualizar_total()
     
     def limpar_desconto(self):
@@ -705,8 +678,8 @@ class MainApplication(tk.Frame):
         self.atualizar_total()
     
     def excluir_item_selecionado(self):
-        selected_item = self.items_treeview.selection()
-        if not selected_item:
+        chave = self.grade_itens.chave_selecionada
+        if chave is None or chave not in self.itens:
             messagebox.showinfo("Informação", "Selecione um item para excluir.")
             return
         
@@ -720,8 +693,7 @@ class MainApplication(tk.Frame):
             )
             return
         
-        item_id = selected_item[0]
-        item_values = self.items_treeview.item(item_id)['values']
+        item_values = self.formatar_linha_item(chave)
         codigo = item_values[0]
         descricao = item_values[1]
         quantidade = item_values[2]
@@ -740,9 +712,9 @@ class MainApplication(tk.Frame):
         if not resposta:
             return
         
-        self.items_treeview.delete(item_id)
-        
-        self.itens_para_salvar = [item for item in self.itens_para_salvar if item['id'] != item_id]
+        self.itens.remover(chave)
+        self.grade_itens.chave_selecionada = None
+        self.grade_itens.atualizar()
         
         self.atualizar_total()
         
@@ -751,10 +723,9 @@ class MainApplication(tk.Frame):
         self.produto_codigo_entry.focus()
     
     def on_treeview_right_click(self, event):
-        item_id = self.items_treeview.identify_row(event.y)
-        if item_id:
-            self.items_treeview.selection_set(item_id)
-            self.items_treeview.focus(item_id)
+        chave = self.grade_itens.chave_na_faixa(event.y)
+        if chave is not None:
+            self.grade_itens.selecionar(chave)
             
             context_menu = tk.Menu(self.parent, tearoff=0)
             context_menu.add_command(label="Excluir Item", command=self.excluir_item_selecionado)
@@ -765,77 +736,57 @@ class MainApplication(tk.Frame):
                 context_menu.grab_release()
 
     def on_treeview_double_click(self, event):
-        region = self.items_treeview.identify_region(event.x, event.y)
+        tree = self.grade_itens.tree
+        region = tree.identify_region(event.x, event.y)
         if region != "cell":
             return
 
-        column = self.items_treeview.identify_column(event.x)
+        column = tree.identify_column(event.x)
         if column not in ('#3', '#5'):
             return
 
-        item_id = self.items_treeview.focus()
-        x, y, width, height = self.items_treeview.bbox(item_id, column)
-        entry = ttk.Entry(self.items_treeview)
+        chave = self.grade_itens.chave_na_faixa(event.y)
+        caixa = self.grade_itens.bbox(chave, column) if chave is not None else None
+        if not caixa:
+            return
+        x, y, width, height = caixa
+        entry = ttk.Entry(tree)
         entry.place(x=x, y=y, width=width, height=height)
         
         col_index = int(column.replace('#', '')) - 1
-        current_value = self.items_treeview.item(item_id, 'values')[col_index]
+        current_value = self.formatar_linha_item(chave)[col_index]
         entry.insert(0, current_value)
         entry.focus()
 
         if column == '#5':
-            entry.bind("<Return>", lambda e, i=item_id: self.save_cell_edit(e, i, 'price'))
+            entry.bind("<Return>", lambda e, c=chave: self.save_cell_edit(e, c, 'price'))
         elif column == '#3':
-            entry.bind("<Return>", lambda e, i=item_id: self.save_cell_edit(e, i, 'quantity'))
+            entry.bind("<Return>", lambda e, c=chave: self.save_cell_edit(e, c, 'quantity'))
         
         entry.bind("<FocusOut>", lambda e: e.widget.destroy())
 
-    def save_cell_edit(self, event, item_id, edit_type):
+    def save_cell_edit(self, event, chave, edit_type):
         entry = event.widget
-        new_value_str = entry.get().replace(',', '.')
-
         try:
-            new_value = Decimal(new_value_str)
+            new_value = interpretar(entry.get())
             if new_value < 0: raise ValueError
         except (InvalidOperation, ValueError):
             messagebox.showerror("Erro", "Valor inválido.")
             entry.destroy()
             return
 
-        current_values = list(self.items_treeview.item(item_id, 'values'))
-        new_price = Decimal('0.0')
-        new_quantity = Decimal('0.0')
-        new_subtotal = Decimal('0.0')
-        
         if edit_type == 'price':
-            quantity = Decimal(current_values[2].replace(',', '.'))
-            new_price = new_value
-            new_subtotal = new_price * quantity
-            current_values[4] = f"{new_price:.2f}".replace('.', ',')
-            current_values[5] = f"{new_subtotal:.2f}".replace('.', ',')
+            self.itens.definir_preco(chave, new_value)
         elif edit_type == 'quantity':
-            price = Decimal(current_values[4].replace(',', '.'))
-            new_quantity = new_value
-            new_subtotal = price * new_quantity
-            current_values[2] = f"{new_quantity:.2f}".replace('.', ',')
-            current_values[5] = f"{new_subtotal:.2f}".replace('.', ',')
-        
-        self.items_treeview.item(item_id, values=tuple(current_values))
-        
-        for item in self.itens_para_salvar:
-            if item['id'] == item_id:
-                if edit_type == 'price':
-                    item['valor_unitario'] = new_price
-                elif edit_type == 'quantity':
-                    item['quantidade'] = new_quantity
-                item['subtotal'] = new_subtotal
-                break
+            self.itens.definir_quantidade(chave, new_value)
         
+        self.grade_itens.atualizar_linha(chave)
         entry.destroy()
         self.atualizar_total()
 
     def salvar_ou_atualizar_orcamento(self):
-        if not self.items_treeview.get_children():
+        inicio = iniciar_acao()
+        if not len(self.itens):
             messagebox.showwarning("Atenção", "Adicione pelo menos um item ao orçamento.")
             return
 
@@ -847,7 +798,7 @@ class MainApplication(tk.Frame):
             try:
                 cond_pag_selecionada_str = self.cond_pag_var.get()
                 cod_cond_pag = cond_pag_selecionada_str.split(' - ')[0]
-                permite_sem_cliente = condicao_permite_sem_cliente(cod_cond_pag)
+                permite_sem_cliente = politica_pagamento.permite_sem_cliente(cod_cond_pag)
                 
                 if not permite_sem_cliente:
                     messagebox.showerror(
@@ -927,32 +878,15 @@ class MainApplication(tk.Frame):
             valor_total=self.total_orcamento
         )
 
-        itens_list = []
-        for i, item_data in enumerate(self.itens_para_salvar):
-            desconto_item = Decimal('0.0')
-            if self.desconto_aplicado > 0 and self.total_orcamento > 0:
-                proporcao = item_data['subtotal'] / self.total_orcamento
-                desconto_item = self.desconto_aplicado * proporcao
-            
-            item_obj = ItemOrcamento(
-                numero_nota=numero_nota,
-                sequencia=i + 1,
-                codigo_produto=item_data['codigo'],
-                quantidade=item_data['quantidade'],
-                valor_unitario=item_data['valor_unitario'],
-                deposito=get_deposito_config(),
-                valor_desconto=desconto_item,
-                total_bruto_item=item_data['subtotal'],
-                custo=item_data['custo']
-            )
-            itens_list.append(item_obj)
+        self.ratear_desconto_itens()
         
         if self.modo_edicao:
-            sucesso, mensagem = atualizar_orcamento(orcamento_obj, itens_list)
+            sucesso, mensagem = atualizar_orcamento(orcamento_obj, self.itens)
         else:
-            sucesso, mensagem = salvar_orcamento(orcamento_obj, itens_list)
+            sucesso, mensagem = salvar_orcamento(orcamento_obj, self.itens)
 
         if sucesso:
+            medir_acao('salvar_orcamento', inicio)
             imprimir = messagebox.askyesno(
                 "Orçamento Salvo",
                 f"{mensagem}\n\nDeseja gerar o PDF do orçamento agora?",
@@ -1018,10 +952,10 @@ class MainApplication(tk.Frame):
                     'unidade': item['unidade']
                 })
             
-            cond_pag_descricao = self.cond_pag_map.get(cabecalho['codigo_cond_pag'], {}).get('descricao', 'Não informado')
+            cond_pag_descricao = self._descricao_cond_pag(cabecalho['codigo_cond_pag'], 'Não informado')
             
-            desconto_total = sum(item.get('desconto', 0) for item in itens)
-            valor_final = sum(item['subtotal'] for item in itens) - desconto_total
+            desconto_total = de_centavos(sum(para_centavos(item.get('desconto', 0)) for item in itens))
+            valor_final = de_centavos(sum(para_centavos(item['subtotal']) for item in itens)) - desconto_total
             
             orcamento_obj = Orcamento(
                 numero_nota=numero_nota,
@@ -1029,7 +963,7 @@ class MainApplication(tk.Frame):
                 codigo_vendedor=cabecalho['codigo_vendedor'],
                 codigo_cond_pag=cabecalho['codigo_cond_pag'],
                 data_emissao=cabecalho.get('data_emissao', datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)),
-                valor_total=Decimal(str(valor_final))
+                valor_total=valor_final
             )
 
             gerar_pdf_orcamento(orcamento_obj, itens_para_pdf, cliente, vendedor_obj, f"{cabecalho['codigo_cond_pag']} - {cond_pag_descricao}", float(desconto_total), float(valor_final))
@@ -1043,7 +977,7 @@ class MainApplication(tk.Frame):
             messagebox.showwarning("Atenção", "Este orçamento ainda não foi salvo. Salve primeiro antes de gerar o PDF.")
             return
             
-        if not self.items_treeview.get_children():
+        if not len(self.itens):
             messagebox.showwarning("Atenção", "Não há itens no orçamento.")
             return
         
@@ -1087,16 +1021,15 @@ class MainApplication(tk.Frame):
             messagebox.showerror("Erro", f"Erro ao gerar PDF: {e}")
 
     def atualizar_visibilidade_botao_pdf(self):
-        if self.modo_edicao and self.items_treeview.get_children():
+        if self.modo_edicao and len(self.itens):
             self.pdf_button.pack(side="right", padx=5, before=self.save_button)
         else:
             self.pdf_button.pack_forget()
 
     def novo_orcamento(self, limpar_combos=True):
-        for i in self.items_treeview.get_children():
-            self.items_treeview.delete(i)
-        
-        self.itens_para_salvar.clear()
+        self.itens.limpar()
+        self.grade_itens.chave_selecionada = None
+        self.grade_itens.atualizar()
         self.cliente_var.set("")
         self.vendedor_var.set("")
         self.cond_pag_var.set("")
@@ -1117,6 +1050,7 @@ class MainApplication(tk.Frame):
         self.atualizar_visibilidade_botao_pdf()
         
         self.orcamento_status = None
+        self.orcamento_salvo = None
 
     def create_widgets(self):
         header_frame = ttk.LabelFrame(self.parent, text="Dados do Orçamento", padding=(10, 5))
@@ -1197,26 +1131,19 @@ class MainApplication(tk.Frame):
         self.add_button = ttk.Button(add_item_frame, text="Adicionar Item", command=self.adicionar_item)
         self.add_button.pack(side='left', padx=10)
 
-        columns = ('cod', 'desc', 'qtd', 'un', 'vlr_unit', 'vlr_total')
-        self.items_treeview = ttk.Treeview(items_frame, columns=columns, show='headings')
-        self.items_treeview.bind("<Double-1>", self.on_treeview_double_click)
-        self.items_treeview.bind("<Button-3>", self.on_treeview_right_click)
-        
-        self.items_treeview.heading('cod', text='Código')
-        self.items_treeview.heading('desc', text='Descrição')
-        self.items_treeview.heading('qtd', text='Qtd.')
-        self.items_treeview.heading('un', text='UN')
-        self.items_treeview.heading('vlr_unit', text='Vlr. Unitário')
-        self.items_treeview.heading('vlr_total', text='Vlr. Total')
-
-        self.items_treeview.column('cod', width=80, anchor='center')
-        self.items_treeview.column('desc', width=300)
-        self.items_treeview.column('qtd', width=80, anchor='e')
-        self.items_treeview.column('un', width=50, anchor='center')
-        self.items_treeview.column('vlr_unit', width=100, anchor='e')
-        self.items_treeview.column('vlr_total', width=100, anchor='e')
-        
-        self.items_treeview.pack(expand=True, fill='both')
+        colunas = [
+            ('cod', 'Código', 80, 'center'),
+            ('desc', 'Descrição', 300, 'w'),
+            ('qtd', 'Qtd.', 80, 'e'),
+            ('un', 'UN', 50, 'center'),
+            ('vlr_unit', 'Vlr. Unitário', 100, 'e'),
+            ('vlr_total', 'Vlr. Total', 100, 'e'),
+        ]
+        self.grade_itens = GradeVirtual(items_frame, colunas, self.formatar_linha_item)
+        self.grade_itens.tree.bind("<Double-1>", self.on_treeview_double_click)
+        self.grade_itens.tree.bind("<Button-3>", self.on_treeview_right_click)
+        self.grade_itens.pack(expand=True, fill='both')
+        self.grade_itens.definir_lote(self.itens)
 
         footer_frame = ttk.Frame(self.parent, padding=(10, 5))
         footer_frame.pack(side="bottom", fill="x", padx=10, pady=5)
@@ -1241,3 +1168,10 @@ class MainApplication(tk.Frame):
 
         new_button = ttk.Button(footer_frame, text="Novo Orçamento (Ctrl+N)", command=self.novo_orcamento)
         new_button.pack(side="right")
+
+        historico_button = ttk.Button(footer_frame, text="Histórico (Ctrl+O)", command=self.abrir_historico)
+        historico_button.pack(side="right", padx=5)
+
+        reajuste_button = ttk.Button(footer_frame, text="Orçamentos com Produto (Ctrl+R)",
+                                     command=self.abrir_orcamentos_com_produto)
+        reajuste_button.pack(side="right", padx=5)
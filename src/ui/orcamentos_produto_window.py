@@ -0,0 +1,234 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from decimal import InvalidOperation
+from database import buscar_orcamentos_com_produto, reajustar_preco_orcamentos, get_terminal_config
+from dinheiro import formatar_moeda, formatar_numero, interpretar
+from metrics import iniciar_acao, concluir_acao
+from busca import ConsultaEmSegundoPlano, ResultadosPaginados
+from ui.product_search_window import ProductSearchWindow, busca_produtos
+from ui.virtual_grid import GradeVirtual
+
+INTERVALO_CONSULTA_MS = 20
+
+class OrcamentosComProdutoWindow(tk.Toplevel):
+    """Orçamentos em aberto, de todos os terminais, que contêm um produto.
+
+    Cada orçamento mostra o preço do produto nele e se difere do preço atual do
+    cadastro; o reajuste troca o preço em todos os listados de uma vez e então chama
+    ao_reajustar(chaves) com as chaves (número, terminal) deles. Abrir um orçamento
+    deste terminal chama callback(numero).
+    """
+
+    def __init__(self, parent, callback, codigo_produto='', ao_reajustar=None):
+        inicio = iniciar_acao()
+        super().__init__(parent)
+        self.title("Orçamentos em Aberto com o Produto")
+        self.geometry("900x460")
+        self.callback = callback
+        self.ao_reajustar = ao_reajustar
+        self.terminal = get_terminal_config()
+
+        self.transient(parent)
+        self.grab_set()
+
+        self.resultados = ResultadosPaginados.de_lista([], 'chave')
+        self.consulta = None
+        self.produto = None
+
+        self.create_widgets()
+        if codigo_produto:
+            self.produto_entry.insert(0, codigo_produto)
+            self.buscar()
+
+        self.center_window()
+
+        self.after(100, lambda: self.produto_entry.focus_set())
+        concluir_acao(self, 'abrir_orcamentos_com_produto', inicio)
+
+    def center_window(self):
+        """Centraliza a janela na tela"""
+        self.update_idletasks()
+        width = self.winfo_width()
+        height = self.winfo_height()
+        x = (self.winfo_screenwidth() - width) // 2
+        y = (self.winfo_screenheight() - height) // 2
+        self.geometry(f"+{x}+{y}")
+
+    def create_widgets(self):
+        produto_frame = ttk.Frame(self, padding=(10, 5))
+        produto_frame.pack(fill='x')
+
+        ttk.Label(produto_frame, text="Produto:").pack(side='left', padx=(0, 5))
+        self.produto_entry = ttk.Entry(produto_frame, width=12)
+        self.produto_entry.pack(side='left')
+        self.produto_entry.bind("<Return>", self.buscar)
+        self.produto_entry.bind("<Down>", self.move_to_list)
+        ttk.Button(produto_frame, text="...", width=3, command=self.buscar_produto).pack(side='left', padx=5)
+
+        self.produto_var = tk.StringVar()
+        ttk.Label(produto_frame, textvariable=self.produto_var).pack(side='left', padx=5)
+
+        self.bind("<Escape>", lambda e: self.destroy())
+
+        colunas = [
+            ('terminal', 'Tr.', 40, 'center'),
+            ('numero', 'Número', 70, 'w'),
+            ('data', 'Data', 80, 'center'),
+            ('cliente', 'Cliente', 250, 'w'),
+            ('quantidade', 'Qtde', 70, 'e'),
+            ('preco', 'Preço no Orçamento', 120, 'e'),
+            ('cadastro', 'Cadastro', 80, 'center'),
+            ('valor', 'Valor Orçamento', 110, 'e'),
+        ]
+        self.lista = GradeVirtual(self, colunas, self.formatar_linha)
+        self.lista.pack(expand=True, fill='both', padx=10, pady=5)
+        self.lista.tree.bind("<Double-1>", self.on_select)
+        self.lista.tree.bind("<Return>", self.on_select)
+
+        footer_frame = ttk.Frame(self, padding=(10, 5))
+        footer_frame.pack(fill='x')
+
+        ttk.Button(footer_frame, text="Abrir", command=self.on_select).pack(side='right')
+        self.reajustar_button = ttk.Button(footer_frame, text="Reajustar em Todos", command=self.reajustar,
+                                           state='disabled')
+        self.reajustar_button.pack(side='right', padx=5)
+        self.novo_preco_entry = ttk.Entry(footer_frame, width=12)
+        self.novo_preco_entry.pack(side='right')
+        ttk.Label(footer_frame, text="Novo preço:").pack(side='right', padx=(10, 5))
+
+        self.status_var = tk.StringVar()
+        ttk.Label(footer_frame, textvariable=self.status_var, foreground='gray').pack(side='left')
+
+    def buscar_produto(self):
+        janela = ProductSearchWindow(self, self.on_produto_selecionado)
+        # A busca toma o foco exclusivo; ao fechar, ele volta para esta janela
+        self.wait_window(janela)
+        if self.winfo_exists():
+            self.grab_set()
+
+    def on_produto_selecionado(self, produto):
+        self.produto_entry.delete(0, 'end')
+        self.produto_entry.insert(0, produto['codigo'])
+        self.buscar()
+
+    def move_to_list(self, event):
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
+            self.lista.tree.focus_set()
+
+    def buscar(self, event=None):
+        """Lista os orçamentos em aberto com o produto; a consulta roda numa thread."""
+        inicio = iniciar_acao()
+        codigo = self.produto_entry.get().strip()
+        if not codigo:
+            return
+        codigo = codigo.zfill(6) if codigo.isdigit() else codigo
+
+        produto = busca_produtos.produto(codigo)
+        if self.consulta is not None:
+            self.consulta.cancelar()
+            self.consulta = None
+        # Até chegar a lista do novo produto, o reajuste valeria para a lista anterior
+        self.reajustar_button.config(state='disabled')
+        if not produto:
+            self.produto = None
+            self.produto_var.set("")
+            self.status_var.set(f"Produto '{codigo}' não encontrado.")
+            self.resultados = ResultadosPaginados.de_lista([], 'chave')
+            self.lista.definir_lote(self.resultados)
+            return
+        self.produto_var.set(f"{produto['descricao']} - preço atual {formatar_moeda(produto['preco'])}")
+        self.novo_preco_entry.delete(0, 'end')
+        self.novo_preco_entry.insert(0, formatar_numero(produto['preco']))
+
+        self.status_var.set("Buscando...")
+        self.consulta = ConsultaEmSegundoPlano(
+            lambda: ResultadosPaginados.de_lista(buscar_orcamentos_com_produto(codigo), 'chave'))
+        self.aguardar_consulta(self.consulta, produto, inicio)
+
+    def aguardar_consulta(self, consulta, produto, inicio):
+        if consulta is not self.consulta:
+            return
+        if not consulta.concluida:
+            self.after(INTERVALO_CONSULTA_MS, lambda: self.aguardar_consulta(consulta, produto, inicio))
+            return
+        self.consulta = None
+
+        if consulta.resultados is None:
+            self.status_var.set("A consulta demorou demais; tente novamente.")
+            return
+        # O produto muda junto com a lista: o reajuste usa sempre os dois da mesma busca
+        self.produto = produto
+        self.resultados = consulta.resultados
+        self.lista.definir_lote(self.resultados)
+        self.lista.selecionar_primeira()
+
+        diferentes = sum(1 for orcamento in self.resultados.registros if self._preco_diferente(orcamento))
+        self.status_var.set(f"{len(self.resultados)} orçamento(s) em aberto; {diferentes} com preço diferente do atual.")
+        self.reajustar_button.config(state='normal' if len(self.resultados) else 'disabled')
+        concluir_acao(self, 'orcamentos_com_produto_buscar', inicio)
+
+    def _preco_diferente(self, orcamento):
+        return self.produto is not None and orcamento['preco'] != self.produto['preco']
+
+    def formatar_linha(self, chave):
+        orcamento = self.resultados.registro(chave)
+        data = orcamento['data']
+        return (orcamento['terminal'], orcamento['numero'],
+                data.strftime("%d/%m/%Y") if hasattr(data, 'strftime') else (data or ''),
+                f"{orcamento['codigo_cliente']} - {orcamento['cliente']}" if orcamento['codigo_cliente'] else '',
+                formatar_numero(orcamento['quantidade']),
+                formatar_moeda(orcamento['preco']),
+                "Diferente" if self._preco_diferente(orcamento) else "Igual",
+                formatar_moeda(orcamento['valor_total']))
+
+    def reajustar(self):
+        if self.produto is None or not len(self.resultados):
+            return
+        try:
+            novo_preco = interpretar(self.novo_preco_entry.get())
+            if novo_preco <= 0:
+                raise ValueError("Preço deve ser maior que zero")
+        except (InvalidOperation, ValueError):
+            messagebox.showerror("Erro", "Preço inválido.", parent=self)
+            self.novo_preco_entry.focus()
+            return
+
+        quantidade = len(self.resultados)
+        if not messagebox.askyesno(
+            "Reajustar Preço",
+            f"Trocar o preço do produto {self.produto['codigo']} para {formatar_moeda(novo_preco)} "
+            f"em {quantidade} orçamento(s) em aberto?\n\n"
+            "O desconto de cada item acompanha o novo preço e o valor dos orçamentos é recalculado.",
+            parent=self
+        ):
+            return
+
+        inicio = iniciar_acao()
+        sucesso, mensagem = reajustar_preco_orcamentos(self.produto['codigo'], novo_preco, self.resultados.registros)
+        concluir_acao(self, 'reajustar_preco_orcamentos', inicio)
+        if sucesso:
+            messagebox.showinfo("Reajuste", mensagem, parent=self)
+            if self.ao_reajustar:
+                self.ao_reajustar([orcamento['chave'] for orcamento in self.resultados.registros])
+            self.buscar()
+        else:
+            messagebox.showerror("Erro", mensagem, parent=self)
+
+    def on_select(self, event=None):
+        chave = self.lista.chave_selecionada
+        if chave is None or chave not in self.resultados:
+            return
+        numero, terminal = chave
+        if terminal != self.terminal:
+            messagebox.showinfo("Outro Terminal", f"O orçamento {numero} é do terminal {terminal}; "
+                                "abra-o naquele terminal.", parent=self)
+            return
+        self.callback(numero)
+        self.after_idle(self.destroy)
+
+    def destroy(self):
+        if self.consulta is not None:
+            self.consulta.cancelar()
+            self.consulta = None
+        super().destroy()
@@ -1,9 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
-from database import buscar_produtos
+from database import buscar_produtos, get_sincronizacao_catalogo_config
+from metrics import iniciar_acao, concluir_acao
+from dinheiro import formatar_numero
+from busca import ConsultaEmSegundoPlano, BuscaCatalogo, ResultadosPaginados
+from catalogo import SincronizadorCatalogo
+from ui.virtual_grid import GradeVirtual
+
+busca_produtos = BuscaCatalogo('busca_produtos', buscar_produtos, 'descricao', SincronizadorCatalogo(),
+                               get_sincronizacao_catalogo_config())
+
+INTERVALO_CONSULTA_MS = 20
 
 class ProductSearchWindow(tk.Toplevel):
     def __init__(self, parent, callback):
+        inicio = iniciar_acao()
         super().__init__(parent)
         self.title("Consulta de Produtos")
         self.geometry("700x400")
@@ -12,7 +23,9 @@ class ProductSearchWindow(tk.Toplevel):
         self.transient(parent)
         self.grab_set()
         
-        self.produtos_exibidos = []
+        self.resultados = ResultadosPaginados.de_lista([])
+        self.consulta = None
+        self.selecionar_ao_concluir = False
 
         self.create_widgets()
         self.filtrar_produtos()
@@ -20,6 +33,7 @@ class ProductSearchWindow(tk.Toplevel):
         self.center_window()
         
         self.after(100, lambda: self.search_entry.focus_set())
+        concluir_acao(self, 'abrir_busca_produtos', inicio)
         
     def center_window(self):
         """Centraliza a janela na tela"""
@@ -47,85 +61,96 @@ class ProductSearchWindow(tk.Toplevel):
         search_button = ttk.Button(search_frame, text="Filtrar", command=self.filtrar_produtos)
         search_button.pack(side='left', padx=5)
 
-        columns = ('cod', 'desc', 'preco')
-        self.treeview = ttk.Treeview(self, columns=columns, show='headings')
-        
-        self.treeview.heading('cod', text='Código')
-        self.treeview.heading('desc', text='Descrição')
-        self.treeview.heading('preco', text='Preço')
-
-        self.treeview.column('cod', width=100)
-        self.treeview.column('desc', width=400)
-        self.treeview.column('preco', width=100, anchor='e')
-        
-        self.treeview.pack(expand=True, fill='both', padx=10, pady=5)
-        self.treeview.bind("<Double-1>", self.on_select)
-        self.treeview.bind("<Return>", self.on_select)
+        colunas = [
+            ('cod', 'Código', 100, 'w'),
+            ('desc', 'Descrição', 400, 'w'),
+            ('preco', 'Preço', 100, 'e'),
+        ]
+        self.lista = GradeVirtual(self, colunas, self.formatar_linha)
+        self.lista.pack(expand=True, fill='both', padx=10, pady=5)
+        self.lista.tree.bind("<Double-1>", self.on_select)
+        self.lista.tree.bind("<Return>", self.on_select)
         
         footer_frame = ttk.Frame(self, padding=(10, 5))
         footer_frame.pack(fill='x')
 
         select_button = ttk.Button(footer_frame, text="Selecionar", command=self.on_select)
         select_button.pack(side='right')
+
+        self.status_var = tk.StringVar()
+        ttk.Label(footer_frame, textvariable=self.status_var, foreground='gray').pack(side='left')
         
     def move_to_list(self, event):
         """Move o foco do campo de busca para a lista"""
-        if self.treeview.get_children():
-            first_item = self.treeview.get_children()[0]
-            self.treeview.focus(first_item)
-            self.treeview.selection_set(first_item)
-            self.treeview.focus_set()
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
+            self.lista.tree.focus_set()
         
     def on_enter_search(self, event):
         """Quando pressiona Enter no campo de busca, seleciona o primeiro item da lista"""
-        if self.treeview.get_children():
-            first_item = self.treeview.get_children()[0]
-            self.treeview.focus(first_item)
-            self.treeview.selection_set(first_item)
+        if self.consulta is not None:
+            # A busca do último termo ainda está no banco: seleciona quando chegar
+            self.selecionar_ao_concluir = True
+            return
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
             self.select_current_item()
             
     def select_current_item(self):
         """Seleciona o item atual da lista"""
-        selected_item_id = self.treeview.focus()
-        if not selected_item_id:
+        chave = self.lista.chave_selecionada
+        if chave is None or chave not in self.resultados:
             return
         
-        produto_data = next((p for p in self.produtos_exibidos if p['codigo'] == selected_item_id), None)
-
-        if produto_data:
-            self.callback(produto_data)
-            self.after_idle(self.destroy)
+        self.callback(self.resultados.registro(chave))
+        self.after_idle(self.destroy)
 
-    def populate_treeview(self):
-        for item in self.treeview.get_children():
-            self.treeview.delete(item)
-        
-        for produto in self.produtos_exibidos:
-            preco_formatado = f"{produto['preco']:.2f}".replace('.', ',')
-            self.treeview.insert('', 'end', values=(
-                produto['codigo'], 
-                produto['descricao'],
-                preco_formatado
-            ), iid=produto['codigo'])
+    def formatar_linha(self, chave):
+        produto = self.resultados.registro(chave)
+        return (produto['codigo'], produto['descricao'], formatar_numero(produto['preco']))
 
     def filtrar_produtos(self, event=None):
-        """Filtra produtos baseado na pesquisa (código ou descrição)"""
-        termo_busca = self.search_entry.get()
-        
-        for item in self.treeview.get_children():
-            self.treeview.delete(item)
-        
-        if termo_busca:
-            self.produtos_exibidos = buscar_produtos(termo_inteligente=termo_busca)
-        else:
-            self.produtos_exibidos = buscar_produtos()
-        
-        self.populate_treeview()
-        
-        if self.treeview.get_children():
-            first_item = self.treeview.get_children()[0]
-            self.treeview.selection_set(first_item)
-            self.treeview.focus(first_item)
+        """Filtra produtos pelo código ou descrição; refina localmente quando possível.
+
+        A consulta roda numa thread; digitar de novo cancela a anterior.
+        """
+        inicio = iniciar_acao()
+        
+        termo = self.search_entry.get()
+        if self.consulta is not None:
+            self.consulta.cancelar()
+        self.consulta = ConsultaEmSegundoPlano(lambda: busca_produtos.resultados(termo))
+        self.aguardar_consulta(self.consulta, event, inicio)
+
+    def aguardar_consulta(self, consulta, event, inicio):
+        if consulta is not self.consulta:
+            return
+        if not consulta.concluida:
+            self.after(INTERVALO_CONSULTA_MS, lambda: self.aguardar_consulta(consulta, event, inicio))
+            return
+        self.consulta = None
+
+        if consulta.resultados is None:
+            # Banco sem responder: a lista anterior continua na tela
+            self.status_var.set("A consulta demorou demais; mostrando o resultado anterior.")
+            self.selecionar_ao_concluir = False
+            return
+        self.status_var.set("Lista incompleta: a consulta demorou demais." if consulta.erro else "")
+        self.resultados = consulta.resultados
+        self.lista.definir_lote(self.resultados)
+        self.lista.selecionar_primeira()
+
+        if self.selecionar_ao_concluir:
+            self.selecionar_ao_concluir = False
+            self.select_current_item()
+        if event is not None:
+            concluir_acao(self, 'busca_produtos_digitacao', inicio)
+
+    def destroy(self):
+        if self.consulta is not None:
+            self.consulta.cancelar()
+            self.consulta = None
+        super().destroy()
 
     def on_select(self, event=None):
         """Seleciona o item da lista (duplo clique ou Enter na lista)"""
@@ -2,11 +2,18 @@ import tkinter as tk
 from tkinter import ttk
 try:
     from database import get_vendedores
+    from metrics import iniciar_acao, concluir_acao
+    from busca import ResultadosPaginados
+    from ui.virtual_grid import GradeVirtual
 except ImportError:
     from src.database import get_vendedores
+    from src.metrics import iniciar_acao, concluir_acao
+    from src.busca import ResultadosPaginados
+    from src.ui.virtual_grid import GradeVirtual
 
 class VendedorSearchWindow(tk.Toplevel):
     def __init__(self, parent, callback):
+        inicio = iniciar_acao()
         super().__init__(parent)
         self.title("Consulta de Vendedores")
         self.geometry("600x400")
@@ -15,7 +22,8 @@ class VendedorSearchWindow(tk.Toplevel):
         self.transient(parent)
         self.grab_set()
         
-        self.vendedores_exibidos = []
+        self.vendedores = None
+        self.resultados = ResultadosPaginados.de_lista([])
 
         self.create_widgets()
         self.filtrar_vendedores()
@@ -23,6 +31,7 @@ class VendedorSearchWindow(tk.Toplevel):
         self.center_window()
         
         self.after(100, lambda: self.search_entry.focus_set())
+        concluir_acao(self, 'abrir_busca_vendedores', inicio)
         
     def center_window(self):
         """Centraliza a janela na tela"""
@@ -50,19 +59,15 @@ class VendedorSearchWindow(tk.Toplevel):
         search_button = ttk.Button(search_frame, text="Filtrar", command=self.filtrar_vendedores)
         search_button.pack(side='left', padx=5)
 
-        columns = ('codigo', 'nome')
-        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=15)
+        colunas = [
+            ('codigo', 'Código', 80, 'w'),
+            ('nome', 'Nome', 300, 'w'),
+        ]
+        self.lista = GradeVirtual(self, colunas, self.formatar_linha)
+        self.lista.pack(expand=True, fill='both', padx=10, pady=5)
         
-        self.tree.heading('codigo', text='Código', anchor='w')
-        self.tree.heading('nome', text='Nome', anchor='w')
-        
-        self.tree.column('codigo', width=80, anchor='w')
-        self.tree.column('nome', width=300, anchor='w')
-        
-        self.tree.pack(expand=True, fill='both', padx=10, pady=5)
-        
-        self.tree.bind('<Double-1>', self.on_select)
-        self.tree.bind('<Return>', self.on_select)
+        self.lista.tree.bind('<Double-1>', self.on_select)
+        self.lista.tree.bind('<Return>', self.on_select)
         
         button_frame = ttk.Frame(self, padding=(10, 5))
         button_frame.pack(fill='x')
@@ -73,49 +78,43 @@ class VendedorSearchWindow(tk.Toplevel):
         cancel_button = ttk.Button(button_frame, text="Cancelar", command=self.destroy)
         cancel_button.pack(side='right', padx=5)
 
+    def formatar_linha(self, chave):
+        vendedor = self.resultados.registro(chave)
+        return (vendedor['codigo'], vendedor['nome'])
+
     def filtrar_vendedores(self, event=None):
         """Filtra vendedores baseado na pesquisa"""
+        inicio = iniciar_acao()
         search_text = self.search_entry.get().lower()
         
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        vendedores = get_vendedores()
-        self.vendedores_exibidos = []
+        # A lista é pequena: busca uma vez e filtra localmente a cada tecla
+        if self.vendedores is None:
+            self.vendedores = get_vendedores()
         
-        for vendedor in vendedores:
-            codigo = vendedor['codigo'].lower()
-            nome = vendedor['nome'].lower()
-            
-            if (search_text in codigo or search_text in nome or not search_text):
-                item = self.tree.insert('', 'end', values=(vendedor['codigo'], vendedor['nome']))
-                self.vendedores_exibidos.append(vendedor)
+        exibidos = [vendedor for vendedor in self.vendedores
+                    if not search_text or search_text in vendedor['codigo'].lower() or search_text in vendedor['nome'].lower()]
+        self.resultados = ResultadosPaginados.de_lista(exibidos)
+        self.lista.definir_lote(self.resultados)
+        self.lista.selecionar_primeira()
         
-        if self.vendedores_exibidos:
-            self.tree.selection_set(self.tree.get_children()[0])
-            self.tree.focus(self.tree.get_children()[0])
+        if event is not None:
+            concluir_acao(self, 'busca_vendedores_digitacao', inicio)
 
     def on_enter_search(self, event):
         """Seleciona o primeiro item quando pressiona Enter na busca"""
-        if self.tree.get_children():
-            self.tree.selection_set(self.tree.get_children()[0])
-            self.tree.focus(self.tree.get_children()[0])
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
             self.on_select()
 
     def move_to_list(self, event):
         """Move o foco para a lista"""
-        if self.tree.get_children():
-            self.tree.focus(self.tree.get_children()[0])
-            self.tree.selection_set(self.tree.get_children()[0])
-            self.tree.focus_set()
+        if len(self.resultados):
+            self.lista.selecionar_primeira()
+            self.lista.tree.focus_set()
 
     def on_select(self, event=None):
         """Callback para seleção de vendedor"""
-        selection = self.tree.selection()
-        if selection:
-            item = selection[0]
-            index = self.tree.index(item)
-            if index < len(self.vendedores_exibidos):
-                vendedor_selecionado = self.vendedores_exibidos[index]
-                self.callback(vendedor_selecionado)
-                self.destroy()
+        chave = self.lista.chave_selecionada
+        if chave is not None and chave in self.resultados:
+            self.callback(self.resultados.registro(chave))
+            self.destroy()
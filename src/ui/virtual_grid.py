@@ -0,0 +1,178 @@
+from tkinter import ttk
+
+ALTURA_CABECALHO = 25
+ROLAGEM_RODA = 3
+
+class GradeVirtual(ttk.Frame):
+    """Treeview com um número fixo de linhas que mostra só a janela visível de um lote.
+
+    O lote é um ItemBatch ou busca.ResultadosPaginados: precisa de len, `in`,
+    chave_na_posicao e posicao_da_chave; se tiver garantir(quantidade), é chamado
+    antes de desenhar para carregar as linhas que vão aparecer.
+    colunas: lista de (id, título, largura, alinhamento).
+    formatar_linha(chave) devolve os valores exibidos da linha do lote.
+    As linhas da Treeview ("faixas") são reaproveitadas ao rolar; a seleção e as
+    operações são feitas pela chave da linha no lote.
+    """
+
+    def __init__(self, parent, colunas, formatar_linha, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.formatar_linha = formatar_linha
+        self.lote = None
+        self.topo = 0
+        self.chave_selecionada = None
+        self._chaves_faixas = []
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in colunas], show='headings', selectmode='browse')
+        for coluna, titulo, largura, alinhamento in colunas:
+            self.tree.heading(coluna, text=titulo)
+            self.tree.column(coluna, width=largura, anchor=alinhamento)
+
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self.scrollbar.pack(side='right', fill='y')
+        self.tree.pack(side='left', expand=True, fill='both')
+
+        altura_linha = ttk.Style().lookup('Treeview', 'rowheight')
+        self.altura_linha = int(altura_linha) if altura_linha else 20
+        self.faixas = 0
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', lambda e: self.rolar(-ROLAGEM_RODA if e.delta > 0 else ROLAGEM_RODA))
+        self.tree.bind('<Button-4>', lambda e: self.rolar(-ROLAGEM_RODA))
+        self.tree.bind('<Button-5>', lambda e: self.rolar(ROLAGEM_RODA))
+        self.tree.bind('<Up>', lambda e: self._mover_selecao(-1))
+        self.tree.bind('<Down>', lambda e: self._mover_selecao(1))
+        self.tree.bind('<Prior>', lambda e: self._mover_selecao(-max(1, self.faixas - 1)))
+        self.tree.bind('<Next>', lambda e: self._mover_selecao(max(1, self.faixas - 1)))
+        self.tree.bind('<Home>', lambda e: self._mover_selecao(-len(self.lote or ())))
+        self.tree.bind('<End>', lambda e: self._mover_selecao(len(self.lote or ())))
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+
+    def definir_lote(self, lote):
+        self.lote = lote
+        self.topo = 0
+        self.chave_selecionada = None
+        self.atualizar()
+
+    def _on_configure(self, event):
+        faixas = max(1, (event.height - ALTURA_CABECALHO) // self.altura_linha)
+        if faixas != self.faixas:
+            self.faixas = faixas
+            self.atualizar()
+
+    def _ajustar_faixas(self, quantidade):
+        """Cria ou desanexa faixas para que existam exatamente `quantidade` visíveis."""
+        existentes = len(self.tree.get_children())
+        for i in range(existentes, quantidade):
+            iid = f"faixa{i}"
+            if self.tree.exists(iid):
+                self.tree.move(iid, '', i)
+            else:
+                self.tree.insert('', i, iid=iid)
+        if existentes > quantidade:
+            self.tree.detach(*[f"faixa{i}" for i in range(quantidade, existentes)])
+
+    def _garantir(self, quantidade):
+        garantir = getattr(self.lote, 'garantir', None)
+        if garantir is not None:
+            garantir(quantidade)
+
+    def atualizar(self):
+        """Redesenha a janela visível: O(faixas * log n), independente do tamanho do lote."""
+        # Uma linha além da janela, para a rolagem saber se ainda há o que carregar
+        self._garantir(self.topo + max(self.faixas, 1) + 1)
+        total = len(self.lote) if self.lote is not None else 0
+        self.topo = max(0, min(self.topo, total - self.faixas))
+        visiveis = min(self.faixas, total - self.topo)
+        self._ajustar_faixas(visiveis)
+
+        self._chaves_faixas = [self.lote.chave_na_posicao(self.topo + i) for i in range(visiveis)]
+        for i, chave in enumerate(self._chaves_faixas):
+            self.tree.item(f"faixa{i}", values=self.formatar_linha(chave))
+
+        if self.chave_selecionada in self._chaves_faixas:
+            faixa = f"faixa{self._chaves_faixas.index(self.chave_selecionada)}"
+            if self.tree.selection() != (faixa,):
+                self.tree.selection_set(faixa)
+            self.tree.focus(faixa)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total > self.faixas:
+            self.scrollbar.set(self.topo / total, (self.topo + visiveis) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def atualizar_linha(self, chave):
+        """Redesenha só a linha `chave`, se estiver visível."""
+        if chave in self._chaves_faixas:
+            self.tree.item(f"faixa{self._chaves_faixas.index(chave)}", values=self.formatar_linha(chave))
+
+    def rolar(self, linhas):
+        self.topo += linhas
+        self.atualizar()
+        return 'break'
+
+    def _on_scrollbar(self, *args):
+        total = len(self.lote) if self.lote is not None else 0
+        if args[0] == 'moveto':
+            self.topo = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            passo = self.faixas - 1 if args[2] == 'pages' else 1
+            self.topo += int(args[1]) * max(1, passo)
+        self.atualizar()
+
+    def mostrar(self, chave):
+        """Rola até a linha `chave` (O(log n)) e a seleciona."""
+        posicao = self.lote.posicao_da_chave(chave)
+        if posicao < self.topo:
+            self.topo = posicao
+        elif posicao >= self.topo + self.faixas:
+            self.topo = posicao - self.faixas + 1
+        self.chave_selecionada = chave
+        self.atualizar()
+
+    def _mover_selecao(self, deslocamento):
+        if self.lote is None or not len(self.lote):
+            return 'break'
+        if self.chave_selecionada is None or self.chave_selecionada not in self.lote:
+            posicao = self.topo
+        else:
+            posicao = self.lote.posicao_da_chave(self.chave_selecionada) + deslocamento
+        self._garantir(posicao + 1)
+        posicao = max(0, min(len(self.lote) - 1, posicao))
+        self.mostrar(self.lote.chave_na_posicao(posicao))
+        return 'break'
+
+    def _on_select(self, event):
+        selecao = self.tree.selection()
+        if selecao:
+            indice = self.tree.index(selecao[0])
+            if indice < len(self._chaves_faixas):
+                self.chave_selecionada = self._chaves_faixas[indice]
+
+    def chave_na_faixa(self, y):
+        """Chave da linha sob a coordenada y, ou None."""
+        iid = self.tree.identify_row(y)
+        if not iid:
+            return None
+        indice = self.tree.index(iid)
+        return self._chaves_faixas[indice] if indice < len(self._chaves_faixas) else None
+
+    def selecionar(self, chave):
+        self.chave_selecionada = chave
+        self.atualizar()
+
+    def selecionar_primeira(self):
+        """Seleciona a primeira linha do lote (se houver) e a mostra."""
+        if self.lote is not None and len(self.lote):
+            self.topo = 0
+            self.selecionar(self.lote.chave_na_posicao(0))
+
+    def bbox(self, chave, coluna):
+        if chave not in self._chaves_faixas:
+            return None
+        return self.tree.bbox(f"faixa{self._chaves_faixas.index(chave)}", coluna)
+
+    def valores(self, chave):
+        return self.formatar_linha(chave)